@@ -1,5 +1,41 @@
 #!/usr/bin/python3.8
 
+from array import array
+import sys
+
+'''
+Substitution and GF(2**4) multiplication tables. Built once at import time rather than on every call.
+'''
+SBOX = (
+	(  9,  4,  0xA, 0xB),
+	(0xD,  1,    8,   5),
+	(  6,  2,    0,   3),
+	(0xC, 0xE, 0xF,   7))
+
+INVERSE_SBOX = (
+	(0xA,  5,   9, 0xB),
+	(  1,  7,   8, 0xF),
+	(  6,  0,   2,   3),
+	(0xC,  4, 0xD, 0xE))
+
+GF16_TABLE = (
+	(0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0),
+	(0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15),
+	(0, 2, 4, 6, 8, 10, 12, 14, 3, 1, 7, 5, 11, 9, 15, 13),
+	(0, 3, 6, 5, 12, 15, 10, 9, 11, 8, 13, 14, 7, 4, 1, 2),
+	(0, 4, 8, 12, 3, 7, 11, 15, 6, 2, 14, 10, 5, 1, 13, 9),
+	(0, 5, 10, 15, 7, 2, 13, 8, 14, 11, 4, 1, 9, 12, 3, 6),
+	(0, 6, 12, 10, 11, 13, 7, 1, 5, 3, 9, 15, 14, 8, 2, 4),
+	(0, 7, 14, 9, 15, 8, 1, 6, 13, 10, 3, 4, 2, 5, 12, 11),
+	(0, 8, 3, 11, 6, 14, 5, 13, 12, 4, 15, 7, 10, 2, 9, 1),
+	(0, 9, 1, 8, 2, 11, 3, 10, 4, 13, 5, 12, 6, 15, 7, 14),
+	(0, 10, 7, 13, 14, 4, 9, 3, 15, 5, 8, 2, 1, 11, 6, 12),
+	(0, 11, 5, 14, 10, 1, 15, 4, 7, 12, 2, 9, 13, 6, 8, 3),
+	(0, 12, 11, 7, 5, 9, 14, 2, 10, 6, 1, 13, 15, 3, 4, 8),
+	(0, 13, 9, 4, 1, 12, 8, 5, 2, 15, 11, 6, 3, 14, 10, 7),
+	(0, 14, 15, 1, 13, 3, 2, 12, 9, 7, 6, 8, 4, 10, 11, 5),
+	(0, 15, 13, 2, 9, 6, 4, 11, 1, 14, 12, 3, 8, 7, 5, 10))
+
 def sub_word(word):
 	""" Performs the SubNibble transformation on the two nibbles in a word. """
 	return sub_nibble(word >> 4 & 0xf) << 4 ^ sub_nibble(word & 0xf)
@@ -45,17 +81,9 @@ def sub_nibble(nibble, inverse=False):
 	""" Performs the substitution transformation on a 4-bit nibble. Used for the table lookup in SubNibbles. """
 	# Selects the proper substitution table based on if it's a normal or inverse transformation
 	if not inverse:
-		table = [\
-		[  9,  4,  0xA, 0xB],
-		[0xD,  1,    8,   5],
-		[  6,  2,    0,   3],
-		[0xC, 0xE, 0xF,   7]]
+		table = SBOX
 	elif inverse:
-		table = [\
-		[0xA,  5,   9, 0xB],
-		[  1,  7,   8, 0xF],
-		[  6,  0,   2,   3],
-		[0xC,  4, 0xD, 0xE]]
+		table = INVERSE_SBOX
 	
 	# Determine the left and right bits in the nibble
 	left = (nibble >> 2) & 3
@@ -94,25 +122,7 @@ def mix_columns(state, inverse=False):
 	
 def GF16(a, b):
 	""" Galois Field for GF(2**4). Used for multiplication operations in the MixColumns transformation. """
-	multiplication_table = [\
-	[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-	[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15],
-	[0, 2, 4, 6, 8, 10, 12, 14, 3, 1, 7, 5, 11, 9, 15, 13],
-	[0, 3, 6, 5, 12, 15, 10, 9, 11, 8, 13, 14, 7, 4, 1, 2],
-	[0, 4, 8, 12, 3, 7, 11, 15, 6, 2, 14, 10, 5, 1, 13, 9],
-	[0, 5, 10, 15, 7, 2, 13, 8, 14, 11, 4, 1, 9, 12, 3, 6],
-	[0, 6, 12, 10, 11, 13, 7, 1, 5, 3, 9, 15, 14, 8, 2, 4],
-	[0, 7, 14, 9, 15, 8, 1, 6, 13, 10, 3, 4, 2, 5, 12, 11],
-	[0, 8, 3, 11, 6, 14, 5, 13, 12, 4, 15, 7, 10, 2, 9, 1],
-	[0, 9, 1, 8, 2, 11, 3, 10, 4, 13, 5, 12, 6, 15, 7, 14],
-	[0, 10, 7, 13, 14, 4, 9, 3, 15, 5, 8, 2, 1, 11, 6, 12],
-	[0, 11, 5, 14, 10, 1, 15, 4, 7, 12, 2, 9, 13, 6, 8, 3],
-	[0, 12, 11, 7, 5, 9, 14, 2, 10, 6, 1, 13, 15, 3, 4, 8],
-	[0, 13, 9, 4, 1, 12, 8, 5, 2, 15, 11, 6, 3, 14, 10, 7],
-	[0, 14, 15, 1, 13, 3, 2, 12, 9, 7, 6, 8, 4, 10, 11, 5],
-	[0, 15, 13, 2, 9, 6, 4, 11, 1, 14, 12, 3, 8, 7, 5, 10]]
-	
-	return multiplication_table[a][b]
+	return GF16_TABLE[a][b]
 
 def F(input, key, encrypt=True):
 	""" Encrypts or decrypts the provided block (2-bytes) using the SDES cipher. 
@@ -132,12 +142,154 @@ def F(input, key, encrypt=True):
 		The encrypted or decrypted block.
 	"""	
 
+	return process_block(input, expand_key(key), encrypt)
+
+def F_keys(input, keys, encrypt=True):
+	""" Encrypts or decrypts one block (or an array of blocks) under an array of keys at once. A NumPy vectorized version of `F`, used for key searches.
+	
+	Parameters
+	----------
+	input : int or numpy.ndarray
+		The block(s) to process. Broadcast against `keys`.
+	keys : numpy.ndarray
+		The cipher keys to use. (16-bits each)
+	encrypt : bool
+		Whether to encrypt or decrypt the data. Defaults to encryption.
+	 
+	Returns
+	-------
+	numpy.ndarray
+		The encrypted or decrypted block under each key.
+	"""
+	
+	# Only key searches need NumPy, so it isn't imported with the module
+	import numpy
+	
+	# Flattened so a nibble indexes its substitution directly
+	sbox = numpy.array(SBOX).ravel()
+	inverse_sbox = numpy.array(INVERSE_SBOX).ravel()
+	gf16 = numpy.array(GF16_TABLE)
+	
+	def sub_word(word):
+		return sbox[word >> 4 & 0xf] << 4 ^ sbox[word & 0xf]
+	
+	def sub_nibbles(state, box):
+		return box[state >> 12 & 0xf] << 12 ^ box[state >> 8 & 0xf] << 8 ^ box[state >> 4 & 0xf] << 4 ^ box[state & 0xf]
+	
+	def shift_rows(state):
+		return state & 0xf0f0 ^ (state >> 8 & 0xf) ^ (state & 0xf) << 8
+	
+	def mix_columns(state, C):
+		n = [ state >> 12 & 0xf, state >> 8 & 0xf, state >> 4 & 0xf, state & 0xf ]
+		return ( (gf16[C[0], n[0]] ^ gf16[C[2], n[1]]) << 12 ^ (gf16[C[1], n[0]] ^ gf16[C[3], n[1]]) << 8 ^
+				 (gf16[C[0], n[2]] ^ gf16[C[2], n[3]]) << 4 ^ (gf16[C[1], n[2]] ^ gf16[C[3], n[3]]) )
+	
+	# Key expansion, as in `expand_key`
+	keys = numpy.asarray(keys, dtype=numpy.int64)
+	w0 = keys >> 8 & 0xff
+	w1 = keys & 0xff
+	w2 = w0 ^ sub_word( (w1 << 4 & 0xff) ^ (w1 >> 4) ) ^ 0x80
+	w3 = w2 ^ w1
+	w4 = w2 ^ sub_word( (w3 << 4 & 0xff) ^ (w3 >> 4) ) ^ 0x30
+	w5 = w4 ^ w3
+	K0, K1, K2 = w0 << 8 ^ w1, w2 << 8 ^ w3, w4 << 8 ^ w5
+	
+	state = numpy.asarray(input, dtype=numpy.int64) & 0xffff
+	if encrypt:
+		state = state ^ K0
+		state = mix_columns( shift_rows( sub_nibbles(state, sbox) ), [1, 4, 4, 1] ) ^ K1
+		state = shift_rows( sub_nibbles(state, sbox) ) ^ K2
+	else:
+		state = state ^ K2
+		state = mix_columns( sub_nibbles( shift_rows(state), inverse_sbox ) ^ K1, [9, 2, 2, 9] )
+		state = sub_nibbles( shift_rows(state), inverse_sbox ) ^ K0
+	
+	return state
+
+'''
+T-tables. Each round is split into per-byte lookups over the state as a 16-bit int: the table for a byte holds the
+contribution of its two nibbles to the round's output after SubNibbles, ShiftRows and (except in the last round)
+MixColumns, so a round is two lookups and an XOR with the round key. The inverse round uses InverseMixColumns applied
+to the round key instead, as MixColumns is linear.
+'''
+# Where ShiftRows moves the nibble at each position (0 being the most significant)
+SHIFTED = (0, 3, 2, 1)
+
+def spread(nibble, position, C=None):
+	""" The contribution to the state of a nibble at `position` after ShiftRows, multiplied into its column by the MixColumns constant matrix `C` (when given). """
+	position = SHIFTED[position]
+	if C is None:
+		return nibble << (12 - 4 * position)
+	
+	top = position & ~1
+	if position == top:
+		upper, lower = GF16(C[0], nibble), GF16(C[1], nibble)
+	else:
+		upper, lower = GF16(C[2], nibble), GF16(C[3], nibble)
+	return upper << (12 - 4 * top) ^ lower << (8 - 4 * top)
+
+def byte_table(box, high, C=None):
+	""" The T-table for the high or low byte of the state: the substituted, shifted and (when `C` is given) mixed contribution of each byte value. """
+	first = 0 if high else 2
+	return tuple( spread(box[b >> 4], first, C) ^ spread(box[b & 0xf], first + 1, C) for b in range(256) )
+
+FLAT_SBOX = tuple( sub_nibble(n) for n in range(16) )
+FLAT_INVERSE_SBOX = tuple( sub_nibble(n, inverse=True) for n in range(16) )
+
+ENCRYPT_T = ( byte_table(FLAT_SBOX, True, [1, 4, 4, 1]), byte_table(FLAT_SBOX, False, [1, 4, 4, 1]) )
+ENCRYPT_LAST_T = ( byte_table(FLAT_SBOX, True), byte_table(FLAT_SBOX, False) )
+DECRYPT_T = ( byte_table(FLAT_INVERSE_SBOX, True, [9, 2, 2, 9]), byte_table(FLAT_INVERSE_SBOX, False, [9, 2, 2, 9]) )
+DECRYPT_LAST_T = ( byte_table(FLAT_INVERSE_SBOX, True), byte_table(FLAT_INVERSE_SBOX, False) )
+
+def table_round_keys(roundkeys):
+	""" Converts round keys from `expand_key` into the 16-bit ints used with the T-tables: K0, K1, K2 and InverseMixColumns(K1). """
+	K0, K1, K2 = ( w[0] << 8 ^ w[1] for w in roundkeys )
+	mixed = mix_columns([ K1 >> 12 & 0xf, K1 >> 8 & 0xf, K1 >> 4 & 0xf, K1 & 0xf ], inverse=True)
+	
+	return K0, K1, K2, mixed[0] << 12 ^ mixed[1] << 8 ^ mixed[2] << 4 ^ mixed[3]
+
+def fast_process_block(input, keys, encrypt=True):
+	""" T-table version of `process_block`, with round keys from `table_round_keys`. """
+	K0, K1, K2, mixed_K1 = keys
+	
+	if encrypt:
+		high, low = ENCRYPT_T
+		last_high, last_low = ENCRYPT_LAST_T
+		state = (input & 0xffff) ^ K0
+		state = high[state >> 8] ^ low[state & 0xff] ^ K1
+		return last_high[state >> 8] ^ last_low[state & 0xff] ^ K2
+	else:
+		high, low = DECRYPT_T
+		last_high, last_low = DECRYPT_LAST_T
+		state = (input & 0xffff) ^ K2
+		state = high[state >> 8] ^ low[state & 0xff] ^ mixed_K1
+		return last_high[state >> 8] ^ last_low[state & 0xff] ^ K0
+
+def fast_F(input, key, encrypt=True):
+	""" T-table version of `F`, taking the same arguments and returning the same block. """
+	return fast_process_block(input, table_round_keys( expand_key(key) ), encrypt)
+
+def process_block(input, roundkeys, encrypt=True):
+	""" Encrypts or decrypts the provided block (2-bytes) using already expanded round keys. 
+	
+	Parameters
+	----------
+	input : int
+		The block to process.
+	roundkeys : [ [int] ]
+		The round keys, as returned by `expand_key`.
+	encrypt : bool
+		Whether to encrypt or decrypt the data. Defaults to encryption.
+	 
+	Returns
+	-------
+	int
+		The encrypted or decrypted block.
+	"""	
+
 	# Convert input integer into a state array
 	state = [ input >> 12 & 0xf, input >> 8 & 0xf, input >> 4 & 0xf, input & 0xf ]
 	
-	# Key expansion
-	roundkeys = expand_key(key)
-	
 	if encrypt:
 		# Pre-round
 		state = add_round_key(state, roundkeys[0])
@@ -171,5 +323,76 @@ def F(input, key, encrypt=True):
 		
 	# Convert state array back into an integer
 	return (state[0] << 12) ^ (state[1] << 8) ^ (state[2] << 4) ^ (state[3])
+
+
+class SAESCipher:
+	""" A keyed SAES cipher. Expands the key once, and can optionally precompute the full encrypt and decrypt permutations.
+	
+	The tables are two `array('H')` of 65536 entries each (about 256 kB per key). They and the blocks processed without them use the T-tables. (`fast_process_block`)
+	
+	Parameters
+	----------
+	key : int
+		The cipher key to use. (16-bits)
+	tables : bool
+		Whether to build the full encrypt and decrypt codebooks. Defaults to expanding the key only.
+	codebooks : (array('H'), array('H'))
+		The key's encrypt and decrypt codebooks, if already built. (e.g. mapped by `tablecache`) Overrides `tables`. They're pickled as given rather than as two copied tables, so mapped codebooks reach pool workers as their file name.
+	"""
+	
+	blocksize = 2
 	
-	
\ No newline at end of file
+	def __init__(self, key, tables=False, codebooks=None):
+		self.key = key
+		self.roundkeys = expand_key(key)
+		self.table_keys = table_round_keys(self.roundkeys)
+		self.encrypt_table = None
+		self.decrypt_table = None
+		self.codebooks = codebooks
+		
+		if codebooks is not None:
+			self.encrypt_table, self.decrypt_table = codebooks
+		elif tables:
+			self.encrypt_table = array('H', [ fast_process_block(b, self.table_keys, True) for b in range(65536) ])
+			self.decrypt_table = array('H', [ fast_process_block(b, self.table_keys, False) for b in range(65536) ])
+	
+	def __getstate__(self):
+		state = dict(self.__dict__)
+		if self.codebooks is not None:
+			del state['encrypt_table'], state['decrypt_table']
+		return state
+	
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		if self.codebooks is not None:
+			self.encrypt_table, self.decrypt_table = self.codebooks
+	
+	def F(self, input, encrypt=True):
+		""" Encrypts or decrypts the provided block. Only the low 16 bits of `input` are used, as in `F`. """
+		table = self.encrypt_table if encrypt else self.decrypt_table
+		if table is not None:
+			return table[input & 0xffff]
+		else:
+			return fast_process_block(input, self.table_keys, encrypt)
+	
+	def ecb(self, input_data, encrypt=True):
+		""" Encrypts or decrypts every block of the input, mapping the codebook (when built) over the data as an array of 16-bit blocks. """
+		even_length = len(input_data) & ~1
+		blocks = array('H', bytes(input_data[:even_length]))
+		if sys.byteorder == 'little':
+			blocks.byteswap()
+		
+		table = self.encrypt_table if encrypt else self.decrypt_table
+		if table is not None:
+			output = array('H', map(table.__getitem__, blocks))
+		else:
+			output = array('H', [ fast_process_block(b, self.table_keys, encrypt) for b in blocks ])
+		if sys.byteorder == 'little':
+			output.byteswap()
+		output = output.tobytes()
+		
+		# A trailing odd byte is XORed with the first byte of the encrypted zero block, as in `modes.ecb`, so the output is the same length as the input
+		if even_length != len(input_data):
+			output += bytes([ input_data[-1] ^ (self.F(0) >> 8) ])
+		
+		return output
@@ -1,5 +1,7 @@
 #!/usr/bin/python3.8
 
+import collections
+
 def left_shift(num, length=5):
 	""" Rotates the given number left by one. Defaults to a 5-bit word. """
 	
@@ -176,7 +178,113 @@ def F(input, key, encrypt=True):
 	
 	return output
 
+'''
+Lookup tables for every primitive, built from the functions above (which stay the reference implementation) on first use.
+'''
+Tables = collections.namedtuple('Tables', ('P10', 'P8', 'IP', 'IP_inverse', 'E_P', 'P4', 'S0', 'S1', 'SW', 'left_shift', 'subkeys', 'rounds'))
+
+_tables = None
 
+def _linear_table(function, bits):
+	""" Tabulates a bit permutation over every `bits`-bit input. Permutations are linear over XOR, so only the single-bit inputs go through `function`. """
+	table = [0] * (1 << bits)
+	for bit in range(bits):
+		table[1 << bit] = function(1 << bit)
+	for n in range(1, 1 << bits):
+		low = n & -n
+		table[n] = table[n ^ low] ^ table[low]
+	
+	return table
+
+def tables():
+	""" Returns the lookup tables, building them the first time.
+	
+	Each primitive's table is indexed by its input (`left_shift` by a 5-bit word). `subkeys[key]` is `generate_subkeys(key)`,
+	and `rounds[subkey]` combines E_P, the subkey XOR, both S-boxes and P4: a round is `num ^ (rounds[subkey][num & 0b1111] << 4)`.
+	"""
+	global _tables
+	if _tables is None:
+		e_p = tuple( _linear_table(E_P, 4) )
+		s0 = tuple( S0(n) for n in range(16) )
+		s1 = tuple( S1(n) for n in range(16) )
+		p4 = tuple( _linear_table(P4, 4) )
+		
+		rounds = tuple( tuple( p4[ (s0[(e_p[right] ^ subkey) >> 4] << 2) + s1[(e_p[right] ^ subkey) & 0b1111] ] for right in range(16) )
+						for subkey in range(256) )
+		
+		# The subkeys come from the P10, P8 and shift tables rather than `generate_subkeys`, which is most of the build time
+		p10 = tuple( _linear_table(P10, 10) )
+		p8 = tuple( _linear_table(P8, 10) )
+		shifts = tuple( _linear_table(left_shift, 5) )
+		shift = tuple( (shifts[n >> 5] << 5) + shifts[n & 0b11111] for n in range(1024) )
+		
+		_tables = Tables(
+			P10=p10,
+			P8=p8,
+			IP=bytes( _linear_table(IP, 8) ),
+			IP_inverse=bytes( _linear_table(IP_inverse, 8) ),
+			E_P=e_p,
+			P4=p4,
+			S0=s0,
+			S1=s1,
+			SW=bytes( _linear_table(SW, 8) ),
+			left_shift=shifts,
+			subkeys=tuple( (p8[shift[p10[key]]], p8[shift[shift[shift[p10[key]]]]]) for key in range(1024) ),
+			rounds=rounds,
+		)
+	
+	return _tables
 
+def fast_f_K(num, subkey):
+	""" Table-driven `f_K`. """
+	return num ^ (tables().rounds[subkey][num & 0b1111] << 4)
 
+def fast_F(input, key, encrypt=True):
+	""" Table-driven `F`, taking the same arguments and returning the same byte in a handful of lookups. """
+	t = tables()
+	
+	if encrypt:
+		K1, K2 = t.subkeys[key & 0x3ff]
+	else:
+		K2, K1 = t.subkeys[key & 0x3ff]
+	
+	num = t.IP[input & 0xff]
+	num ^= t.rounds[K1][num & 0b1111] << 4
+	num = t.SW[num]
+	num ^= t.rounds[K2][num & 0b1111] << 4
+	
+	return t.IP_inverse[num]
 
+class SDESCipher:
+	""" A keyed SDES cipher. Builds the full encrypt and decrypt codebooks for the key once, so processing a byte is a single table lookup.
+	
+	The codebooks are built with `fast_F`. `F` stays the reference implementation.
+	
+	Parameters
+	----------
+	key : int
+		The cipher key to use. (10-bits)
+	codebooks : (bytes, bytes)
+		The key's encrypt and decrypt codebooks, if already built. (e.g. loaded by `tablecache`)
+	"""
+	
+	blocksize = 1
+	
+	def __init__(self, key, codebooks=None):
+		self.key = key
+		if codebooks is not None:
+			self.encrypt_table, self.decrypt_table = codebooks
+		else:
+			self.encrypt_table = bytes( fast_F(b, key, True) for b in range(256) )
+			self.decrypt_table = bytes( fast_F(b, key, False) for b in range(256) )
+	
+	def F(self, input, encrypt=True):
+		""" Encrypts or decrypts the provided byte using the codebooks. Only the low 8 bits of `input` are used, as in `F`. """
+		if encrypt:
+			return self.encrypt_table[input & 0xff]
+		else:
+			return self.decrypt_table[input & 0xff]
+	
+	def ecb(self, input_data, encrypt=True):
+		""" Encrypts or decrypts every byte of the input with a single table translation. """
+		return bytes(input_data).translate(self.encrypt_table if encrypt else self.decrypt_table)
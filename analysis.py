@@ -0,0 +1,403 @@
+#!/usr/bin/python3.8
+"""
+ analysis.py
+ Differential and linear cryptanalysis of SDES and SAES.
+
+ The S-box tables (difference distribution and linear approximation tables) are plain Python. The attacks recover
+ the last round key by counting, for every candidate subkey, how many chosen-plaintext pairs (differential) or known
+ plaintexts (linear) agree with it, then extend it to the whole key and check it against a known block. The data is
+ first reduced to a histogram over the handful of values the count depends on (with `numpy.bincount`), so millions of
+ pairs cost a single vectorized pass, and every candidate is then scored against the histogram.
+
+ The attacks and pair generation need NumPy.
+"""
+
+import SDES
+import SAES
+import modes
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+'''
+S-box tables.
+'''
+SBOXES = {
+	'sdes-s0': (SDES.S0, 4, 2),
+	'sdes-s1': (SDES.S1, 4, 2),
+	'saes': (SAES.sub_nibble, 4, 4),
+}
+
+def parity(x):
+	""" The XOR of the bits of `x`. """
+	return bin(x).count('1') & 1
+
+def ddt(sbox, in_bits=4, out_bits=4):
+	""" The difference distribution table of an S-box: `table[dx][dy]` counts the inputs `x` where `sbox(x) ^ sbox(x ^ dx) == dy`. """
+	table = [ [0] * (1 << out_bits) for _ in range(1 << in_bits) ]
+	for x in range(1 << in_bits):
+		for dx in range(1 << in_bits):
+			table[dx][ sbox(x) ^ sbox(x ^ dx) ] += 1
+
+	return table
+
+def lat(sbox, in_bits=4, out_bits=4):
+	""" The linear approximation table of an S-box: `table[a][b]` is the number of inputs `x` where the parities of `a & x` and `b & sbox(x)` agree, less half of the inputs. """
+	table = [ [ -(1 << (in_bits - 1)) ] * (1 << out_bits) for _ in range(1 << in_bits) ]
+	for x in range(1 << in_bits):
+		y = sbox(x)
+		for a in range(1 << in_bits):
+			for b in range(1 << out_bits):
+				table[a][b] += parity(a & x) == parity(b & y)
+
+	return table
+
+def best_differential(table):
+	""" The most probable (input difference, output difference) of a difference distribution table, ignoring the zero difference. Returns `(dx, dy, count)`. """
+	return max( ( (dx, dy, count) for dx, row in enumerate(table) if dx for dy, count in enumerate(row) ), key=lambda entry: entry[2] )
+
+def best_approximation(table, output_mask):
+	""" The input mask with the largest bias for an output mask of a linear approximation table. Returns `(input mask, bias)`. """
+	a = max( range(len(table)), key=lambda a: abs(table[a][output_mask]) )
+	return a, table[a][output_mask]
+
+def format_table(table):
+	""" Renders a table as text, one row per line. """
+	width = max( len(str(v)) for row in table for v in row ) + 1
+	return '\n'.join( f"{i:>2x} |" + ''.join( f"{v:>{width}}" for v in row ) for i, row in enumerate(table) )
+
+'''
+Data generation against an encryption oracle (any keyed cipher object).
+'''
+def _require_numpy():
+	if numpy is None:
+		raise ImportError("The attacks need NumPy! (pip install numpy)")
+
+def _dtype(blocksize):
+	return numpy.uint8 if blocksize == 1 else numpy.dtype('>u2')
+
+def encrypt_blocks(cipher, blocks):
+	""" Encrypts an array of blocks under a keyed cipher object, with whichever `modes` backend suits it. """
+	dtype = _dtype(cipher.blocksize)
+	data = numpy.asarray(blocks).astype(dtype).tobytes()
+	return numpy.frombuffer( modes.ecb(data, cipher), dtype=dtype ).astype(numpy.int64)
+
+def known_plaintexts(cipher, n, seed=None):
+	""" Encrypts `n` random plaintext blocks. Returns the plaintexts and ciphertexts. """
+	_require_numpy()
+	rng = numpy.random.default_rng(seed)
+	plaintexts = rng.integers(0, 1 << (8 * cipher.blocksize), n, dtype=numpy.int64)
+	return plaintexts, encrypt_blocks(cipher, plaintexts)
+
+def chosen_pairs(cipher, n, difference, seed=None):
+	""" Encrypts `n` random plaintext pairs with the given XOR difference. Returns both plaintexts and both ciphertexts of every pair. """
+	plaintexts, ciphertexts = known_plaintexts(cipher, n, seed)
+	partners = plaintexts ^ difference
+	return plaintexts, partners, ciphertexts, encrypt_blocks(cipher, partners)
+
+def _histogram(index, bins):
+	return numpy.bincount( numpy.asarray(index, dtype=numpy.int64), minlength=bins ).astype(numpy.int64)
+
+'''
+SDES. The last round is fully observable: IP of the ciphertext holds the round's input and its output XORed with the
+right half of IP of the plaintext, so each S-box's input (before the subkey) and output are known for every block.
+'''
+def _sdes_last_round(plaintexts, ciphertexts):
+	""" The last round's expanded input (before the subkey XOR) and S-box outputs, as (S0 input, S0 output, S1 input, S1 output). """
+	t = SDES.tables()
+	IP = numpy.frombuffer(t.IP, dtype=numpy.uint8).astype(numpy.int64)
+	E_P = numpy.array(t.E_P, dtype=numpy.int64)
+	P4_inverse = numpy.array( [ t.P4.index(n) for n in range(16) ], dtype=numpy.int64 )
+
+	p, c = IP[plaintexts], IP[ciphertexts]
+	expanded = E_P[c & 0b1111]
+	outputs = P4_inverse[ (c >> 4) ^ (p & 0b1111) ]
+
+	return expanded >> 4, outputs >> 2, expanded & 0b1111, outputs & 0b11
+
+def _sdes_keys(subkey_candidates, plaintexts, ciphertexts, checks=4):
+	""" Extends last round subkeys to the 10-bit keys that have them, keeping those that encrypt the first few known blocks correctly. """
+	t = SDES.tables()
+	known = list( zip(plaintexts[:checks].tolist(), ciphertexts[:checks].tolist()) )
+	return [ key for key in range(1 << 10) if t.subkeys[key][1] in subkey_candidates and all( SDES.fast_F(p, key) == c for p, c in known ) ]
+
+def sdes_differential_counts(plaintexts, partners, ciphertexts, partner_ciphertexts):
+	""" Counts, for each candidate 4-bit piece of the last subkey, the pairs whose S-box output difference it explains.
+
+	Returns
+	-------
+	[numpy.ndarray]
+		The 16 counts of the S0 and of the S1 subkey nibble.
+	"""
+
+	_require_numpy()
+	first, second = _sdes_last_round(plaintexts, ciphertexts), _sdes_last_round(partners, partner_ciphertexts)
+	candidates = numpy.arange(16)[:, None]
+
+	counts = []
+	for box, (e, o, e2, o2) in ((SDES.S0, first[0:2] + second[0:2]), (SDES.S1, first[2:4] + second[2:4])):
+		table = numpy.array( [ box(n) for n in range(16) ] )
+		bins = numpy.arange(16 * 16 * 4)
+		# Bin (e, e2, dy) agrees with subkey k when the S-box maps e ^ k and e2 ^ k to outputs differing by dy
+		agrees = (table[ (bins[None, :] >> 6) ^ candidates ] ^ table[ (bins[None, :] >> 2 & 0b1111) ^ candidates ]) == (bins[None, :] & 0b11)
+		counts.append( agrees.astype(numpy.int64) @ _histogram( (e << 6) | (e2 << 2) | (o ^ o2), 16 * 16 * 4 ) )
+
+	return counts
+
+def sdes_linear_counts(plaintexts, ciphertexts):
+	""" Scores each candidate 4-bit piece of the last subkey by how well the known blocks fit every linear approximation of its S-box.
+
+	The score of subkey k is the sum, over every input and output mask, of the observed bias of the approximation
+	(with the S-box input taken as e ^ k) weighted by the bias the S-box's linear approximation table predicts. Only
+	the right subkey reproduces the whole table.
+
+	Returns
+	-------
+	[numpy.ndarray]
+		The 16 scores of the S0 and of the S1 subkey nibble.
+	"""
+
+	_require_numpy()
+	e0, o0, e1, o1 = _sdes_last_round(plaintexts, ciphertexts)
+	parities = numpy.array( [ parity(n) for n in range(16) ] )
+	candidates = numpy.arange(16)
+
+	scores = []
+	for box, e, o in ((SDES.S0, e0, o0), (SDES.S1, e1, o1)):
+		table = numpy.array( lat(box, 4, 2) )
+		histogram = _histogram( (e << 2) | o, 16 * 4 ).reshape(16, 4)
+		score = numpy.zeros(16, dtype=numpy.int64)
+		for a in range(16):
+			for b in range(4):
+				if table[a][b]:
+					# +1 for every block where the parities agree, -1 where they don't
+					signs = 1 - 2 * ( parities[ a & (numpy.arange(16)[None, :] ^ candidates[:, None]) ][:, :, None] ^ parities[ b & numpy.arange(4) ][None, None, :] )
+					score += table[a][b] * (signs * histogram[None, :, :]).sum(axis=(1, 2))
+		scores.append(score)
+
+	return scores
+
+def _top(counts, keep):
+	""" The `keep` best candidates of a count array, best first. """
+	return numpy.argsort(-counts, kind='stable')[:keep].tolist()
+
+def sdes_attack(cipher, n=4096, method='differential', keep=2, seed=None):
+	""" Recovers an SDES key from an encryption oracle.
+
+	Parameters
+	----------
+	cipher : SDES.SDESCipher
+		The oracle. Only its encryption is used.
+	n : int
+		The number of chosen-plaintext pairs (differential) or known plaintexts (linear).
+	method : string
+		The attack. [differential, linear]
+	keep : int
+		The number of best candidates kept for each subkey nibble.
+	seed : int
+		The seed of the random plaintexts.
+
+	Returns
+	-------
+	[int]
+		The keys consistent with the data, in ascending order.
+	"""
+
+	_require_numpy()
+	if method == 'differential':
+		# Any nonzero plaintext difference will do, since the last round is fully observable
+		plaintexts, partners, ciphertexts, partner_ciphertexts = chosen_pairs(cipher, n, 0x0f, seed)
+		counts = sdes_differential_counts(plaintexts, partners, ciphertexts, partner_ciphertexts)
+	else:
+		plaintexts, ciphertexts = known_plaintexts(cipher, n, seed)
+		counts = sdes_linear_counts(plaintexts, ciphertexts)
+
+	subkeys = { k0 << 4 | k1 for k0 in _top(counts[0], keep) for k1 in _top(counts[1], keep) }
+	return _sdes_keys(subkeys, plaintexts, ciphertexts)
+
+'''
+SAES. The attacks guess nibbles of the last round key K2, undoing the last round (SubNibbles then ShiftRows) to get
+back to the output of the first round, and test a characteristic or approximation through the first round there.
+'''
+SAES_INVERSE_SBOX = tuple( SAES.sub_nibble(n, inverse=True) for n in range(16) )
+
+def _nibble(state, position):
+	""" The nibble at `position` (0 being the most significant) of a state, or an array of them. """
+	return state >> (12 - 4 * position) & 0xf
+
+def mask_through(function, mask, bits=16):
+	""" Moves a linear mask back through a GF(2)-linear function: returns `m` with parity(mask & function(x)) == parity(m & x) for every x. """
+	return sum( parity(mask & function(1 << i)) << i for i in range(bits) )
+
+def _saes_round(state):
+	""" ShiftRows then MixColumns, the linear part of the first round, on a 16-bit state. """
+	state = SAES.shift_rows( [ _nibble(state, p) for p in range(4) ] )
+	mixed = SAES.mix_columns(state)
+	return mixed[0] << 12 ^ mixed[1] << 8 ^ mixed[2] << 4 ^ mixed[3]
+
+def saes_key_from_round_key(K2):
+	""" Inverts the key expansion: the 16-bit key whose last round key is `K2`. """
+	w4, w5 = K2 >> 8, K2 & 0xff
+	w3 = w4 ^ w5
+	w2 = w4 ^ SAES.sub_word( SAES.rot_word(w3) ) ^ 0x30
+	w1 = w2 ^ w3
+	w0 = w2 ^ SAES.sub_word( SAES.rot_word(w1) ) ^ 0x80
+	return w0 << 8 | w1
+
+def saes_characteristic(position, table=None):
+	""" The best one-round differential characteristic from a difference in a single plaintext nibble.
+
+	Returns
+	-------
+	int
+		The plaintext difference.
+	int
+		The difference it most often causes at the output of the first round (after MixColumns).
+	float
+		The probability of the characteristic.
+	"""
+
+	dx, dy, count = best_differential(table or ddt(SAES.sub_nibble))
+	return dx << (12 - 4 * position), SAES.spread(dy, position, [1, 4, 4, 1]), count / 16
+
+def saes_differential_counts(ciphertexts, partner_ciphertexts, round_difference):
+	""" Counts, for each candidate nibble of K2, the pairs where undoing the last round gives the expected first round output difference.
+
+	Parameters
+	----------
+	ciphertexts, partner_ciphertexts : numpy.ndarray
+		The ciphertexts of each pair.
+	round_difference : int
+		The expected difference at the output of the first round. (See `saes_characteristic`)
+
+	Returns
+	-------
+	dict
+		The 16 counts of each K2 nibble the characteristic reaches, by its position.
+	"""
+
+	_require_numpy()
+	inverse = numpy.array(SAES_INVERSE_SBOX)
+	candidates = numpy.arange(16)[:, None]
+	bins = numpy.arange(256)[None, :]
+
+	counts = {}
+	for p in range(4):
+		expected = _nibble(round_difference, p)
+		if not expected:
+			continue
+		# The first round output nibble at p leaves the last round as ciphertext nibble SHIFTED[p]
+		q = SAES.SHIFTED[p]
+		agrees = (inverse[ (bins >> 4) ^ candidates ] ^ inverse[ (bins & 0xf) ^ candidates ]) == expected
+		counts[q] = agrees.astype(numpy.int64) @ _histogram( _nibble(ciphertexts, q) << 4 | _nibble(partner_ciphertexts, q), 256 )
+
+	return counts
+
+def saes_approximation(column, table=None):
+	""" The best one-round linear approximation ending on a column of the first round's output.
+
+	Every mask on the column's two nibbles is moved back through MixColumns and ShiftRows, and the best approximation
+	of each S-box it reaches is combined with the piling-up lemma.
+
+	Returns
+	-------
+	int
+		The plaintext mask.
+	int
+		The mask on the first round's output. (Within the column)
+	float
+		The correlation of the approximation, up to its (key dependent) sign.
+	"""
+
+	table = table or lat(SAES.sub_nibble)
+	best = (0, 0, 0.0)
+	for u in range(1, 256):
+		mask = u << (8 - 8 * column)
+		sbox_mask = mask_through(_saes_round, mask)
+
+		plaintext_mask, correlation = 0, 1.0
+		for p in range(4):
+			b = _nibble(sbox_mask, p)
+			if b:
+				a, bias = best_approximation(table, b)
+				plaintext_mask |= a << (12 - 4 * p)
+				correlation *= bias / 8
+		if abs(correlation) > abs(best[2]):
+			best = (plaintext_mask, mask, correlation)
+
+	return best
+
+def saes_linear_counts(plaintexts, ciphertexts, plaintext_mask, round_mask, column):
+	""" Scores each candidate for the two K2 nibbles of a column by the bias of the approximation after undoing the last round with it.
+
+	Returns
+	-------
+	numpy.ndarray
+		The absolute bias counts of the 256 candidates, as (nibble at SHIFTED[top] << 4 | nibble at SHIFTED[bottom]).
+	"""
+
+	_require_numpy()
+	inverse = numpy.array(SAES_INVERSE_SBOX)
+	parities = numpy.array( [ parity(n) for n in range(16) ] )
+	top, bottom = 2 * column, 2 * column + 1
+	q_top, q_bottom = SAES.SHIFTED[top], SAES.SHIFTED[bottom]
+	v_top, v_bottom = _nibble(round_mask, top), _nibble(round_mask, bottom)
+
+	plaintext_parity = numpy.zeros(len(plaintexts), dtype=numpy.int64)
+	for p in range(4):
+		plaintext_parity ^= parities[ _nibble(plaintexts & plaintext_mask, p) ]
+	histogram = _histogram( plaintext_parity << 8 | _nibble(ciphertexts, q_top) << 4 | _nibble(ciphertexts, q_bottom), 512 )
+
+	bins = numpy.arange(512)[None, :]
+	candidates = numpy.arange(256)[:, None]
+	signs = 1 - 2 * ( (bins >> 8) ^ parities[ v_top & inverse[ (bins >> 4 & 0xf) ^ (candidates >> 4) ] ] ^ parities[ v_bottom & inverse[ (bins & 0xf) ^ (candidates & 0xf) ] ] )
+
+	return numpy.abs( signs @ histogram )
+
+def saes_attack(cipher, n=4096, method='differential', keep=2, seed=None):
+	""" Recovers an SAES key from an encryption oracle, attacking each column of K2 in turn.
+
+	Parameters
+	----------
+	cipher : SAES.SAESCipher
+		The oracle. Only its encryption is used.
+	n : int
+		The number of chosen-plaintext pairs (differential) or known plaintexts (linear) per column.
+	method : string
+		The attack. [differential, linear]
+	keep : int
+		The number of best candidates kept for each K2 nibble (differential) or pair of nibbles (linear).
+	seed : int
+		The seed of the random plaintexts.
+
+	Returns
+	-------
+	[int]
+		The keys consistent with the data, in ascending order.
+	"""
+
+	_require_numpy()
+	rng = numpy.random.default_rng(seed)
+
+	# The candidates for each column's half of K2, as partial round keys
+	columns = []
+	for column in range(2):
+		q_top, q_bottom = SAES.SHIFTED[2 * column], SAES.SHIFTED[2 * column + 1]
+		if method == 'differential':
+			# The plaintext nibble that ShiftRows moves to the top of this column
+			difference, round_difference, _ = saes_characteristic( SAES.SHIFTED.index(2 * column) )
+			plaintexts, _, ciphertexts, partner_ciphertexts = chosen_pairs(cipher, n, difference, rng)
+			counts = saes_differential_counts(ciphertexts, partner_ciphertexts, round_difference)
+			guesses = [ (top, bottom) for top in _top(counts[q_top], keep) for bottom in _top(counts[q_bottom], keep) ]
+		else:
+			plaintext_mask, round_mask, _ = saes_approximation(column)
+			plaintexts, ciphertexts = known_plaintexts(cipher, n, rng)
+			guesses = [ (k >> 4, k & 0xf) for k in _top( saes_linear_counts(plaintexts, ciphertexts, plaintext_mask, round_mask, column), keep ) ]
+
+		columns.append([ top << (12 - 4 * q_top) | bottom << (12 - 4 * q_bottom) for top, bottom in guesses ])
+
+	known = list( zip(plaintexts[:4].tolist(), ciphertexts[:4].tolist()) )
+	keys = { saes_key_from_round_key(first | second) for first in columns[0] for second in columns[1] }
+	return sorted( key for key in keys if all( SAES.fast_F(p, key) == c for p, c in known ) )
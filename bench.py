@@ -0,0 +1,180 @@
+#!/usr/bin/python3.8
+"""
+ bench.py
+ Throughput benchmarks for the file modes, with regression tracking.
+
+ Every combination of cipher, mode, backend, single/concurrent processing, chunk size and worker count is timed on
+ a deterministic input file. Each case runs in a fresh child process, so its peak RSS isn't inflated by the cases
+ before it. Results are plain JSON, so a run can be stored as a baseline and later runs compared against it.
+"""
+
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+try:
+	import resource
+except ImportError:
+	resource = None
+
+import modes
+
+# Fixed keys and IV, so every run processes exactly the same data
+KEYS = {'sdes': '1010000010', 'saes': 'a73b'}
+IV = 0x5a
+
+def deterministic_input(size, seed=0):
+	""" Returns `size` pseudo-random bytes, the same for every run with the same seed. """
+	return random.Random(seed).getrandbits(8 * size).to_bytes(size, 'little') if size else bytes()
+
+def case_name(case):
+	""" The key identifying a case across runs, e.g. 'saes/ctr/numpy/concurrent/65536/4'. """
+	return '/'.join( str(case[field]) for field in ('cipher', 'mode', 'backend', 'processing', 'chunk_size', 'workers') )
+
+def cases(ciphers, mode_names, backends, chunk_sizes, workers):
+	""" Lists every benchmark case. Single-threaded cases only run once per chunk size, rather than once per worker count. """
+	for cipher, mode, backend, chunk_size in itertools.product(ciphers, mode_names, backends, chunk_sizes):
+		yield dict(cipher=cipher, mode=mode, backend=backend, processing='single', chunk_size=chunk_size, workers=1)
+		for count in workers:
+			yield dict(cipher=cipher, mode=mode, backend=backend, processing='concurrent', chunk_size=chunk_size, workers=count)
+
+def peak_rss():
+	""" The peak resident set size of this process or any of its (pool worker) children, in MB. None where unavailable. """
+	if resource is None:
+		return None
+
+	peak = max( resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss )
+	# Linux reports kilobytes, macOS bytes
+	return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
+
+def run_case(case, input_filename, output_filename, repeats=3):
+	""" Times one case, keeping the best of `repeats` runs. Decrypts, since that's the direction every mode can parallelize. """
+
+	size = os.path.getsize(input_filename)
+	start = time.perf_counter()
+	key = modes.make_cipher(case['cipher'], KEYS[case['cipher']], size)
+	setup = time.perf_counter() - start
+
+	options = dict(chunk_size=case['chunk_size'], multithreaded=case['processing'] == 'concurrent', max_workers=case['workers'], backend=case['backend'])
+
+	times = []
+	for _ in range(repeats):
+		start = time.perf_counter()
+		if case['mode'] == 'ecb':
+			modes.ecb_file(input_filename, output_filename, key, encrypt=False, **options)
+		elif case['mode'] == 'cbc':
+			modes.cbc_file(input_filename, output_filename, key, IV, encrypt=False, **options)
+		else:
+			modes.ctr_file(input_filename, output_filename, key, IV, **options)
+		times.append(time.perf_counter() - start)
+
+	seconds = min(times)
+	return dict(case,
+		name=case_name(case),
+		size=size,
+		setup_seconds=setup,
+		seconds=seconds,
+		mb_per_s=size / seconds / 1e6,
+		blocks_per_s=size / key.blocksize / seconds,
+		peak_rss_mb=peak_rss(),
+	)
+
+def benchmark(size=1 << 20, ciphers=('sdes', 'saes'), mode_names=modes.SUPPORTED_MODES, backends=None, chunk_sizes=(65536,), workers=None, repeats=3, seed=0):
+	""" Runs the benchmark grid.
+
+	Parameters
+	----------
+	size : int
+		The byte-size of the input file.
+	ciphers : [string]
+		The ciphers to benchmark. [sdes, saes]
+	mode_names : [string]
+		The modes to benchmark. [ecb, cbc, ctr]
+	backends : [string]
+		The backends to benchmark. Defaults to every backend that's available.
+	chunk_sizes : [int]
+		The chunk sizes to benchmark.
+	workers : [int]
+		The worker counts to benchmark concurrent processing with. Defaults to the number of processors.
+	repeats : int
+		The number of times each case is run. The fastest is kept.
+	seed : int
+		The seed of the input data.
+
+	Yields
+	------
+	dict
+		The result of each case, as it completes.
+	"""
+
+	if backends is None:
+		backends = [ b for b in modes.SUPPORTED_BACKENDS if b != 'numpy' or modes.HAVE_NUMPY ]
+	if workers is None:
+		workers = [ os.cpu_count() or 1 ]
+
+	# Import NumPy up front, so the forked cases inherit it rather than timing its import
+	if 'numpy' in backends:
+		modes.load_numpy()
+
+	with tempfile.TemporaryDirectory() as directory:
+		input_filename = os.path.join(directory, 'input')
+		output_filename = os.path.join(directory, 'output')
+		with open(input_filename, 'wb') as input_file:
+			input_file.write( deterministic_input(size, seed) )
+
+		# A fresh process per case keeps the peak RSS of each case separate. Forked where possible, since a spawned
+		# process would also spawn its own worker pools, adding interpreter start-up to every concurrent case
+		context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn')
+		for case in cases(ciphers, mode_names, backends, chunk_sizes, workers):
+			with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+				yield executor.submit(run_case, case, input_filename, output_filename, repeats).result()
+
+def report(results, size):
+	""" The JSON document for a benchmark run. """
+	return {
+		'size': size,
+		'python': platform.python_version(),
+		'machine': platform.machine(),
+		'processors': os.cpu_count(),
+		'numpy': modes.HAVE_NUMPY,
+		'results': results,
+	}
+
+def compare(results, baseline, threshold=0.1):
+	""" Compares results against a baseline run.
+
+	Parameters
+	----------
+	results : [dict]
+		The current results.
+	baseline : dict
+		A previous `report`.
+	threshold : float
+		The fraction of throughput a case can lose before it counts as a regression.
+
+	Returns
+	-------
+	[(string, float, float)]
+		The (case name, baseline MB/s, current MB/s) of each regressed case. Cases missing from either run are skipped.
+	"""
+
+	previous = { result['name']: result['mb_per_s'] for result in baseline['results'] }
+	return [ (result['name'], previous[result['name']], result['mb_per_s']) for result in results
+			 if result['name'] in previous and result['mb_per_s'] < previous[result['name']] * (1 - threshold) ]
+
+def load(filename):
+	""" Loads a stored benchmark report. """
+	with open(filename) as f:
+		return json.load(f)
+
+def save(document, filename):
+	""" Stores a benchmark report. """
+	with open(filename, 'w') as f:
+		json.dump(document, f, indent=2)
@@ -0,0 +1,328 @@
+#!/usr/bin/python3.8
+"""
+ bitslice.py
+ Bitsliced SDES and SAES, processing many blocks per integer operation.
+
+ The data is transposed so that slice `i` is a single (arbitrary-precision) integer holding bit `i` of every block,
+ one block per bit. Permutations are then just relabelings of the slices, linear layers (like MixColumns) are XORs
+ of slices, and the S-boxes are evaluated as boolean circuits of ANDs and XORs. Every operation handles all of the
+ blocks at once, which suits CTR keystreams and key searches, where thousands of independent blocks are available.
+
+ All of the wiring is derived from the reference implementations in SDES.py and SAES.py when this module is
+ imported, so it can't drift from them.
+"""
+
+import SDES
+import SAES
+import modes
+
+'''
+Transposition between bytes and bit slices. Block `j` of `n` is bit `n - 1 - j` of each slice.
+'''
+# Maps 0/1 bytes to ASCII '0'/'1', so int(..., 2) can pack them at C speed
+_ASCII_BITS = bytes.maketrans(b'\x00\x01', b'01')
+
+def _low_bit_mask(n_blocks, blocksize):
+	""" An integer with the lowest bit of each block's last byte set. """
+	return int.from_bytes( (bytes(blocksize - 1) + b'\x01') * n_blocks, 'big' )
+
+def to_slices(data, blocksize=1):
+	""" Transposes whole-block data into its `8 * blocksize` bit slices, most significant bit first. """
+	n_blocks = len(data) // blocksize
+	if n_blocks == 0:
+		return [0] * (8 * blocksize)
+
+	width = 8 * blocksize
+	value = int.from_bytes(data, 'big')
+	mask = _low_bit_mask(n_blocks, blocksize)
+
+	slices = []
+	for i in range(width):
+		bits = ( (value >> (width - 1 - i)) & mask ).to_bytes(len(data), 'big')[blocksize - 1 :: blocksize]
+		slices.append( int(bits.translate(_ASCII_BITS), 2) )
+
+	return slices
+
+def from_slices(slices, n_blocks, blocksize=1):
+	""" Transposes bit slices back into `n_blocks` big endian blocks. The inverse of `to_slices`. """
+	if n_blocks == 0:
+		return bytes()
+
+	width = 8 * blocksize
+	mask = _low_bit_mask(n_blocks, blocksize)
+
+	value = 0
+	for i, s in enumerate(slices):
+		# ASCII '0'/'1' only differ in their lowest bit
+		spread = bytearray(n_blocks * blocksize)
+		spread[blocksize - 1 :: blocksize] = format(s, f'0{n_blocks}b').encode()
+		value |= (int.from_bytes(spread, 'big') & mask) << (width - 1 - i)
+
+	return value.to_bytes(n_blocks * blocksize, 'big')
+
+def constant_slices(value, width, ones):
+	""" The slices of `width`-bit `value` repeated in every block. """
+	return [ ones if value >> (width - 1 - i) & 1 else 0 for i in range(width) ]
+
+'''
+Circuits, derived from the reference functions.
+'''
+def linear_map(function, in_size, out_size):
+	""" Derives the wiring of a GF(2)-linear function (a permutation, expansion or MixColumns) from its outputs on each single-bit input.
+
+	Returns
+	-------
+	[[int]]
+		For each output bit (most significant first), the input bits that are XORed together to make it.
+	"""
+	columns = [ function(1 << (in_size - 1 - i)) for i in range(in_size) ]
+	return [ [ i for i in range(in_size) if columns[i] >> (out_size - 1 - j) & 1 ] for j in range(out_size) ]
+
+def apply_linear(slices, mapping):
+	""" Applies a `linear_map` wiring to bit slices. """
+	output = []
+	for sources in mapping:
+		x = 0
+		for i in sources:
+			x ^= slices[i]
+		output.append(x)
+
+	return output
+
+def sbox_circuit(sbox, out_size):
+	""" Derives a boolean circuit for a 4-bit input S-box, as the algebraic normal form of each output bit.
+
+	Returns
+	-------
+	[[int]]
+		For each output bit (most significant first), the monomials XORed together to make it. Monomial `v` is the AND of the input bits set in `v`.
+	"""
+	truth = [ sbox(v) for v in range(16) ]
+
+	circuit = []
+	for j in range(out_size):
+		# Moebius transform of the output bit's truth table
+		anf = [ t >> (out_size - 1 - j) & 1 for t in truth ]
+		for i in range(4):
+			for v in range(16):
+				if v >> i & 1:
+					anf[v] ^= anf[v ^ (1 << i)]
+		circuit.append( [ v for v in range(16) if anf[v] ] )
+
+	return circuit
+
+def apply_sbox(x, circuit, ones):
+	""" Evaluates an `sbox_circuit` on 4 input slices. `ones` is the all-blocks mask. """
+	# Every product of the inputs, built up one AND at a time
+	products = [ones] * 16
+	for v in range(1, 16):
+		low = v & -v
+		products[v] = products[v ^ low] & x[4 - low.bit_length()]
+
+	output = []
+	for monomials in circuit:
+		y = 0
+		for v in monomials:
+			y ^= products[v]
+		output.append(y)
+
+	return output
+
+def _saes_state(num):
+	return [ num >> 12 & 0xf, num >> 8 & 0xf, num >> 4 & 0xf, num & 0xf ]
+
+def _saes_int(state):
+	return (state[0] << 12) ^ (state[1] << 8) ^ (state[2] << 4) ^ state[3]
+
+def _sdes_subkeys(key):
+	K1, K2 = SDES.generate_subkeys(key)
+	return (K1 << 8) ^ K2
+
+SDES_IP = linear_map(SDES.IP, 8, 8)
+SDES_IP_INVERSE = linear_map(SDES.IP_inverse, 8, 8)
+SDES_E_P = linear_map(SDES.E_P, 4, 8)
+SDES_P4 = linear_map(SDES.P4, 4, 4)
+SDES_SUBKEYS = linear_map(_sdes_subkeys, 10, 16)
+SDES_S0 = sbox_circuit(SDES.S0, 2)
+SDES_S1 = sbox_circuit(SDES.S1, 2)
+
+SAES_SBOX = sbox_circuit(SAES.sub_nibble, 4)
+SAES_INVERSE_SBOX = sbox_circuit(lambda v: SAES.sub_nibble(v, inverse=True), 4)
+SAES_SHIFT_ROWS = linear_map(lambda v: _saes_int( SAES.shift_rows(_saes_state(v)) ), 16, 16)
+SAES_MIX_COLUMNS = linear_map(lambda v: _saes_int( SAES.mix_columns(_saes_state(v)) ), 16, 16)
+SAES_INVERSE_MIX_COLUMNS = linear_map(lambda v: _saes_int( SAES.mix_columns(_saes_state(v), inverse=True) ), 16, 16)
+
+'''
+Bitsliced ciphers. Keys are given as slices too, so a lane can hold either another block under the same key, or the same block under another key.
+'''
+def _xor(a, b):
+	return [ x ^ y for x, y in zip(a, b) ]
+
+def sdes_f_K(state, subkey, ones):
+	""" One bitsliced round of the SDES Feistel cipher. """
+	left, right = state[:4], state[4:]
+
+	data = _xor( apply_linear(right, SDES_E_P), subkey )
+	data = apply_sbox(data[:4], SDES_S0, ones) + apply_sbox(data[4:], SDES_S1, ones)
+	data = apply_linear(data, SDES_P4)
+
+	return _xor(left, data) + right
+
+def sdes_slices(state, key, ones, encrypt=True):
+	""" Bitsliced SDES on 8 state slices, with a 10-slice key. """
+	subkeys = apply_linear(key, SDES_SUBKEYS)
+	K1, K2 = (subkeys[:8], subkeys[8:]) if encrypt else (subkeys[8:], subkeys[:8])
+
+	state = apply_linear(state, SDES_IP)
+	state = sdes_f_K(state, K1, ones)
+	state = sdes_f_K(state[4:] + state[:4], K2, ones)
+
+	return apply_linear(state, SDES_IP_INVERSE)
+
+def _sub_nibbles(state, circuit, ones):
+	return [ y for i in range(0, 16, 4) for y in apply_sbox(state[i : i + 4], circuit, ones) ]
+
+def saes_expand_key(key, ones):
+	""" Bitsliced SAES key expansion, as in `SAES.expand_key`. Returns the three 16-slice round keys. """
+	def sub_word(w):
+		return apply_sbox(w[:4], SAES_SBOX, ones) + apply_sbox(w[4:], SAES_SBOX, ones)
+
+	def rot_word(w):
+		return w[4:] + w[:4]
+
+	w0, w1 = key[:8], key[8:]
+	w2 = _xor( _xor(w0, sub_word(rot_word(w1))), constant_slices(0x80, 8, ones) )
+	w3 = _xor(w2, w1)
+	w4 = _xor( _xor(w2, sub_word(rot_word(w3))), constant_slices(0x30, 8, ones) )
+	w5 = _xor(w4, w3)
+
+	return w0 + w1, w2 + w3, w4 + w5
+
+def saes_slices(state, roundkeys, ones, encrypt=True):
+	""" Bitsliced SAES on 16 state slices, with round keys from `saes_expand_key`. """
+	K0, K1, K2 = roundkeys
+
+	if encrypt:
+		state = _xor(state, K0)
+		state = apply_linear( apply_linear( _sub_nibbles(state, SAES_SBOX, ones), SAES_SHIFT_ROWS ), SAES_MIX_COLUMNS )
+		state = _xor(state, K1)
+		state = apply_linear( _sub_nibbles(state, SAES_SBOX, ones), SAES_SHIFT_ROWS )
+		state = _xor(state, K2)
+	else:
+		state = _xor(state, K2)
+		state = _sub_nibbles( apply_linear(state, SAES_SHIFT_ROWS), SAES_INVERSE_SBOX, ones )
+		state = apply_linear( _xor(state, K1), SAES_INVERSE_MIX_COLUMNS )
+		state = _sub_nibbles( apply_linear(state, SAES_SHIFT_ROWS), SAES_INVERSE_SBOX, ones )
+		state = _xor(state, K0)
+
+	return state
+
+'''
+Bulk processing under a single key.
+'''
+def supports(cipher):
+	""" Whether the keyed cipher object has a bitsliced implementation. """
+	return isinstance(cipher, (SDES.SDESCipher, SAES.SAESCipher))
+
+def _process_slices(cipher, state, ones, encrypt=True):
+	if isinstance(cipher, SDES.SDESCipher):
+		return sdes_slices(state, constant_slices(cipher.key, 10, ones), ones, encrypt)
+	else:
+		return saes_slices(state, saes_expand_key( constant_slices(cipher.key, 16, ones), ones ), ones, encrypt)
+
+def ecb(cipher, input_data, encrypt=True):
+	""" Encrypts or decrypts whole-block data under a keyed cipher object, all blocks at once.
+
+	Parameters
+	----------
+	cipher : SDES.SDESCipher or SAES.SAESCipher
+		The keyed cipher to use.
+	input_data : bytes-like
+		The data to process. (A whole number of blocks)
+	encrypt : bool
+		Whether to encrypt or decrypt the data. Defaults to encryption.
+
+	Returns
+	-------
+	bytes
+		The processed blocks.
+	"""
+	n_blocks = len(input_data) // cipher.blocksize
+	ones = (1 << n_blocks) - 1
+
+	state = _process_slices( cipher, to_slices(bytes(input_data), cipher.blocksize), ones, encrypt )
+	return from_slices(state, n_blocks, cipher.blocksize)
+
+def keystream(cipher, start, n_blocks):
+	""" The CTR keystream for counters `start, start + 1, ...` (wrapping at the block width) under a keyed cipher object. """
+	return ecb(cipher, modes.counter_bytes(start, n_blocks, cipher.blocksize))
+
+'''
+Key searches, one key per lane.
+'''
+def search_keys(cipher, plaintext, ciphertext, start, stop):
+	""" Finds the keys in [start, stop) that encrypt one plaintext block to the ciphertext block.
+
+	Parameters
+	----------
+	cipher : string
+		The cipher algorithm used. [sdes, saes]
+	plaintext : int
+		The known plaintext block.
+	ciphertext : int
+		The matching ciphertext block.
+	start : int
+		The first key to test.
+	stop : int
+		The key to stop before.
+
+	Returns
+	-------
+	[int]
+		The matching keys, in ascending order.
+	"""
+	n_keys = stop - start
+	ones = (1 << n_keys) - 1
+	key = to_slices( b''.join( k.to_bytes(2, 'big') for k in range(start, stop) ), 2 )
+
+	if cipher == 'sdes':
+		width = 8
+		output = sdes_slices( constant_slices(plaintext, width, ones), key[6:], ones )
+	else:
+		width = 16
+		output = saes_slices( constant_slices(plaintext, width, ones), saes_expand_key(key, ones), ones )
+
+	# A lane matches when every output bit equals the ciphertext's
+	match = ones
+	for s, expected in zip(output, constant_slices(ciphertext, width, ones)):
+		match &= ~(s ^ expected) & ones
+
+	return [ start + j for j in range(n_keys) if match >> (n_keys - 1 - j) & 1 ]
+
+def benchmark(size=1 << 16, repeats=5):
+	""" Times bitsliced ECB and CTR keystream against the table-driven paths, printing MB/s for each. """
+	import os
+	import time
+
+	def best_time(function):
+		times = []
+		for _ in range(repeats):
+			start = time.perf_counter()
+			function()
+			times.append(time.perf_counter() - start)
+		return min(times)
+
+	data = os.urandom(size)
+	for name, cipher in (('SDES', SDES.SDESCipher(0b1010000010)), ('SAES', SAES.SAESCipher(0xa73b, tables=True))):
+		n_blocks = size // cipher.blocksize
+		for backend in ('bitslice', 'python'):
+			ecb_time = best_time( lambda: modes.ecb(data, cipher, backend=backend) )
+			ctr_time = best_time( lambda: modes.keystream(cipher, 0, 0, n_blocks, backend=backend) )
+			print(f"{name} {backend:8}\tECB {size / ecb_time / 1e6:8.2f} MB/s\tCTR {size / ctr_time / 1e6:8.2f} MB/s")
+
+	start = time.perf_counter()
+	SAES.SAESCipher(0xa73b, tables=True)
+	print(f"SAES codebook build\t{time.perf_counter() - start:8.3f} s")
+
+if __name__ == "__main__":
+	benchmark()
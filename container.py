@@ -0,0 +1,193 @@
+#!/usr/bin/python3.8
+"""
+ container.py
+ A self-describing file format for encrypted data.
+
+ The header records everything needed to decrypt the file except the key: the cipher, mode, IV/nonce, block size,
+ original length and padding. Every mode keeps the data the same length as the plaintext, so plaintext byte `n` is
+ data byte `n`, and any byte range can be decrypted by reading just that range. (CBC also reads the ciphertext block
+ before it.)
+
+ Layout (big endian):
+   magic        4s   b'SDPY'
+   version      B
+   cipher       B    index into CIPHERS
+   mode         B    index into MODES
+   blocksize    B
+   padding      B    index into PADDINGS
+   (reserved)   3x
+   iv           Q    IV or nonce (0 for ECB)
+   length       Q    original length in bytes
+   chunk_size   I
+   data
+"""
+
+import collections
+import struct
+import time
+
+import modes
+
+MAGIC = b'SDPY'
+VERSION = 1
+CIPHERS = ('sdes', 'saes')
+MODES = ('ecb', 'cbc', 'ctr')
+# Every mode keeps the output the same length as the input, so nothing is padded
+PADDINGS = ('none',)
+
+HEADER = struct.Struct('>4sBBBBB3xQQI')
+
+Header = collections.namedtuple('Header', ('cipher', 'mode', 'blocksize', 'padding', 'iv', 'length', 'chunk_size'))
+
+def is_container(filename):
+	""" Whether the file starts with the container magic. """
+	with open(filename, 'rb') as f:
+		return f.read(len(MAGIC)) == MAGIC
+
+def pack_header(header):
+	""" Serializes a `Header`. """
+	return HEADER.pack(MAGIC, VERSION, CIPHERS.index(header.cipher), MODES.index(header.mode), header.blocksize, PADDINGS.index(header.padding),
+					   header.iv, header.length, header.chunk_size)
+
+def read_header(f):
+	""" Reads and checks the header at the start of an open container file, leaving the file at the start of the data. """
+
+	fixed = f.read(HEADER.size)
+	if len(fixed) < HEADER.size:
+		raise ValueError("File is too short to be a container!")
+
+	magic, version, cipher, mode, blocksize, padding, iv, length, chunk_size = HEADER.unpack(fixed)
+	if magic != MAGIC:
+		raise ValueError("File is not a container!")
+	if version != VERSION:
+		raise ValueError(f"Container version {version} is not supported!")
+
+	return Header(CIPHERS[cipher], MODES[mode], blocksize, PADDINGS[padding], iv, length, chunk_size)
+
+def make_header(cipher, mode, key, iv, length, chunk_size=65536):
+	""" Builds the header for `length` bytes of data. """
+	chunk_size -= chunk_size % key.blocksize
+
+	return Header(cipher, mode, key.blocksize, 'none', iv if mode != 'ecb' else 0, length, chunk_size)
+
+def encrypt_file(input_filename, output_filename, cipher, key, mode, iv=0, chunk_size=65536, backend=None, metrics=None):
+	""" Encrypts a file into a container.
+
+	Parameters
+	----------
+	input_filename : string
+		The name of the file to encrypt.
+	output_filename : string
+		The name of the container to write.
+	cipher : string
+		The cipher algorithm of `key`. [sdes, saes]
+	key : cipher object
+		The keyed cipher object to encrypt with.
+	mode : string
+		The cipher mode to use. [ecb, cbc, ctr]
+	iv : int
+		The IV or nonce to use, which is stored in the header.
+	chunk_size : int
+		The byte-size of the chunks the file is processed in.
+	backend : string
+		The backend to use. [python, numpy, bitslice] See `modes.select_backend`.
+	metrics : modes.Metrics
+		Collects statistics about the job as each chunk completes, if given.
+
+	Returns
+	-------
+	Header
+		The header written.
+	"""
+
+	with open(input_filename, 'rb') as input_file, open(output_filename, 'wb') as output_file:
+		input_file.seek(0, 2)
+		header = make_header(cipher, mode, key, iv, input_file.tell(), chunk_size)
+		input_file.seek(0)
+
+		output_file.write( pack_header(header) )
+		modes.process_stream(input_file, output_file, modes.CipherContext(mode, key, header.iv, True, backend=backend), header.chunk_size, metrics)
+
+	return header
+
+class ContainerReader:
+	""" Random-access decryption of a container. Only the bytes of a requested range (plus at most a block either side) are read.
+
+	Parameters
+	----------
+	filename : string
+		The container to read.
+	key : cipher object
+		The keyed cipher object to decrypt with. Its blocksize must match the header's.
+	backend : string
+		The backend to use. [python, numpy, bitslice] See `modes.select_backend`.
+	"""
+
+	def __init__(self, filename, key, backend=None):
+		self.file = open(filename, 'rb')
+		self.header = read_header(self.file)
+		self.key = key
+		self.backend = backend
+
+		if key.blocksize != self.header.blocksize:
+			self.file.close()
+			raise ValueError(f"The container was made with {self.header.cipher.upper()}, which the key isn't for!")
+
+	def close(self):
+		self.file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	def _read(self, offset, length):
+		self.file.seek(HEADER.size + offset)
+		return self.file.read(length)
+
+	def read(self, offset, length):
+		""" Decrypts the plaintext bytes [offset, offset + length), clipped to the original length. """
+		header = self.header
+		length = max(0, min(length, header.length - offset))
+		if length == 0:
+			return bytes()
+
+		blocksize = header.blocksize
+		if header.mode == 'ctr':
+			return modes.ctr_at(self._read(offset, length), self.key, header.iv, offset, backend=self.backend)
+
+		# ECB and CBC work on whole blocks, so read from the block containing `offset` to the end of the block containing the last byte
+		start = offset - offset % blocksize
+		stop = min(-(-(offset + length) // blocksize) * blocksize, header.length)
+		if header.mode == 'ecb':
+			output = modes.ecb(self._read(start, stop - start), self.key, encrypt=False, backend=self.backend)
+		else:
+			# The chaining value is the ciphertext block before the range, or the IV at the start
+			iv = int.from_bytes( self._read(start - blocksize, blocksize), 'big' ) if start else header.iv
+			output, _ = modes.cbc(self._read(start, stop - start), self.key, iv, encrypt=False, backend=self.backend)
+
+		return output[offset - start : offset - start + length]
+
+	def decrypt_to(self, output_file, chunk_size=None, metrics=None, offset=0, length=None):
+		""" Decrypts the whole container, or the plaintext bytes [offset, offset + length) of it, into an open binary file, a chunk at a time. """
+		chunk_size = chunk_size or self.header.chunk_size or 65536
+		chunk_size = max(chunk_size - chunk_size % self.header.blocksize, self.header.blocksize)
+		stop = self.header.length if length is None else min(offset + length, self.header.length)
+
+		for position in range(offset, stop, chunk_size):
+			start = time.perf_counter()
+			output = self.read(position, min(chunk_size, stop - position))
+			if metrics is not None:
+				metrics.chunk(len(output), time.perf_counter() - start)
+			output_file.write(output)
+
+		if metrics is not None:
+			metrics.finish()
+
+def decrypt_file(input_filename, output_filename, key, backend=None, metrics=None):
+	""" Decrypts a whole container into a file. Returns the container's `Header`. """
+	with ContainerReader(input_filename, key, backend) as reader, open(output_filename, 'wb') as output_file:
+		reader.decrypt_to(output_file, metrics=metrics)
+
+	return reader.header
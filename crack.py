@@ -0,0 +1,277 @@
+#!/usr/bin/python3.8
+"""
+ crack.py
+ Key recovery for SDES and SAES by exhaustive search.
+
+ Both keyspaces are tiny (1024 SDES keys, 65,536 SAES keys), so every key is tested. Keys are first filtered
+ against a single block (vectorized across keys with NumPy for SAES when it's installed, and bitsliced otherwise), and only the survivors
+ are checked against the rest of the known blocks. The keyspace can also be split across processes.
+
+ Without known plaintext, `rank_keys` decrypts a sample of the ciphertext under every key and ranks the keys by
+ how plausible the result looks (entropy, printable ratio, English letter statistics or a file signature).
+"""
+
+import concurrent.futures
+import heapq
+import os
+
+import SDES
+import SAES
+import bitslice
+import entropy
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+CIPHERS = {
+	'sdes': (SDES.fast_F, 1, 1 << 10),
+	'saes': (SAES.fast_F, 2, 1 << 16),
+}
+
+def to_pairs(plaintext, ciphertext, blocksize=1):
+	""" Splits known plaintext and its ECB ciphertext into (plaintext block, ciphertext block) integer pairs. A trailing partial block is ignored. """
+	length = min(len(plaintext), len(ciphertext)) // blocksize * blocksize
+
+	return [ ( int.from_bytes( plaintext[i : i + blocksize], 'big' ), int.from_bytes( ciphertext[i : i + blocksize], 'big' ) )
+			 for i in range(0, length, blocksize) ]
+
+def search_keys(pairs, cipher, start, stop):
+	""" Tests the keys [start, stop) against the known pairs.
+
+	Parameters
+	----------
+	pairs : [(int, int)]
+		The known (plaintext block, ciphertext block) pairs.
+	cipher : string
+		The cipher algorithm used. [sdes, saes]
+	start : int
+		The first key to test.
+	stop : int
+		The key to stop before.
+
+	Returns
+	-------
+	[int]
+		Every key in the range that's consistent with all of the pairs.
+	"""
+
+	F = CIPHERS[cipher][0]
+	first_plaintext, first_ciphertext = pairs[0]
+
+	# Early exit: only keys matching the first block are checked any further. NumPy is the fastest for SAES, bitslicing otherwise
+	if cipher == 'saes' and numpy is not None:
+		keys = numpy.arange(start, stop)
+		candidates = keys[ SAES.F_keys(first_plaintext, keys) == first_ciphertext ].tolist()
+	else:
+		candidates = bitslice.search_keys(cipher, first_plaintext, first_ciphertext, start, stop)
+
+	return [ key for key in candidates if all( F(p, key) == c for p, c in pairs[1:] ) ]
+
+def crack(pairs, cipher, max_workers=1):
+	""" Recovers every key consistent with the known plaintext/ciphertext pairs.
+
+	Parameters
+	----------
+	pairs : [(int, int)]
+		The known (plaintext block, ciphertext block) pairs. See `to_pairs`.
+	cipher : string
+		The cipher algorithm used. [sdes, saes]
+	max_workers : int
+		Number of processes to split the keyspace across. Defaults to searching in this process. (None uses every processor)
+
+	Returns
+	-------
+	[int]
+		The consistent keys, in ascending order.
+	"""
+
+	if not pairs:
+		raise ValueError("At least one known plaintext/ciphertext block is needed!")
+
+	keyspace = CIPHERS[cipher][2]
+	if max_workers == 1:
+		return search_keys(pairs, cipher, 0, keyspace)
+
+	workers = max_workers or os.cpu_count() or 1
+	with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+		# One contiguous key range per worker
+		bounds = [ keyspace * i // workers for i in range(workers + 1) ]
+		searches = [ executor.submit(search_keys, pairs, cipher, start, stop) for start, stop in zip(bounds, bounds[1:]) ]
+
+		return [ key for s in searches for key in s.result() ]
+
+
+'''
+Plaintext scores for ciphertext-only searches. Each takes the decrypted bytes and returns a float, where higher means more plausible.
+'''
+def score_entropy(data):
+	""" Scores low-entropy (structured) data highest. """
+	return -entropy.entropy(data)
+
+PRINTABLE = frozenset(b'\t\n\r' + bytes(range(0x20, 0x7f)))
+
+def score_printable(data):
+	""" Scores data by the fraction of its bytes that are printable ASCII. Empty data scores 0. """
+	if not data:
+		return 0.0
+	return sum(b in PRINTABLE for b in data) / len(data)
+
+# Relative letter frequencies of English text, a-z
+ENGLISH_FREQUENCIES = (
+	8.167, 1.492, 2.782, 4.253, 12.702, 2.228, 2.015, 6.094, 6.966, 0.153, 0.772, 4.025, 2.406,
+	6.749, 7.507, 1.929, 0.095, 5.987, 6.327, 9.056, 2.758, 0.978, 2.360, 0.150, 1.974, 0.074)
+
+def score_english(data):
+	""" Scores data by a chi-squared test against English text. Bytes are bucketed as letters (case-insensitive), spaces and anything else. Empty data scores 0. """
+	if not data:
+		return 0.0
+
+	letters = sum(ENGLISH_FREQUENCIES)
+	expected = [ 0.80 * f / letters for f in ENGLISH_FREQUENCIES ] + [0.18, 0.02]
+
+	observed = [0] * 28
+	for b in data:
+		if 0x41 <= b <= 0x5a or 0x61 <= b <= 0x7a:
+			observed[(b | 0x20) - 0x61] += 1
+		elif b == 0x20:
+			observed[26] += 1
+		else:
+			observed[27] += 1
+
+	return -sum( (o - e * len(data)) ** 2 / (e * len(data)) for o, e in zip(observed, expected) )
+
+# Leading bytes of common file formats
+FILE_MAGIC = (b'%PDF', b'\x89PNG', b'GIF8', b'\xff\xd8\xff', b'BM', b'PK\x03\x04', b'\x1f\x8b', b'\x7fELF', b'MZ', b'{\\rtf', b'<?xml', b'<!DOCTYPE', b'<html')
+
+def score_magic(data):
+	""" Scores data starting with a known file signature as 1, and everything else as 0. """
+	return float( data.startswith(FILE_MAGIC) )
+
+SCORERS = {
+	'entropy': score_entropy,
+	'printable': score_printable,
+	'english': score_english,
+	'magic': score_magic,
+}
+
+def minimum_blocks(mode='ecb', iv=None):
+	""" The number of whole ciphertext blocks a ciphertext-only search needs: one, or two for CBC without the IV (whose first block is only a chaining value). """
+	return 2 if mode == 'cbc' and iv is None else 1
+
+def decrypt_samples(ciphertext, cipher, keys, mode='ecb', iv=None):
+	""" Decrypts the ciphertext under each of the keys.
+
+	Parameters
+	----------
+	ciphertext : bytes
+		The ciphertext sample. A trailing partial block is ignored.
+	cipher : string
+		The cipher algorithm used. [sdes, saes]
+	keys : [int]
+		The keys to try.
+	mode : string
+		The cipher mode used. [ecb, cbc]
+	iv : int
+		The CBC initialization vector. When unknown (None), the first block is dropped from the decryptions.
+
+	Yields
+	------
+	int
+		The key.
+	bytes
+		The ciphertext decrypted under the key.
+	"""
+
+	F, blocksize, _ = CIPHERS[cipher]
+	blocks = [ c for _, c in to_pairs(ciphertext, ciphertext, blocksize) ]
+	previous = [iv] + blocks[:-1]
+
+	# Decrypt each block under every key at once
+	if cipher == 'saes' and numpy is not None:
+		keys = numpy.asarray(keys)
+		decrypted = SAES.F_keys( numpy.array(blocks, dtype=numpy.uint16)[None, :], keys[:, None], False )
+		if mode == 'cbc' and blocks:
+			decrypted[:, 1:] ^= numpy.array(blocks[:-1], dtype=numpy.uint16)
+			decrypted[:, 0] ^= iv or 0
+		rows = decrypted.astype('>u2').tobytes()
+		row_size = len(blocks) * blocksize
+
+		for i, key in enumerate(keys.tolist()):
+			yield key, rows[i * row_size + (0 if iv is not None or mode != 'cbc' else blocksize) : (i + 1) * row_size]
+		return
+
+	for key in keys:
+		if mode == 'cbc':
+			output = [ F(c, key, False) ^ (p or 0) for c, p in zip(blocks, previous) ]
+		else:
+			output = [ F(c, key, False) for c in blocks ]
+
+		if mode == 'cbc' and iv is None:
+			output = output[1:]
+		yield key, b''.join( b.to_bytes(blocksize, 'big') for b in output )
+
+def rank_keys(ciphertext, cipher, scorer='printable', mode='ecb', iv=None, sample_size=64, probe_size=16, top=10, survivors=None, batch_size=4096):
+	""" Ranks every key by how plausible the decrypted ciphertext looks, without any known plaintext.
+
+	Keys are streamed through in batches, and only scores are kept. Each key is first scored on just `probe_size`
+	bytes; only the best few survive to have the full `sample_size` bytes decrypted and scored.
+
+	Parameters
+	----------
+	ciphertext : bytes
+		The ciphertext. Only the first `sample_size` bytes are used.
+	cipher : string
+		The cipher algorithm used. [sdes, saes]
+	scorer : string or function
+		The plaintext score to rank by. One of `SCORERS`, or any function of the decrypted bytes where higher is better.
+	mode : string
+		The cipher mode used. [ecb, cbc]
+	iv : int
+		The CBC initialization vector, if known.
+	sample_size : int
+		The number of ciphertext bytes to score survivors on.
+	probe_size : int
+		The number of ciphertext bytes every key is first scored on.
+	top : int
+		The number of keys to return.
+	survivors : int
+		The number of keys that survive the probe. Defaults to the larger of `8 * top` and 1/256th of the keyspace, which leaves room for ties.
+	batch_size : int
+		The number of keys decrypted at once.
+
+	Returns
+	-------
+	[(float, int)]
+		The best (score, key) pairs, best first.
+	"""
+
+	if not callable(scorer):
+		scorer = SCORERS[scorer]
+
+	blocksize = CIPHERS[cipher][1]
+	keyspace = CIPHERS[cipher][2]
+	sample = ciphertext[:sample_size]
+	if len(sample) // blocksize < minimum_blocks(mode, iv):
+		raise ValueError(f"At least {minimum_blocks(mode, iv)} whole block(s) of ciphertext are needed!")
+	probe = sample[: max(probe_size, 2 * blocksize)]
+	if survivors is None:
+		survivors = max(8 * top, keyspace >> 8)
+
+	# Probe every key on a few bytes, keeping only the best scores
+	best = []
+	for start in range(0, keyspace, batch_size):
+		keys = range(start, min(start + batch_size, keyspace))
+		for key, plaintext in decrypt_samples(probe, cipher, keys, mode, iv):
+			entry = (scorer(plaintext), key)
+			if len(best) < survivors:
+				heapq.heappush(best, entry)
+			else:
+				heapq.heappushpop(best, entry)
+
+	# Score the survivors on the whole sample
+	keys = sorted( key for _, key in best )
+	ranked = [ (scorer(plaintext), key) for key, plaintext in decrypt_samples(sample, cipher, keys, mode, iv) ]
+
+	return heapq.nlargest(top, ranked)
@@ -1,15 +1,452 @@
 #!/usr/bin/python3.8
 
-import SDES
-import SAES
-import modes
+import time
+START = time.perf_counter()
+
+# Everything else (the ciphers, the modes and their backends) is imported by the code that uses it, so --help and
+# small files don't pay for what they never touch
 import argparse
-import secrets
 import sys
 import os
 
+SUPPORTED_CIPHERS = ('sdes', 'saes')
+
+# The phases timed by --profile-startup, and when each of them ended
+STARTUP_PHASES = ('imports', 'arguments', 'cipher', 'processing')
+phase_ends = []
+
+def print_startup_profile(file=sys.stderr):
+	""" Prints how long each startup phase took, from when main.py started running to now. A phase cut short by an early exit ends now. """
+	last = START
+	for phase, end in zip(STARTUP_PHASES, phase_ends + [time.perf_counter()]):
+		print(f"{phase:12}{(end - last) * 1e3:9.2f} ms", file=file)
+		last = end
+	print(f"{'total':12}{(last - START) * 1e3:9.2f} ms", file=file)
+
+def progress_printer(interval=0.2):
+	""" Returns a `modes.Metrics` callback that redraws a one-line progress report on stderr, at most once every `interval` seconds. """
+	last = [0.0]
+	
+	def render(metrics):
+		if metrics.elapsed - last[0] < interval and metrics.bytes != metrics.total_bytes:
+			return
+		last[0] = metrics.elapsed
+		
+		percent = f"{metrics.progress:7.1%}" if metrics.progress is not None else ''
+		sys.stderr.write(f"\r{percent} {metrics.bytes / 1e6:10.2f} MB {metrics.current_throughput / 1e6:8.2f} MB/s  queue {metrics.queue_depth:3}  chunk {metrics.mean_latency * 1e3:7.2f} ms ")
+		sys.stderr.flush()
+	
+	return render
+
+def print_stats(metrics, file=sys.stdout):
+	""" Prints the summary of a finished job's `modes.Metrics`. """
+	print(f"Processed {metrics.bytes} bytes in {metrics.chunks} chunk(s) over {metrics.elapsed:.3f} s ({metrics.throughput / 1e6:.2f} MB/s)", file=file)
+	print(f"Chunk latency: {metrics.mean_latency * 1e3:.2f} ms mean, {metrics.max_latency * 1e3:.2f} ms max", file=file)
+	print(f"Maximum queue depth: {metrics.max_queue_depth}", file=file)
+	for worker, busy in sorted(metrics.busy.items()):
+		print(f"Worker {worker}: busy {busy:.3f} s ({busy / metrics.elapsed:.0%} of the elapsed time)", file=file)
+
+def read_container(args, key, metrics=None):
+	""" Decrypts a container (or just `args.range` of it) into the output file, taking the mode and IV/nonce from its header. """
+	import container
+	
+	with open(args.input_filename, 'rb') as input_file:
+		header = container.read_header(input_file)
+	
+	if header.cipher != args.cipher.lower() or header.mode != args.mode.lower():
+		print(f"The container was made with {header.cipher.upper()} in {header.mode.upper()} mode, not {args.cipher.upper()} in {args.mode.upper()} mode!")
+		exit()
+	
+	offset, length = args.range or (0, header.length)
+	if metrics is not None:
+		metrics.total_bytes = max(0, min(length, header.length - offset))
+	
+	with container.ContainerReader(args.input_filename, key, args.backend) as reader, open(args.output_filename, 'wb') as output_file:
+		reader.decrypt_to(output_file, args.chunk_size, metrics, offset, length)
+
+def report_metrics(args, metrics, file=sys.stdout):
+	""" Ends the progress line and prints the statistics of a finished job, as asked for by `--progress` and `--stats`. """
+	if args.progress:
+		sys.stderr.write('\n')
+	if args.stats:
+		print_stats(metrics, file)
+
+def batch(argv):
+	""" Runs every job in a CSV manifest across a process pool, one file per worker, and reports each job's result. """
+	
+	import csv
+	import secrets
+	import modes
+	
+	parser = argparse.ArgumentParser(
+		prog=f"{sys.argv[0]} batch",
+		description="""
+Encrypt or decrypt many independent files at once, one file per worker process.
+
+The manifest is a CSV file with the header:
+cipher,mode,operation,key,iv,input,output
+
+'operation' is encrypt or decrypt (ignored for CTR). A blank 'iv' is generated when encrypting, and reported with the job's result.
+""",
+		formatter_class=argparse.RawDescriptionHelpFormatter
+	)
+	
+	parser.add_argument('manifest', type=str, help='The CSV manifest of jobs to run.')
+	parser.add_argument('-s', '--chunk_size', type=int, default=65536, help='The byte-size of chunks to process the files in. Defaults to 65536.')
+	parser.add_argument('--backend', '-b', type=str, default=None, help='The backend to process blocks with. [python, numpy, bitslice] (Defaults to numpy for SAES when it is installed and the data is at least 4 kB, or bitslice for SAES keys too small to build codebooks for)')
+	parser.add_argument('--max_workers', '-w', type=int, default=None, help='Maximum number of workers to use for multiprocessing. (Defaults to the number of processors on the machine)')
+	parser.add_argument('--cache-tables', default=False, action='store_true', help='Load each key\'s codebooks from an on-disk cache (~/.cache/sdes-for-python/tables), building and caching them on first use. The workers map the cached files instead of being sent the codebooks.')
+	
+	args = parser.parse_args(argv)
+	
+	# Read and check every job before starting any of them
+	jobs = []
+	ivs = []
+	ciphers = {}
+	with open(args.manifest, newline='') as manifest:
+		for line, row in enumerate(csv.DictReader(manifest), start=2):
+			cipher = row['cipher'].strip().lower()
+			mode = row['mode'].strip().lower()
+			operation = row['operation'].strip().lower()
+			iv = row['iv'].strip()
+			
+			if cipher not in SUPPORTED_CIPHERS:
+				print(f"Line {line}: '{cipher}' cipher is not supported! Please use one of the following!\n {SUPPORTED_CIPHERS}")
+				exit()
+			if mode not in modes.SUPPORTED_MODES:
+				print(f"Line {line}: '{mode}' mode is not supported! Please use one of the following!\n {modes.SUPPORTED_MODES}")
+				exit()
+			if operation not in ('encrypt', 'decrypt') and mode != 'ctr':
+				print(f"Line {line}: Must specify whether to encrypt or decrypt when using ECB or CBC mode!")
+				exit()
+			
+			encrypt = operation != 'decrypt'
+			# Missing inputs are reported as failed jobs, rather than stopping the batch
+			input_size = os.path.getsize(row['input']) if os.path.isfile(row['input']) else 0
+			
+			# Share one cipher object between every job using the same key
+			cache_key = (cipher, row['key'].strip(), args.cache_tables or (cipher == 'saes' and input_size > 2 * 65536 * 2))
+			if cache_key not in ciphers:
+				ciphers[cache_key] = modes.make_cipher(cipher, row['key'].strip(), input_size, args.cache_tables)
+			key = ciphers[cache_key]
+			
+			if iv:
+				iv = int(iv)
+			elif mode == 'ecb':
+				iv = None
+			elif encrypt:
+				iv = secrets.randbits(8 * key.blocksize)
+			else:
+				print(f"Line {line}: Must specify an IV or nonce value when decrypting in non-ECB mode!")
+				exit()
+			
+			jobs.append( dict(mode=mode, input_filename=row['input'], output_filename=row['output'], key=key, iv=iv, encrypt=encrypt, chunk_size=args.chunk_size, backend=args.backend) )
+			ivs.append( iv )
+	
+	# Report each job as it finishes
+	failures = 0
+	for index, seconds, error in modes.batch_files(jobs, args.max_workers):
+		job = jobs[index]
+		if error is None:
+			iv_note = f" (IV/nonce {ivs[index]})" if ivs[index] is not None else ""
+			print(f"[done]   {job['input_filename']} -> {job['output_filename']} in {seconds:.3f}s{iv_note}")
+		else:
+			failures += 1
+			print(f"[failed] {job['input_filename']} -> {job['output_filename']}: {error}")
+	
+	print(f"{len(jobs) - failures}/{len(jobs)} jobs completed.")
+	if failures:
+		sys.exit(1)
+
+def crack_command(argv):
+	""" Recovers the keys consistent with known plaintext and its ECB ciphertext. """
+	
+	import crack
+	
+	parser = argparse.ArgumentParser(
+		prog=f"{sys.argv[0]} crack",
+		description="Recover every key consistent with known plaintext and its ECB ciphertext, by testing the whole keyspace.",
+		epilog=f"""
+Example usage:
+{sys.argv[0]} crack SAES 48656c6c6f21 b0bb6537dbc0
+{sys.argv[0]} crack SDES --files known.txt known.ecb
+{sys.argv[0]} crack SAES 48656c6c6f21 cdd1935ddb6d --stages 2
+		""",
+		formatter_class=argparse.RawDescriptionHelpFormatter
+	)
+	
+	parser.add_argument('cipher', type=str, help='The cipher algorithm used. [SDES, SAES]')
+	parser.add_argument('plaintext', type=str, help='The known plaintext, in hex.')
+	parser.add_argument('ciphertext', type=str, help='The matching ECB ciphertext, in hex.')
+	parser.add_argument('--files', '-f', default=False, action='store_true', help='Read the plaintext and ciphertext from the named files instead.')
+	parser.add_argument('--max_workers', '-w', type=int, default=1, help='Number of processes to split the keyspace across. (Defaults to 1)')
+	parser.add_argument('--stages', type=int, default=1, help='Number of keys the data was encrypted with, as a cascade. 2 and 3 are recovered by meeting in the middle. (Defaults to 1)')
+	
+	args = parser.parse_args(argv)
+	
+	cipher = args.cipher.lower()
+	if cipher not in SUPPORTED_CIPHERS:
+		print(f"'{args.cipher}' cipher is not supported! Please use one of the following!\n {SUPPORTED_CIPHERS}")
+		exit()
+	
+	if args.files:
+		with open(args.plaintext, 'rb') as plaintext_file, open(args.ciphertext, 'rb') as ciphertext_file:
+			plaintext, ciphertext = plaintext_file.read(), ciphertext_file.read()
+	else:
+		plaintext, ciphertext = bytes.fromhex(args.plaintext), bytes.fromhex(args.ciphertext)
+	
+	pairs = crack.to_pairs(plaintext, ciphertext, crack.CIPHERS[cipher][1])
+	if not pairs:
+		print("Must provide at least one full block of known plaintext and ciphertext!")
+		exit()
+	
+	if args.stages not in (1, 2, 3):
+		print("Only 1, 2 or 3 stages are supported!")
+		exit()
+	elif args.stages > 1:
+		import mitm
+		keys = mitm.meet_in_the_middle(pairs, cipher, args.stages)
+	else:
+		keys = [ (key,) for key in crack.crack(pairs, cipher, args.max_workers) ]
+	
+	print(f"{len(keys)} key(s) consistent with {len(pairs)} known block(s):")
+	for key in keys:
+		print( ','.join( f"{k:010b}" if cipher == 'sdes' else f"{k:#06x}" for k in key ) )
+
+def rank_command(argv):
+	""" Ranks every key by how plausible a ciphertext's decryption looks, without known plaintext. """
+	
+	import crack
+	
+	parser = argparse.ArgumentParser(
+		prog=f"{sys.argv[0]} rank",
+		description="Ciphertext-only key search: decrypt a sample of the file under every key and rank the keys by a plaintext score.",
+		epilog=f"""
+Scores:
+entropy    Lowest byte entropy first.
+printable  Highest fraction of printable ASCII first.
+english    Closest (chi-squared) to English letter frequencies first.
+magic      Decryptions starting with a known file signature first.
+
+Example usage:
+{sys.argv[0]} rank SAES ciphertext.saes --score english
+		""",
+		formatter_class=argparse.RawDescriptionHelpFormatter
+	)
+	
+	parser.add_argument('cipher', type=str, help='The cipher algorithm used. [SDES, SAES]')
+	parser.add_argument('input_filename', type=str, help='The ciphertext file.')
+	parser.add_argument('--mode', type=str, default='ecb', help='The cipher mode used. [ECB, CBC] (Defaults to ECB)')
+	parser.add_argument('-iv', '--nonce', type=int, default=None, help='The CBC IV, if known. Otherwise the first block is skipped.')
+	parser.add_argument('--score', type=str, default='printable', help=f'The plaintext score to rank keys by. {list(crack.SCORERS)} (Defaults to printable)')
+	parser.add_argument('--sample', type=int, default=64, help='Number of ciphertext bytes to score the best keys on. (Defaults to 64)')
+	parser.add_argument('--top', type=int, default=10, help='Number of keys to report. (Defaults to 10)')
+	
+	args = parser.parse_args(argv)
+	
+	cipher = args.cipher.lower()
+	if cipher not in SUPPORTED_CIPHERS:
+		print(f"'{args.cipher}' cipher is not supported! Please use one of the following!\n {SUPPORTED_CIPHERS}")
+		exit()
+	if args.mode.lower() not in ('ecb', 'cbc'):
+		print(f"'{args.mode}' mode is not supported! Please use one of the following!\n ('ecb', 'cbc')")
+		exit()
+	if args.score.lower() not in crack.SCORERS:
+		print(f"'{args.score}' score is not supported! Please use one of the following!\n {tuple(crack.SCORERS)}")
+		exit()
+	
+	with open(args.input_filename, 'rb') as input_file:
+		ciphertext = input_file.read(args.sample)
+	
+	blocks = crack.minimum_blocks(args.mode.lower(), args.nonce)
+	if len(ciphertext) // crack.CIPHERS[cipher][1] < blocks:
+		print(f"Must provide at least {blocks} full block(s) of ciphertext!")
+		exit()
+	
+	ranked = crack.rank_keys(ciphertext, cipher, args.score.lower(), args.mode.lower(), args.nonce, sample_size=args.sample, top=args.top)
+	
+	for score, key in ranked:
+		key_text = f"{key:010b}" if cipher == 'sdes' else f"{key:#06x}"
+		print(f"{key_text}\t{score:.4f}")
+
+def bench_command(argv):
+	""" Benchmarks the file modes, and optionally checks the results against a stored baseline. """
+	
+	import bench
+	import modes
+	
+	parser = argparse.ArgumentParser(
+		prog=f"{sys.argv[0]} bench",
+		description="Time every combination of cipher, mode, backend, single/concurrent processing, chunk size and worker count on a deterministic input, reporting MB/s, blocks/s and peak RSS.",
+		epilog=f"""
+Example usage:
+{sys.argv[0]} bench --size 4194304 --output baseline.json
+{sys.argv[0]} bench --size 4194304 --baseline baseline.json --threshold 0.1
+		""",
+		formatter_class=argparse.RawDescriptionHelpFormatter
+	)
+	
+	parser.add_argument('--size', type=int, default=1 << 20, help='The byte-size of the input to process. (Defaults to 1048576)')
+	parser.add_argument('--ciphers', type=str, nargs='+', default=list(SUPPORTED_CIPHERS), help='The ciphers to benchmark. (Defaults to all)')
+	parser.add_argument('--modes', type=str, nargs='+', default=list(modes.SUPPORTED_MODES), help='The modes to benchmark. (Defaults to all)')
+	parser.add_argument('--backends', type=str, nargs='+', default=None, help='The backends to benchmark. (Defaults to every available backend)')
+	parser.add_argument('--chunk_sizes', '-s', type=int, nargs='+', default=[65536], help='The chunk sizes to benchmark. (Defaults to 65536)')
+	parser.add_argument('--workers', '-w', type=int, nargs='+', default=None, help='The worker counts to benchmark concurrent processing with. (Defaults to the number of processors)')
+	parser.add_argument('--repeats', type=int, default=3, help='Number of runs per case; the fastest is kept. (Defaults to 3)')
+	parser.add_argument('--seed', type=int, default=0, help='The seed of the input data. (Defaults to 0)')
+	parser.add_argument('--output', '-o', type=str, default=None, help='Write the results to this JSON file.')
+	parser.add_argument('--baseline', type=str, default=None, help='Compare the results against this JSON file, and fail on regressions.')
+	parser.add_argument('--threshold', type=float, default=0.1, help='The fraction of throughput a case can lose before it fails the comparison. (Defaults to 0.1)')
+	
+	args = parser.parse_args(argv)
+	
+	ciphers = [ c.lower() for c in args.ciphers ]
+	mode_names = [ m.lower() for m in args.modes ]
+	backends = None if args.backends is None else [ b.lower() for b in args.backends ]
+	for names, supported, kind in ((ciphers, SUPPORTED_CIPHERS, 'cipher'), (mode_names, modes.SUPPORTED_MODES, 'mode'), (backends or [], modes.SUPPORTED_BACKENDS, 'backend')):
+		for name in names:
+			if name not in supported:
+				print(f"'{name}' {kind} is not supported! Please use one of the following!\n {supported}")
+				exit()
+	if 'saes' in ciphers and any( c % 2 for c in args.chunk_sizes ):
+		print("Chunk sizes cannot be odd-numbers when using SAES!")
+		exit()
+	
+	results = []
+	print(f"{'case':48}{'MB/s':>10}{'blocks/s':>14}{'peak RSS':>12}")
+	for result in bench.benchmark(args.size, ciphers, mode_names, backends, args.chunk_sizes, args.workers, args.repeats, args.seed):
+		results.append(result)
+		rss = 'n/a' if result['peak_rss_mb'] is None else f"{result['peak_rss_mb']:.1f} MB"
+		print(f"{result['name']:48}{result['mb_per_s']:10.2f}{result['blocks_per_s']:14.0f}{rss:>12}")
+	
+	if args.output:
+		bench.save(bench.report(results, args.size), args.output)
+	
+	if args.baseline:
+		regressions = bench.compare(results, bench.load(args.baseline), args.threshold)
+		for name, before, after in regressions:
+			print(f"[regressed] {name}: {before:.2f} -> {after:.2f} MB/s ({after / before - 1:+.0%})")
+		print(f"{len(regressions)} case(s) regressed more than {args.threshold:.0%} against {args.baseline}.")
+		if regressions:
+			sys.exit(1)
+
+def keys_command(argv):
+	""" Processes one file under every key of a range, writing the key x output matrix. """
+	
+	import multikey
+	import modes
+	
+	parser = argparse.ArgumentParser(
+		prog=f"{sys.argv[0]} keys",
+		description="Encrypt or decrypt one file under every key of a range at once. The output file holds the result under each key in turn, in key order, each the same length as the input.",
+		epilog=f"""
+Example usage:
+{sys.argv[0]} keys SDES ecb -e plaintext.txt all-keys.sdes
+{sys.argv[0]} keys SAES ctr -iv 100 plaintext.txt some-keys.saes --start 0x1000 --stop 0x2000 -w 4
+		""",
+		formatter_class=argparse.RawDescriptionHelpFormatter
+	)
+	
+	parser.add_argument('cipher', type=str, help='The cipher algorithm to use. [SDES, SAES]')
+	parser.add_argument('mode', type=str, help='The cipher mode to use. [ECB, CBC, CTR]')
+	parser.add_argument('input_filename', type=str, help='The file to process.')
+	parser.add_argument('output_filename', type=str, help='The file to store the results under every key into.')
+	parser.add_argument('--encrypt', '-e', default=False, action='store_true', help='Encrypt the file.')
+	parser.add_argument('--decrypt', '-d', default=False, action='store_true', help='Decrypt the file.')
+	parser.add_argument('-iv', '--nonce', type=int, default=0, help='IV or nonce value to use. (Defaults to 0)')
+	parser.add_argument('--start', type=lambda k: int(k, 0), default=0, help='The first key. (Defaults to 0)')
+	parser.add_argument('--stop', type=lambda k: int(k, 0), default=None, help='The key to stop before. (Defaults to the end of the keyspace)')
+	parser.add_argument('--max_workers', '-w', type=int, default=1, help='Number of processes to spread the keys across. (Defaults to 1)')
+	
+	args = parser.parse_args(argv)
+	
+	cipher = args.cipher.lower()
+	mode = args.mode.lower()
+	if cipher not in SUPPORTED_CIPHERS:
+		print(f"'{args.cipher}' cipher is not supported! Please use one of the following!\n {SUPPORTED_CIPHERS}")
+		exit()
+	if mode not in modes.SUPPORTED_MODES:
+		print(f"'{args.mode}' mode is not supported! Please use one of the following!\n {modes.SUPPORTED_MODES}")
+		exit()
+	if mode != 'ctr' and args.encrypt == args.decrypt:
+		print("Must specify either encryption or decryption!")
+		exit()
+	
+	with open(args.input_filename, 'rb') as input_file:
+		data = input_file.read()
+	
+	with open(args.output_filename, 'wb') as output_file:
+		for _, output in multikey.iter_keys(data, cipher, mode, args.nonce, args.encrypt, args.start, args.stop, max_workers=args.max_workers):
+			output_file.write(output)
+
+def analyze_command(argv):
+	""" Prints the S-box tables of a cipher, or runs a differential or linear attack against a key. """
+	
+	import analysis
+	
+	parser = argparse.ArgumentParser(
+		prog=f"{sys.argv[0]} analyze",
+		description="Differential and linear cryptanalysis: print the difference distribution and linear approximation tables of a cipher's S-boxes, or recover a key from chosen-plaintext pairs or known plaintexts.",
+		epilog=f"""
+Example usage:
+{sys.argv[0]} analyze SDES
+{sys.argv[0]} analyze SAES --attack differential --key 0xa73b --pairs 65536
+		""",
+		formatter_class=argparse.RawDescriptionHelpFormatter
+	)
+	
+	parser.add_argument('cipher', type=str, help='The cipher algorithm to analyze. [SDES, SAES]')
+	parser.add_argument('--attack', type=str, default=None, help='Run an attack instead of printing the tables. [differential, linear]')
+	parser.add_argument('--key', type=str, default=None, help='The key of the encryption oracle to attack. Example: 1010101010 or 0xff')
+	parser.add_argument('--pairs', '-n', type=int, default=4096, help='Number of chosen-plaintext pairs (differential) or known plaintexts (linear) to use. (Defaults to 4096)')
+	parser.add_argument('--seed', type=int, default=None, help='The seed of the random plaintexts.')
+	
+	args = parser.parse_args(argv)
+	
+	cipher = args.cipher.lower()
+	if cipher not in SUPPORTED_CIPHERS:
+		print(f"'{args.cipher}' cipher is not supported! Please use one of the following!\n {SUPPORTED_CIPHERS}")
+		exit()
+	
+	if args.attack is None:
+		for name, (sbox, in_bits, out_bits) in analysis.SBOXES.items():
+			if name.startswith(cipher):
+				print(f"{name} difference distribution table:\n{analysis.format_table( analysis.ddt(sbox, in_bits, out_bits) )}\n")
+				print(f"{name} linear approximation table:\n{analysis.format_table( analysis.lat(sbox, in_bits, out_bits) )}\n")
+		return
+	
+	if args.attack.lower() not in ('differential', 'linear'):
+		print(f"'{args.attack}' attack is not supported! Please use one of the following!\n ('differential', 'linear')")
+		exit()
+	if args.key is None:
+		print("Must specify the --key of the oracle to attack!")
+		exit()
+	if analysis.numpy is None:
+		print("The attacks need NumPy! (pip install numpy)")
+		exit()
+	
+	import modes
+	oracle = modes.make_cipher(cipher, args.key, 2 * args.pairs)
+	attack = analysis.sdes_attack if cipher == 'sdes' else analysis.saes_attack
+	keys = attack(oracle, args.pairs, args.attack.lower(), seed=args.seed)
+	
+	print(f"{len(keys)} key(s) recovered:")
+	for key in keys:
+		print(f"{key:010b}" if cipher == 'sdes' else f"{key:#06x}")
+
+COMMANDS = {'batch': batch, 'crack': crack_command, 'rank': rank_command, 'bench': bench_command, 'keys': keys_command, 'analyze': analyze_command}
+
 def main():
-	SUPPORTED_CIPHERS = ('sdes', 'saes')
+	# Subcommands have their own arguments
+	if len(sys.argv) > 1 and sys.argv[1].lower() in COMMANDS:
+		COMMANDS[sys.argv[1].lower()](sys.argv[2:])
+		return
+	
+	# Registered before parsing, so --help and argument errors are timed too
+	phase_ends.append(time.perf_counter())
+	if '--profile-startup' in sys.argv:
+		import atexit
+		atexit.register(print_startup_profile)
 
 	# Setup argument parser
 	parser = argparse.ArgumentParser(
@@ -34,6 +471,12 @@ Key size: 16-bits (65,536 possibilities)
 Example usage:
 Encryption: python3.8 {sys.argv[0]} SAES cbc -iv 100 --encrypt 0xab plaintext.txt ciphertext.saes
 Decryption: python3.8 {sys.argv[0]} SAES cbc -iv 100 --decrypt 0xab ciphertext.saes plaintext.txt --concurrent
+Batch jobs: python3.8 {sys.argv[0]} batch manifest.csv (see '{sys.argv[0]} batch --help')
+Key search: python3.8 {sys.argv[0]} crack SAES <plaintext hex> <ciphertext hex> (see '{sys.argv[0]} crack --help')
+Key search (ciphertext-only): python3.8 {sys.argv[0]} rank SAES ciphertext.saes (see '{sys.argv[0]} rank --help')
+Benchmarks: python3.8 {sys.argv[0]} bench --output baseline.json (see '{sys.argv[0]} bench --help')
+Every key at once: python3.8 {sys.argv[0]} keys SDES ecb -e plaintext.txt all-keys.sdes (see '{sys.argv[0]} keys --help')
+Cryptanalysis: python3.8 {sys.argv[0]} analyze SAES --attack differential --key 0xa73b (see '{sys.argv[0]} analyze --help')
 		""",
 		formatter_class=argparse.RawDescriptionHelpFormatter
 	)
@@ -43,14 +486,30 @@ Decryption: python3.8 {sys.argv[0]} SAES cbc -iv 100 --decrypt 0xab ciphertext.s
 	parser.add_argument('--encrypt', '-e', default=False, action='store_true', help='Encrypt the file.')
 	parser.add_argument('--decrypt', '-d', default=False, action='store_true', help='Decrypt the file.')
 	parser.add_argument('-iv', '--nonce', type=int, default=None, help='IV or nonce value to use.')
-	parser.add_argument('key', type=str, help='The cipher key to use. Example: 1010101010 or 0xff')
-	parser.add_argument('input_filename', type=str, help='The file to process.')
-	parser.add_argument('output_filename', type=str, help='The file to store the results into.')
-	parser.add_argument('-s', '--chunk_size', type=int, default=65536, help='The byte-size of chunks to process the files in. Defaults to 65536.')
+	parser.add_argument('key', type=str, help='The cipher key to use. Example: 1010101010 or 0xff (Comma-separated keys encrypt with a cascade, each key in turn. Example: 0xab,0x12)')
+	parser.add_argument('input_filename', type=str, help="The file to process. ('-' reads stdin)")
+	parser.add_argument('output_filename', type=str, help="The file to store the results into. ('-' writes stdout)")
+	parser.add_argument('-s', '--chunk_size', type=int, default=None, help='The byte-size of chunks to process the files in. Defaults to 65536.')
 	parser.add_argument('--concurrent', '-c', default=False, action='store_true', help='Process file with multiple threads, if possible.')
+	parser.add_argument('--backend', '-b', type=str, default=None, help='The backend to process blocks with. [python, numpy, bitslice] (Defaults to numpy for SAES when it is installed and the data is at least 4 kB, or bitslice for SAES keys too small to build codebooks for)')
+	parser.add_argument('--mmap', '-m', default=False, action='store_true', help='Memory-map the input and output files instead of copying each chunk.')
+	parser.add_argument('--window', type=int, default=None, help='Maximum number of chunks in flight when processing concurrently. (Defaults to two per worker)')
 	parser.add_argument('--max_workers', '-w', type=int, default=None, help='Maximum number of workers to use for multiprocessing. (Defaults to the number of processors on the machine)')
+	parser.add_argument('--progress', '-p', default=False, action='store_true', help='Show live progress, throughput and queue depth while processing.')
+	parser.add_argument('--stats', default=False, action='store_true', help='Print throughput, chunk latency, queue depth and per-worker busy time when done.')
+	parser.add_argument('--container', '-C', default=False, action='store_true', help='Encrypt into a self-describing container, whose header records the cipher, mode, IV/nonce and length. (Containers are recognized automatically when decrypting, without -iv)')
+	parser.add_argument('--range', '-r', type=int, nargs=2, default=None, metavar=('OFFSET', 'LENGTH'), help='Only decrypt LENGTH bytes from OFFSET of a container.')
+	parser.add_argument('--auto', '-a', default=False, action='store_true', help='Choose the backend, chunk size, worker count and whether to use the process pool at all, from a short calibration cached per host. Explicitly given options are kept.')
+	parser.add_argument('--cache-tables', default=False, action='store_true', help='Load the key\'s codebooks from an on-disk cache (~/.cache/sdes-for-python/tables), building and caching them on the first run. The least recently used keys are evicted past 128 MB.')
+	parser.add_argument('--profile-startup', default=False, action='store_true', help='Print how long the imports, argument parsing, cipher setup and processing took to stderr.')
 	
 	args = parser.parse_args()
+	phase_ends.append(time.perf_counter())
+	
+	# '-' streams stdin and/or stdout, keeping stdout clear of anything but the output
+	piped = '-' in (args.input_filename, args.output_filename)
+	messages = sys.stderr if args.output_filename == '-' else sys.stdout
+	input_size = None if args.input_filename == '-' else os.path.getsize(args.input_filename)
 	
 	# Check if provided a valid cipher
 	if args.cipher.lower() not in SUPPORTED_CIPHERS:
@@ -58,55 +517,114 @@ Decryption: python3.8 {sys.argv[0]} SAES cbc -iv 100 --decrypt 0xab ciphertext.s
 		exit()
 	else:
 		# Choose the selected cipher and format cipher attributes
-		if args.cipher.lower() == 'sdes':
-			F = SDES.F
-			key = int(args.key, 2)
-			blocksize = 1
-		elif args.cipher.lower() == 'saes':
-			if args.chunk_size % 2 != 0:
-				print(f"Chunk size ({args.chunk_size}) cannot be an odd-number when using SAES!")
-				exit()
-			
-			F = SAES.F
-			key = int(args.key, 16)
-			blocksize = 2
+		import modes
+		key = modes.make_cipher(args.cipher.lower(), args.key, input_size, args.cache_tables)
+		phase_ends.append(time.perf_counter())
 	
 	# Check if provided a valid mode
 	if args.mode.lower() not in modes.SUPPORTED_MODES:
 		print(f"'{args.mode}' mode is not supported! Please use one of the following!\n {modes.SUPPORTED_MODES}")
 		exit()
 	
+	# Check if provided a valid backend
+	if args.backend is not None:
+		args.backend = args.backend.lower()
+		if args.backend not in modes.SUPPORTED_BACKENDS:
+			print(f"'{args.backend}' backend is not supported! Please use one of the following!\n {modes.SUPPORTED_BACKENDS}")
+			exit()
+		elif args.backend == 'numpy' and not modes.HAVE_NUMPY:
+			print("The numpy backend requires NumPy to be installed!")
+			exit()
+	
 	# Determine encrypt or decrypt
 	if args.encrypt == args.decrypt and (args.mode.lower() == 'ecb' or args.mode.lower() == 'cbc'): 
 		print("Must specify an whether to encrypt or decrypt when using ECB or CBC mode!")
 		exit()
 	else:
 		encrypt = args.encrypt
-		
+	
+	# Collect statistics only when they'll be shown
+	metrics = None
+	if args.progress or args.stats:
+		metrics = modes.Metrics(input_size, progress_printer() if args.progress else None)
+	
+	# Containers carry their own IV/nonce, and can be read a range at a time
+	if not encrypt and args.input_filename != '-':
+		import container
+		if container.is_container(args.input_filename):
+			read_container(args, key, metrics)
+			report_metrics(args, metrics, messages)
+			return
+	
+	if args.range is not None:
+		print("Byte ranges can only be decrypted from containers!")
+		exit()
+	elif args.container and piped:
+		print("Containers can't be written to or from stdin/stdout!")
+		exit()
+	
 	# Generate an IV or nonce when not using ECB mode
 	if args.nonce == None and args.mode.lower() != 'ecb':
 		if not encrypt and args.mode.lower() != 'ctr':
 			print("Must specify an IV or nonce value when decrypting in non-ECB mode!")
 			exit()
 		else:
-			iv = secrets.randbits(8 * blocksize)
-			print(f"IV/nonce generated is {iv}!")
+			import secrets
+			iv = secrets.randbits(8 * key.blocksize)
+			if not args.container:
+				print(f"IV/nonce generated is {iv}!", file=messages)
 	else:
 		iv = args.nonce
 	
+	# Pipes can only be streamed through a single process
+	if piped:
+		if args.mmap:
+			print("Cannot memory-map stdin or stdout!")
+			exit()
+		if args.concurrent or args.auto:
+			print("Streaming stdin/stdout in a single process; ignoring --concurrent and --auto.", file=sys.stderr)
+			args.concurrent = args.auto = False
+	
+	# Tune whatever wasn't given explicitly
+	if args.auto:
+		import tune
+		settings = tune.auto_settings(args.input_filename, key, args.mode.lower(), encrypt)
+		args.backend = args.backend or settings['backend']
+		args.chunk_size = args.chunk_size or settings['chunk_size']
+		args.max_workers = args.max_workers or settings['max_workers']
+		args.concurrent = args.concurrent or settings['multithreaded']
+		workers = (args.max_workers or os.cpu_count()) if args.concurrent else 1
+		print(f"Auto-tuned: backend={args.backend}, chunk_size={args.chunk_size}, workers={workers} (estimated {settings['estimated_seconds']:.2f} s)", file=messages)
+	elif args.chunk_size is None:
+		args.chunk_size = 65536
+	
+	# Write a container, recording everything but the key in its header
+	if args.container:
+		import container
+		container.encrypt_file(args.input_filename, args.output_filename, args.cipher.lower(), key, args.mode.lower(), iv or 0, args.chunk_size, args.backend, metrics)
+	
+	# Stream stdin/stdout through an incremental cipher context
+	elif piped:
+		import contextlib
+		context = modes.CipherContext(args.mode.lower(), key, iv, encrypt, backend=args.backend)
+		with contextlib.ExitStack() as stack:
+			input_file = sys.stdin.buffer if args.input_filename == '-' else stack.enter_context(open(args.input_filename, 'rb'))
+			output_file = sys.stdout.buffer if args.output_filename == '-' else stack.enter_context(open(args.output_filename, 'wb'))
+			modes.process_stream(input_file, output_file, context, args.chunk_size, metrics)
+	
 	# Use ECB mode
-	if(args.mode.lower() == "ecb"): 
-		modes.ecb_file( args.input_filename, args.output_filename, key, F, encrypt, blocksize, args.chunk_size, args.concurrent, args.max_workers )
+	elif(args.mode.lower() == "ecb"): 
+		modes.ecb_file( args.input_filename, args.output_filename, key, encrypt=encrypt, chunk_size=args.chunk_size, multithreaded=args.concurrent, max_workers=args.max_workers, backend=args.backend, use_mmap=args.mmap, window=args.window, metrics=metrics )
 	
 	# Use CBC mode
 	elif(args.mode.lower() == "cbc"): 
-		modes.cbc_file( args.input_filename, args.output_filename, key, iv, F, encrypt, blocksize, args.chunk_size, args.concurrent, args.max_workers )
+		modes.cbc_file( args.input_filename, args.output_filename, key, iv, encrypt=encrypt, chunk_size=args.chunk_size, multithreaded=args.concurrent, max_workers=args.max_workers, backend=args.backend, use_mmap=args.mmap, window=args.window, metrics=metrics )
 	
 	# Use CTR mode
 	elif(args.mode.lower() == "ctr"): 
-		modes.ctr_file( args.input_filename, args.output_filename, key, iv, F, blocksize, args.chunk_size, args.concurrent, args.max_workers )
-
-			
+		modes.ctr_file( args.input_filename, args.output_filename, key, iv, chunk_size=args.chunk_size, multithreaded=args.concurrent, max_workers=args.max_workers, backend=args.backend, use_mmap=args.mmap, window=args.window, metrics=metrics )
+	
+	report_metrics(args, metrics, messages)
 
 if __name__ == "__main__":
 	main()
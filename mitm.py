@@ -0,0 +1,170 @@
+#!/usr/bin/python3.8
+"""
+ mitm.py
+ Meet-in-the-middle key recovery for double and triple encryption. (`modes.Cascade`)
+
+ A cascade of two ciphers has a keyspace of the single key squared (2^32 key pairs for double SAES), but each half
+ can be searched on its own. Every first key's encryption of the known plaintext is stored in a sorted index, with
+ one entry per key (65,536 for SAES), and every last key's decryption of the ciphertext is then looked up in it.
+ Only the key pairs that meet are checked against the rest of the known blocks. A third stage is handled by
+ enumerating its key and meeting in the middle over the other two.
+
+ The index is a sorted NumPy array probed with `searchsorted` when NumPy is installed, and a sorted `array('Q')`
+ probed with `bisect` otherwise.
+"""
+
+from array import array
+import bisect
+import math
+
+import SDES
+import SAES
+import multikey
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+def meet_width(cipher, stages, n_pairs):
+	""" The number of known blocks combined into each middle value: enough that only about one wrong key tuple meets, if there are that many. """
+	blocksize, keyspace = multikey.CIPHERS[cipher]
+	key_bits = keyspace.bit_length() - 1
+	return max(1, min( n_pairs, math.ceil(stages * key_bits / (8 * blocksize)) ))
+
+def middle_values(blocks, cipher, encrypt=True):
+	""" Encrypts or decrypts the blocks under every key of the cipher, joining each key's output into one integer.
+
+	Parameters
+	----------
+	blocks : [int]
+		The blocks to process.
+	cipher : string
+		The cipher algorithm to use. [sdes, saes]
+	encrypt : bool
+		Whether to encrypt or decrypt the blocks.
+
+	Returns
+	-------
+	[int]
+		The joined output under each key, indexed by key.
+	"""
+
+	blocksize, keyspace = multikey.CIPHERS[cipher]
+	data = b''.join( b.to_bytes(blocksize, 'big') for b in blocks )
+	return [ int.from_bytes(row, 'big') for row in multikey.ecb_many(data, cipher, range(keyspace), encrypt) ]
+
+class MiddleIndex:
+	""" A sorted index from middle values to the keys that produce them. Each entry packs `value << key_bits | key` into one integer.
+
+	Parameters
+	----------
+	values : [int]
+		The middle value of each key, indexed by key.
+	key_bits : int
+		The bit-size of the keys.
+	"""
+
+	def __init__(self, values, key_bits):
+		self.key_bits = key_bits
+		entries = ( value << key_bits | key for key, value in enumerate(values) )
+		if numpy is not None:
+			self.entries = numpy.sort( numpy.fromiter(entries, dtype=numpy.uint64, count=len(values)) )
+		else:
+			self.entries = array('Q', sorted(entries))
+
+	def lookup(self, value):
+		""" The keys whose middle value is `value`. """
+		mask = (1 << self.key_bits) - 1
+		low = bisect.bisect_left(self.entries, value << self.key_bits)
+		high = bisect.bisect_right(self.entries, value << self.key_bits | mask)
+		return [ int(entry) & mask for entry in self.entries[low:high] ]
+
+	def matches(self, values):
+		""" Looks up many middle values at once.
+
+		Yields
+		------
+		int
+			The position of each value that has matches.
+		[int]
+			The keys matching it.
+		"""
+
+		if numpy is None:
+			for i, value in enumerate(values):
+				keys = self.lookup(value)
+				if keys:
+					yield i, keys
+			return
+
+		mask = numpy.uint64((1 << self.key_bits) - 1)
+		values = numpy.asarray(values, dtype=numpy.uint64) << numpy.uint64(self.key_bits)
+		low = numpy.searchsorted(self.entries, values, side='left')
+		high = numpy.searchsorted(self.entries, values | mask, side='right')
+		for i in numpy.nonzero(high > low)[0].tolist():
+			yield i, ( self.entries[low[i] : high[i]] & mask ).tolist()
+
+def _consistent(keys, pairs, cipher):
+	""" Whether the cascade of `keys` encrypts every known plaintext block to its ciphertext block. """
+	F = SDES.fast_F if cipher == 'sdes' else SAES.fast_F
+	for plaintext, ciphertext in pairs:
+		block = plaintext
+		for key in keys:
+			block = F(block, key)
+		if block != ciphertext:
+			return False
+	return True
+
+def meet_in_the_middle(pairs, cipher, stages=2):
+	""" Recovers every key tuple of a 2- or 3-stage cascade consistent with known plaintext/ciphertext pairs.
+
+	A double cascade costs two passes over the keyspace and one index of its size, so double SAES takes seconds
+	instead of a 2^32 search. A triple cascade repeats the probing pass for every key of the last stage.
+
+	Parameters
+	----------
+	pairs : [(int, int)]
+		The known (plaintext block, ciphertext block) pairs of the cascade's ECB encryption. See `crack.to_pairs`. Two or
+		three pairs usually narrow a double cascade down to the right keys.
+	cipher : string
+		The cipher algorithm of every stage. [sdes, saes]
+	stages : int
+		The number of stages. [2, 3]
+
+	Returns
+	-------
+	[(int, ...)]
+		The consistent key tuples, in the order the keys encrypt, sorted.
+	"""
+
+	if not pairs:
+		raise ValueError("At least one known plaintext/ciphertext block is needed!")
+	if stages not in (2, 3):
+		raise ValueError("Only 2- and 3-stage cascades are supported!")
+
+	keyspace = multikey.CIPHERS[cipher][1]
+	key_bits = keyspace.bit_length() - 1
+	F = SDES.fast_F if cipher == 'sdes' else SAES.fast_F
+	width = meet_width(cipher, stages, len(pairs))
+	plaintexts = [ p for p, _ in pairs[:width] ]
+	ciphertexts = [ c for _, c in pairs[:width] ]
+
+	# Forward from the plaintext through the first stage, for every key
+	index = MiddleIndex( middle_values(plaintexts, cipher, True), key_bits )
+
+	# Backward from the ciphertext through the other stages
+	found = []
+	outer_keys = range(keyspace) if stages == 3 else [None]
+	for outer in outer_keys:
+		blocks = ciphertexts
+		if outer is not None:
+			blocks = [ F(c, outer, False) for c in blocks ]
+
+		for middle_key, first_keys in index.matches( middle_values(blocks, cipher, False) ):
+			for first_key in first_keys:
+				keys = (first_key, middle_key) if outer is None else (first_key, middle_key, outer)
+				if _consistent(keys, pairs, cipher):
+					found.append(keys)
+
+	return sorted(found)
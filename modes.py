@@ -1,24 +1,213 @@
 #!/usr/bin/python3.8
 
-import concurrent.futures
+from array import array
+import collections
+import contextlib
+import importlib.util
+import itertools
+import mmap
+import os
+import sys
+import time
+
+# The backends, the process pool and shared memory are imported the first time they're used, so small jobs start
+# quickly. NumPy is only imported once a buffer is processed with it. (See `load_numpy`)
+HAVE_NUMPY = importlib.util.find_spec('numpy') is not None
+numpy = None
 
 SUPPORTED_MODES = ('ecb', 'cbc', 'ctr')
+SUPPORTED_BACKENDS = ('python', 'numpy', 'bitslice')
+
+# Buffers smaller than these are processed in Python by default (codebook lookups, or the T-tables for cipher objects
+# without codebooks), which are as fast or faster there and don't need NumPy or the bitsliced circuits imported
+NUMPY_MIN_SIZE = 1 << 12
+BITSLICE_MIN_SIZE = 1 << 12
+
+def load_numpy():
+	""" Imports NumPy for the 'numpy' backend the first time it's needed. """
+	global numpy
+	if numpy is None:
+		import numpy as module
+		numpy = module
+	
+	return numpy
+
+def block_function(key, F=None, blocksize=1):
+	""" Returns a per-block function `f(block, encrypt)` and the blocksize to use with it.
+	
+	Parameters
+	----------
+	key : int or cipher object
+		The cipher key to use, or a keyed cipher object (e.g. `SDES.SDESCipher`) when `F` is None.
+	F : function
+		The cipher algorithm to use. Leave as None when `key` is a keyed cipher object.
+	blocksize : int
+		The blocksize of the cipher in bytes. Ignored for keyed cipher objects, which carry their own.
+	
+	Returns
+	-------
+	function
+		The per-block cipher function.
+	int
+		The blocksize of the cipher in bytes.
+	"""
+	
+	if F is None:
+		return key.F, key.blocksize
+	else:
+		return (lambda block, encrypt=True: F(block, key, encrypt)), blocksize
+
+def codebooks(key, F=None):
+	""" Returns the (encrypt, decrypt) codebooks of a keyed cipher object, or None if there aren't any to use. """
+	if F is None and getattr(key, 'encrypt_table', None) is not None:
+		return key.encrypt_table, key.decrypt_table
+	else:
+		return None
+
+def select_backend(key, F=None, backend=None, size=None):
+	""" Chooses the backend used to process a buffer.
+	
+	Parameters
+	----------
+	key : int or cipher object
+		The cipher key to use, or a keyed cipher object when `F` is None.
+	F : function
+		The cipher algorithm to use. Leave as None when `key` is a keyed cipher object.
+	backend : string
+		The requested backend. [python, numpy, bitslice] Defaults to NumPy when it's installed and the cipher has 16-bit codebooks, and to bitslicing for cipher objects without codebooks. 1-byte-block codebooks default to 'python', since `bytes.translate` outruns a NumPy lookup.
+	size : int
+		The byte-size of the buffer, if known. Buffers smaller than `NUMPY_MIN_SIZE` (or `BITSLICE_MIN_SIZE`) default to 'python' rather than 'numpy' (or 'bitslice').
+	
+	Returns
+	-------
+	string
+		The backend to use. The NumPy backend works on codebooks, and the bitsliced backend on SDES/SAES cipher objects, so anything else falls back to 'python'.
+	"""
+	
+	if backend is None:
+		if codebooks(key, F) is None:
+			backend = 'bitslice' if size is None or size >= BITSLICE_MIN_SIZE else 'python'
+		elif key.blocksize == 1:
+			backend = 'python'
+		else:
+			backend = 'numpy' if HAVE_NUMPY and (size is None or size >= NUMPY_MIN_SIZE) else 'python'
+	elif backend not in SUPPORTED_BACKENDS:
+		raise ValueError(f"'{backend}' backend is not supported! Please use one of the following!\n {SUPPORTED_BACKENDS}")
+	elif backend == 'numpy' and not HAVE_NUMPY:
+		raise ImportError("The 'numpy' backend requires NumPy to be installed!")
+	
+	if backend == 'numpy' and codebooks(key, F) is None:
+		backend = 'python'
+	elif backend == 'bitslice':
+		import bitslice
+		if not (F is None and bitslice.supports(key)):
+			backend = 'python'
+	
+	if backend == 'numpy':
+		load_numpy()
+	return backend
+
+def make_cipher(cipher, key, input_size=0, cache_tables=False):
+	""" Builds the keyed cipher object for a cipher name and key string.
+	
+	Parameters
+	----------
+	cipher : string
+		The cipher algorithm to use. [sdes, saes]
+	key : string
+		The cipher key. Binary for SDES, hexadecimal for SAES. Several comma-separated keys build a cascade of the cipher, encrypting with each key in turn.
+	input_size : int
+		The byte-size of the data to process. SAES codebooks are only built when the data has more blocks than they do, or when the size isn't known (None, e.g. reading stdin).
+	cache_tables : bool
+		Whether to load the key's codebooks from the on-disk cache, building and caching them on the first use. (See `tablecache`)
+	
+	Returns
+	-------
+	cipher object
+		The keyed `SDES.SDESCipher`, `SAES.SAESCipher` or `Cascade` of them.
+	"""
+	
+	if ',' in key:
+		return Cascade([ make_cipher(cipher, k, input_size, cache_tables) for k in key.split(',') ])
+	elif cache_tables:
+		import tablecache
+		return tablecache.cached_cipher(cipher, int(key, 2 if cipher == 'sdes' else 16))
+	elif cipher == 'sdes':
+		# Build the per-key codebooks once instead of running the full cipher per byte
+		import SDES
+		return SDES.SDESCipher(int(key, 2))
+	elif cipher == 'saes':
+		# Expand the key once, and precompute the codebooks when the file has more blocks than they do
+		import SAES
+		return SAES.SAESCipher(int(key, 16), input_size is None or input_size > 2 * 65536 * 2)
+
+def to_blocks(input_data, blocksize=1):
+	""" Views whole-block data as a sequence of block integers. (bytes for 1-byte blocks, array('H') for 2-byte blocks) """
+	if blocksize == 1:
+		return bytes(input_data)
+	
+	blocks = array('H', bytes(input_data))
+	if sys.byteorder == 'little':
+		blocks.byteswap()
+	return blocks
+
+def from_blocks(blocks, blocksize=1):
+	""" Converts a sequence of block integers back into big endian bytes. The inverse of `to_blocks`. """
+	if blocksize == 1:
+		return bytes(blocks)
+	
+	blocks = array('H', blocks)
+	if sys.byteorder == 'little':
+		blocks.byteswap()
+	return blocks.tobytes()
+
+def _ecb_table(input_data, table, blocksize=1):
+	""" Maps a codebook over whole-block data: one `bytes.translate` for 1-byte blocks. """
+	if blocksize == 1:
+		return bytes(input_data).translate(table)
+	
+	return from_blocks( array('H', map(table.__getitem__, to_blocks(input_data, blocksize))), blocksize )
 
-def ecb(input_data, key, F, encrypt=True, blocksize=1):
+def _numpy_dtype(blocksize):
+	return numpy.dtype('u1') if blocksize == 1 else numpy.dtype('>u2')
+
+def _numpy_table(table):
+	return numpy.frombuffer(table, dtype=numpy.uint8 if isinstance(table, bytes) else numpy.uint16)
+
+def _ecb_numpy(input_data, table, blocksize=1):
+	""" ECB as one fancy-indexed lookup over the whole chunk. """
+	blocks = numpy.frombuffer(input_data, dtype=_numpy_dtype(blocksize))
+	return _numpy_table(table)[blocks].astype(_numpy_dtype(blocksize)).tobytes()
+
+def _cbc_decrypt_numpy(input_data, table, iv, blocksize=1):
+	""" CBC decryption as one lookup over the chunk, XORed with the chunk shifted by a block. """
+	blocks = numpy.frombuffer(input_data, dtype=_numpy_dtype(blocksize))
+	if len(blocks) == 0:
+		return bytes(), iv
+	
+	output = _numpy_table(table)[blocks]
+	output[0] ^= iv & ((1 << (8 * blocksize)) - 1)
+	output[1:] ^= blocks[:-1]
+	
+	return output.astype(_numpy_dtype(blocksize)).tobytes(), int(blocks[-1])
+
+def ecb(input_data, key, F=None, encrypt=True, blocksize=1, backend=None):
 	""" Encrypt or decrypt the input using electronic code book (ECB) mode.
 	
 	Parameters
 	----------
 	input_data : bytearray
 		The data to process.
-	key : int
-		The cipher key to use.
+	key : int or cipher object
+		The cipher key to use, or a keyed cipher object when `F` is None.
 	F : function
-		The cipher algorithm to use.
+		The cipher algorithm to use. Leave as None when `key` is a keyed cipher object.
 	encrypt : bool
 		Whether to encrypt or decrypt the data. Defaults to encryption.
 	blocksize : int
 		The blocksize of the cipher in bytes
+	backend : string
+		The backend to use. [python, numpy, bitslice] See `select_backend`.
 	
 	Returns
 	-------
@@ -26,32 +215,54 @@ def ecb(input_data, key, F, encrypt=True, blocksize=1):
 		The ECB processed bytes.
 	"""	
 	
+	f, blocksize = block_function(key, F, blocksize)
+	
+	# A trailing partial block is XORed with the encryption of a zero block, so the output is the same length as the input
+	tail = len(input_data) % blocksize
+	if tail:
+		whole = len(input_data) - tail
+		output = ecb(input_data[:whole], key, F, encrypt, blocksize, backend)
+		return output + xor_bytes( input_data[whole:], f(0, True).to_bytes(blocksize, 'big')[:tail] )
+	
+	backend = select_backend(key, F, backend, len(input_data))
+	if backend == 'numpy':
+		return _ecb_numpy(input_data, codebooks(key)[0 if encrypt else 1], blocksize)
+	elif backend == 'bitslice':
+		import bitslice
+		return bitslice.ecb(key, input_data, encrypt)
+	
+	# Keyed cipher objects process the whole buffer with their codebooks
+	if F is None and hasattr(key, 'ecb'):
+		return key.ecb(input_data, encrypt)
+	
 	output = bytearray()
 	for i in range(0, len(input_data), blocksize):
 		b = int.from_bytes( input_data[i : i + blocksize], 'big' )
-		processed_byte = F(b, key, encrypt)
+		processed_byte = f(b, encrypt)
 		output += processed_byte.to_bytes(blocksize, 'big')
 	
 	return bytes(output)
 
 
-def cbc(input_data, key, iv, F, encrypt=True, blocksize=1):
+def cbc(input_data, key, iv, F=None, encrypt=True, blocksize=1, backend=None):
 	""" Encrypt or decrypt the input using cipher block chaining (CBC) mode.
 	
 	Parameters
 	----------
 	input_data : bytearray
 		The data to process.
-	key : int
-		The cipher key to use.
+	key : int or cipher object
+		The cipher key to use, or a keyed cipher object when `F` is None.
 	iv : int
 		The initialization vector to use.
 	F : function
-		The cipher algorithm to use.
+		The cipher algorithm to use. Leave as None when `key` is a keyed cipher object.
 	encrypt : bool
 		Whether to encrypt or decrypt the data. Defaults to encryption.
 	blocksize : int
 		The blocksize of the cipher in bytes
+	backend : string
+		The backend to use. [python, numpy, bitslice] See `select_backend`.
 		
 	Returns
 	-------
@@ -61,58 +272,623 @@ def cbc(input_data, key, iv, F, encrypt=True, blocksize=1):
 		The IV value to provide to the next chunk of data.
 	"""	
 	
+	f, blocksize = block_function(key, F, blocksize)
+	tables = codebooks(key, F)
+	
+	# A trailing partial block is XORed with the encryption of the last ciphertext block (residual block termination), so the output is the same length as the input
+	tail = len(input_data) % blocksize
+	if tail:
+		whole = len(input_data) - tail
+		output, iv = cbc(input_data[:whole], key, iv, F, encrypt, blocksize, backend)
+		pad = f(iv & ((1 << (8 * blocksize)) - 1), True).to_bytes(blocksize, 'big')[:tail]
+		return output + xor_bytes(input_data[whole:], pad), iv
+	
+	backend = select_backend(key, F, backend, len(input_data))
+	if not encrypt and backend == 'numpy':
+		return _cbc_decrypt_numpy(input_data, tables[1], iv, blocksize)
+	
+	# Decryption doesn't chain, so every block is decrypted at once (bitsliced, through the codebook, or by a cipher object without codebooks) and XORed with the previous ciphertext
+	if not encrypt and len(input_data) > 0 and (backend == 'bitslice' or tables is not None or (F is None and hasattr(key, 'ecb'))):
+		if backend == 'bitslice':
+			import bitslice
+			decrypted = bitslice.ecb(key, input_data, False)
+		elif tables is not None:
+			decrypted = _ecb_table(input_data, tables[1], blocksize)
+		else:
+			decrypted = key.ecb(input_data, False)
+		
+		previous = (iv & ((1 << (8 * blocksize)) - 1)).to_bytes(blocksize, 'big') + bytes(input_data[: -blocksize])
+		return xor_bytes(decrypted, previous), int.from_bytes( input_data[-blocksize :], 'big' )
+	
+	# Encryption is serial, so the fastest path is a plain table lookup per block
+	if encrypt and tables is not None and len(input_data) > 0:
+		table = tables[0]
+		iv &= (1 << (8 * blocksize)) - 1
+		output = []
+		for b in to_blocks(input_data, blocksize):
+			iv = table[b ^ iv]
+			output.append(iv)
+		return from_blocks(output, blocksize), iv
+	
 	output = bytearray()
 	for i in range(0, len(input_data), blocksize):
 		b = int.from_bytes( input_data[i : i + blocksize], 'big' )
 		if( encrypt ):
 			intermediate_value = b ^ iv
-			processed_byte = F(intermediate_value, key, encrypt)
+			processed_byte = f(intermediate_value, encrypt)
 			iv = processed_byte	
 		else:
-			intermediate_value = F(b, key, encrypt)
+			intermediate_value = f(b, encrypt)
 			processed_byte = intermediate_value ^ iv
 			iv = b
 		output += processed_byte.to_bytes(blocksize, 'big')
 		
 	return bytes(output), iv
 	
-def ctr(input_data, key, nonce, F, blocksize=1):
+def keystream(key, nonce, block_index, n_blocks, F=None, blocksize=1, backend=None):
+	""" Generates CTR keystream with random access. Block `i` of the stream is the encryption of `nonce + i`, wrapped at the block width.
+	
+	Parameters
+	----------
+	key : int or cipher object
+		The cipher key to use, or a keyed cipher object when `F` is None.
+	nonce : int
+		The nonce value of the stream.
+	block_index : int
+		The index of the first keystream block to generate.
+	n_blocks : int
+		The number of keystream blocks to generate.
+	F : function
+		The cipher algorithm to use. Leave as None when `key` is a keyed cipher object.
+	blocksize : int
+		The blocksize of the cipher in bytes
+	backend : string
+		The backend to use. [python, numpy, bitslice] See `select_backend`.
+	
+	Returns
+	-------
+	bytes
+		The keystream. (`n_blocks * blocksize` bytes)
+	"""
+	
+	f, blocksize = block_function(key, F, blocksize)
+	mask = (1 << (8 * blocksize)) - 1
+	start = (nonce + block_index) & mask
+	
+	backend = select_backend(key, F, backend, n_blocks * blocksize)
+	if backend == 'numpy':
+		counters = (numpy.arange(n_blocks, dtype=numpy.int64) + start) & mask
+		return _numpy_table(codebooks(key)[0])[counters].astype(_numpy_dtype(blocksize)).tobytes()
+	elif backend == 'bitslice':
+		import bitslice
+		return bitslice.keystream(key, start, n_blocks)
+	
+	# The counters are encrypted as one buffer, through the codebook or by a cipher object without codebooks
+	tables = codebooks(key, F)
+	if tables is not None:
+		return _ecb_table(counter_bytes(start, n_blocks, blocksize), tables[0], blocksize)
+	elif F is None and hasattr(key, 'ecb'):
+		return key.ecb(counter_bytes(start, n_blocks, blocksize))
+	
+	return from_blocks([ f((start + i) & mask) for i in range(n_blocks) ], blocksize)
+
+def counter_bytes(start, n_blocks, blocksize=1):
+	""" The big endian bytes of the counters `start, start + 1, ...`, wrapping at the block width. Only the `n_blocks` counters asked for are built. """
+	period = 1 << (8 * blocksize)
+	start &= period - 1
+	counters = bytearray() if blocksize == 1 else array('H')
+	counters.extend(range(start, min(start + n_blocks, period)))
+	counters.extend(range(0, min(start + n_blocks - period, start)))
+	
+	# The counters repeat every `period` blocks
+	counters = from_blocks(counters, blocksize)
+	return (counters * -(-n_blocks // period))[: n_blocks * blocksize]
+
+def xor_bytes(a, b):
+	""" XORs two equal-length byte strings together. """
+	return ( int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big') ).to_bytes(len(a), 'big')
+
+def ctr_at(input_data, key, nonce, offset=0, F=None, blocksize=1, backend=None):
+	""" Encrypt or decrypt data found at byte `offset` of a CTR stream. Works for any offset and length, so chunks can be processed independently and in any order.
+	
+	Parameters
+	----------
+	input_data : bytearray
+		The data to process.
+	key : int or cipher object
+		The cipher key to use, or a keyed cipher object when `F` is None.
+	nonce : int
+		The nonce value of the stream.
+	offset : int
+		The byte position of `input_data` within the stream. Defaults to the start of the stream.
+	F : function
+		The cipher algorithm to use. Leave as None when `key` is a keyed cipher object.
+	blocksize : int
+		The blocksize of the cipher in bytes
+	backend : string
+		The backend to use. [python, numpy, bitslice] See `select_backend`.
+	
+	Returns
+	-------
+	bytes
+		The CTR processed bytes. (Same length as the input)
+	"""
+	
+	blocksize = block_function(key, F, blocksize)[1]
+	first_block, skip = divmod(offset, blocksize)
+	n_blocks = -(-(skip + len(input_data)) // blocksize)
+	
+	stream = keystream(key, nonce, first_block, n_blocks, F, blocksize, backend)
+	return xor_bytes(input_data, stream[skip : skip + len(input_data)])
+
+def ctr(input_data, key, nonce, F=None, blocksize=1, backend=None):
 	""" Encrypt or decrypt the input using counter (CTR) mode.
 	
 	Parameters
 	----------
 	input_data : bytearray
 		The data to process.
-	key : int
-		The cipher key to use.
+	key : int or cipher object
+		The cipher key to use, or a keyed cipher object when `F` is None.
 	nonce : int
 		The nonce value to use.
 	F : function
-		The cipher algorithm to use.
+		The cipher algorithm to use. Leave as None when `key` is a keyed cipher object.
 	blocksize : int
 		The blocksize of the cipher in bytes
+	backend : string
+		The backend to use. [python, numpy, bitslice] See `select_backend`.
 		 
 	Returns
 	-------
 	bytearray
-		The CTR processed bytes.
+		The CTR processed bytes. A trailing partial block only uses as much keystream as it needs.
 	int
 		The nonce value to provide to the next chunk of data.
 	"""	
+	
+	blocksize = block_function(key, F, blocksize)[1]
+	output = ctr_at(input_data, key, nonce, 0, F, blocksize, backend)
+	
+	return output, nonce + -(-len(input_data) // blocksize)
+
+def ctr_file_range(input_filename, key, nonce, offset, length, F=None, blocksize=1, backend=None):
+	""" Decrypt (or encrypt) only the bytes [offset, offset + length) of a CTR file, without processing the rest of it.
+	
+	Parameters
+	----------
+	input_filename : string
+		The name of the file to read from.
+	key : int or cipher object
+		The cipher key to use, or a keyed cipher object when `F` is None.
+	nonce : int
+		The nonce value the file was processed with.
+	offset : int
+		The byte position to start at.
+	length : int
+		The number of bytes to process.
+	F : function
+		The cipher algorithm to use. Leave as None when `key` is a keyed cipher object.
+	blocksize : int
+		The blocksize of the cipher in bytes
+	backend : string
+		The backend to use. [python, numpy, bitslice] See `select_backend`.
+	
+	Returns
+	-------
+	bytes
+		The processed bytes. (Shorter than `length` if the file ends first)
+	"""
+	
+	with open(input_filename, 'rb') as input_file:
+		input_file.seek(offset)
+		data = input_file.read(length)
+	
+	return ctr_at(data, key, nonce, offset, F, blocksize, backend)
+	
+class Cascade:
+	""" Multiple encryption: a keyed cipher object chaining other keyed cipher objects, so `E(x) = E_n(...E_2(E_1(x)))`. It can be used as the key of every mode.
+	
+	When every stage has codebooks, the cascade's own codebooks are composed from them once, so it costs the same as a single cipher. Otherwise each buffer is passed through the stages in turn, each with its fastest backend.
+	
+	Parameters
+	----------
+	ciphers : [cipher object]
+		The keyed cipher objects, in the order they encrypt. They must share a blocksize.
+	"""
+	
+	def __init__(self, ciphers):
+		self.ciphers = tuple(ciphers)
+		if len({ c.blocksize for c in self.ciphers }) != 1:
+			raise ValueError("Every cipher of a cascade must have the same blocksize!")
 		
-	output = bytearray()
-	ctr = 0
-	for i in range(0, len(input_data), blocksize):
-		b = int.from_bytes( input_data[i : i + blocksize], 'big' )
+		self.blocksize = self.ciphers[0].blocksize
+		self.key = tuple( c.key for c in self.ciphers )
+		self.encrypt_table = None
+		self.decrypt_table = None
 		
-		intermediate_value = F(nonce + ctr, key)
-		processed_byte = intermediate_value ^ b
-		ctr += 1
-		output += processed_byte.to_bytes(blocksize, 'big')
+		if all( codebooks(c) is not None for c in self.ciphers ):
+			self.encrypt_table = self._compose( c.encrypt_table for c in self.ciphers )
+			self.decrypt_table = self._compose( c.decrypt_table for c in reversed(self.ciphers) )
+	
+	def _compose(self, tables):
+		composed = range(1 << (8 * self.blocksize))
+		for table in tables:
+			composed = [ table[b] for b in composed ]
+		return bytes(composed) if self.blocksize == 1 else array('H', composed)
+	
+	def F(self, input, encrypt=True):
+		""" Encrypts or decrypts the provided block through every stage. """
+		table = self.encrypt_table if encrypt else self.decrypt_table
+		if table is not None:
+			return table[input & ((1 << (8 * self.blocksize)) - 1)]
+		
+		for c in (self.ciphers if encrypt else reversed(self.ciphers)):
+			input = c.F(input, encrypt)
+		return input
+	
+	def ecb(self, input_data, encrypt=True):
+		""" Encrypts or decrypts every block of the input, a stage at a time. A trailing partial block is handled as in `ecb`. """
+		if len(input_data) % self.blocksize:
+			return ecb(input_data, self, encrypt=encrypt)
+		
+		for c in (self.ciphers if encrypt else reversed(self.ciphers)):
+			input_data = ecb(input_data, c, encrypt=encrypt)
+		return bytes(input_data)
+
+class CipherContext:
+	""" Incremental encryption or decryption of a stream, one `update()` at a time.
+	
+	The context carries the CBC chaining value or the CTR stream position from one update to the next, like the `(output, iv)` tuples of `cbc` and `ctr`,
+	and holds back any partial block in ECB and CBC until the rest of it arrives. Concatenating the outputs of every `update()` and `finalize()`
+	gives the same bytes as processing all of the data at once.
+	
+	Parameters
+	----------
+	mode : string
+		The cipher mode to use. [ecb, cbc, ctr]
+	key : int or cipher object
+		The cipher key to use, or a keyed cipher object when `F` is None.
+	iv : int
+		The initialization vector (CBC) or nonce (CTR) to use. Ignored for ECB.
+	encrypt : bool
+		Whether to encrypt or decrypt the data. Defaults to encryption. (Ignored for CTR)
+	F : function
+		The cipher algorithm to use. Leave as None when `key` is a keyed cipher object.
+	blocksize : int
+		The blocksize of the cipher in bytes
+	backend : string
+		The backend to use. [python, numpy, bitslice] See `select_backend`.
+	"""
+	
+	def __init__(self, mode, key, iv=0, encrypt=True, F=None, blocksize=1, backend=None):
+		if mode not in SUPPORTED_MODES:
+			raise ValueError(f"'{mode}' mode is not supported! Please use one of the following!\n {SUPPORTED_MODES}")
 		
-	return bytes(output), (nonce + ctr)
+		self.mode = mode
+		self.key = key
+		self.F = F
+		self.blocksize = block_function(key, F, blocksize)[1]
+		self.iv = iv or 0
+		self.encrypt = encrypt
+		self.backend = backend
+		self.offset = 0
+		self.pending = bytearray()
+	
+	def _process(self, data):
+		if self.mode == 'ecb':
+			return ecb(data, self.key, self.F, self.encrypt, self.blocksize, self.backend)
+		elif self.mode == 'cbc':
+			output, self.iv = cbc(data, self.key, self.iv, self.F, self.encrypt, self.blocksize, self.backend)
+			return output
+		else:
+			output = ctr_at(data, self.key, self.iv, self.offset, self.F, self.blocksize, self.backend)
+			self.offset += len(data)
+			return output
 	
-def ecb_file(input_filename, output_filename, key, F, encrypt=True, blocksize=1, chunk_size=65535, multithreaded=False, max_workers=None):
+	def update(self, data):
+		""" Processes the next piece of the stream. Returns whatever output is ready, which in ECB and CBC stops at the last whole block. """
+		# CTR works at any byte offset, so nothing needs holding back
+		if self.mode == 'ctr':
+			return self._process(data)
+		
+		self.pending += data
+		whole = len(self.pending) - len(self.pending) % self.blocksize
+		if whole == 0:
+			return bytes()
+		
+		chunk = bytes(self.pending[:whole])
+		del self.pending[:whole]
+		return self._process(chunk)
+	
+	def finalize(self):
+		""" Processes any partial block still held back, the same way the file functions treat a file's last partial block. """
+		chunk, self.pending = bytes(self.pending), bytearray()
+		return self._process(chunk) if chunk else bytes()
+
+@contextlib.contextmanager
+def mapped_files(input_filename, output_filename):
+	""" Memory-maps the input file and a pre-sized output file, so chunks can be processed as `memoryview` slices without being read into new buffers.
+	
+	Parameters
+	----------
+	input_filename : string
+		The name of the file to process.
+	output_filename : string
+		The name of the file to write the processed data to. It is sized to match the input.
+	
+	Yields
+	------
+	memoryview
+		A read-only view of the input file.
+	mmap
+		The writable map of the output file. (None for an empty input)
+	"""
+	
+	with open(input_filename, 'rb') as input_file, open(output_filename, 'w+b') as output_file:
+		input_size = os.fstat(input_file.fileno()).st_size
+		output_file.truncate(input_size)
+		
+		# Empty files can't be mapped
+		if input_size == 0:
+			yield memoryview(bytes()), None
+			return
+		
+		with mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as input_map, mmap.mmap(output_file.fileno(), 0) as output_map:
+			with memoryview(input_map) as input_view:
+				yield input_view, output_map
+
+# The keyed cipher held by each worker process, set once by `init_worker`
+_worker_cipher = None
+
+# Shared memory blocks the worker process has already attached to, by name
+_worker_memory = {}
+
+def init_worker(key, F=None):
+	""" Process pool initializer. Stores the keyed cipher once per worker process, so the key, F and any codebooks aren't pickled with every chunk. """
+	global _worker_cipher
+	_worker_cipher = (key, F)
+
+def cipher_pool(key, F=None, max_workers=None):
+	""" Starts a process pool whose workers each hold the keyed cipher. Tasks run in it get the cipher from `init_worker` rather than their arguments. """
+	import concurrent.futures
+	return concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=(key, F))
+
+def attach_shared_memory(name):
+	""" Attaches a worker process to a shared memory block created by the parent, reusing the attachment for later chunks. """
+	if name not in _worker_memory:
+		from multiprocessing import shared_memory
+		_worker_memory[name] = shared_memory.SharedMemory(name=name)
+	
+	return _worker_memory[name]
+
+@contextlib.contextmanager
+def shared_slots(count, size):
+	""" Creates `count` shared memory blocks of `size` bytes to pass chunks to and from the workers, and unlinks them afterwards. """
+	from multiprocessing import shared_memory
+	slots = [ shared_memory.SharedMemory(create=True, size=size) for _ in range(count) ]
+	try:
+		yield slots
+	finally:
+		for slot in slots:
+			slot.close()
+			slot.unlink()
+
+def read_shared_chunks(input_file, slots, chunk_size):
+	""" Reads the file straight into the shared memory slots, in turn. Yields each (slot, length) read. """
+	for slot in itertools.cycle(slots):
+		length = input_file.readinto(slot.buf[:chunk_size])
+		if not length:
+			return
+		yield slot, length
+
+def process_shared_chunk(mode_function, name, length, kwargs):
+	""" Processes the first `length` bytes of the named shared memory block in place, with the worker's keyed cipher. Returns the length of the output. """
+	key, F = _worker_cipher
+	memory = attach_shared_memory(name)
+	output_bytes = mode_function(memory.buf[:length], key=key, F=F, **kwargs)
+	
+	# CBC also returns its chaining value
+	if isinstance(output_bytes, tuple):
+		output_bytes = output_bytes[0]
+	memory.buf[:len(output_bytes)] = output_bytes
+	
+	return len(output_bytes)
+
+def process_mapped_chunk(input_filename, output_filename, start, stop, mode_function, kwargs):
+	""" Processes the input file's bytes [start, stop) with the worker's keyed cipher and writes the result straight into the same slice of the (already sized) output file. Used by the parallel memory-mapped paths, so only offsets are sent to the workers. Returns the length of the output. """
+	key, F = _worker_cipher
+	with open(input_filename, 'rb') as input_file, open(output_filename, 'r+b') as output_file:
+		with mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as input_map, mmap.mmap(output_file.fileno(), 0) as output_map:
+			with memoryview(input_map) as input_view:
+				output_bytes = mode_function(input_view[start:stop], key=key, F=F, **kwargs)
+			
+			# CBC also returns its chaining value
+			if isinstance(output_bytes, tuple):
+				output_bytes = output_bytes[0]
+			output_map[start : start + len(output_bytes)] = output_bytes
+	
+	return len(output_bytes)
+
+def default_window(max_workers=None):
+	""" The default number of chunks kept in flight by the parallel paths. (Two per worker) """
+	return 2 * (max_workers or os.cpu_count() or 1)
+
+class Metrics:
+	""" Collects statistics about a file job as its chunks complete: bytes processed, chunk latency, busy time per worker, queue depth and throughput.
+	
+	Pass one as `metrics` to a file function. If given, `callback(metrics)` is called after every chunk, so progress can be rendered live.
+	Comparing the busy time of the workers with the elapsed time shows whether a job is CPU-bound (busy the whole time) or I/O-bound.
+	
+	Parameters
+	----------
+	total_bytes : int
+		The byte-size of the job, if known, for `progress`.
+	callback : function
+		Called with the metrics after every chunk.
+	recent : int
+		The number of most recent chunks `current_throughput` is measured over.
+	"""
+	
+	def __init__(self, total_bytes=None, callback=None, recent=16):
+		self.total_bytes = total_bytes
+		self.callback = callback
+		self.bytes = 0
+		self.chunks = 0
+		self.total_latency = 0.0
+		self.max_latency = 0.0
+		self.busy = collections.defaultdict(float)
+		self.queue_depth = 0
+		self.max_queue_depth = 0
+		self.started = time.perf_counter()
+		self.finished = None
+		self.recent = collections.deque(maxlen=recent)
+	
+	def chunk(self, length, latency, worker=None, busy=None, queue_depth=0):
+		""" Records a completed chunk.
+		
+		Parameters
+		----------
+		length : int
+			The number of bytes in the chunk.
+		latency : float
+			Seconds from the chunk being submitted to its result being ready.
+		worker : int
+			The process ID of the worker that processed it. Defaults to this process.
+		busy : float
+			Seconds the worker spent processing it. Defaults to the latency.
+		queue_depth : int
+			The number of chunks in flight when it completed.
+		"""
+		
+		self.bytes += length
+		self.chunks += 1
+		self.total_latency += latency
+		self.max_latency = max(self.max_latency, latency)
+		self.busy[os.getpid() if worker is None else worker] += latency if busy is None else busy
+		self.queue_depth = queue_depth
+		self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+		self.recent.append( (time.perf_counter(), length) )
+		
+		if self.callback is not None:
+			self.callback(self)
+	
+	def finish(self):
+		""" Stops the clock. Called by the file functions once the job is done. """
+		self.finished = time.perf_counter()
+	
+	@property
+	def elapsed(self):
+		""" Seconds since the job started. """
+		return (self.finished or time.perf_counter()) - self.started
+	
+	@property
+	def throughput(self):
+		""" Average bytes per second over the whole job. """
+		return self.bytes / self.elapsed if self.elapsed > 0 else 0.0
+	
+	@property
+	def current_throughput(self):
+		""" Bytes per second over the most recent chunks. """
+		if len(self.recent) < 2:
+			return self.throughput
+		
+		seconds = self.recent[-1][0] - self.recent[0][0]
+		return sum( length for _, length in itertools.islice(self.recent, 1, None) ) / seconds if seconds > 0 else self.throughput
+	
+	@property
+	def mean_latency(self):
+		""" Average seconds per chunk. """
+		return self.total_latency / self.chunks if self.chunks else 0.0
+	
+	@property
+	def progress(self):
+		""" The fraction of `total_bytes` processed so far. (None if the total isn't known) """
+		return self.bytes / self.total_bytes if self.total_bytes else None
+	
+	def utilization(self):
+		""" The fraction of the elapsed time each worker (by process ID) spent processing chunks. """
+		return { worker: busy / self.elapsed for worker, busy in self.busy.items() } if self.elapsed > 0 else {}
+	
+	def summary(self):
+		""" All of the statistics, as a dictionary. """
+		return dict(
+			bytes=self.bytes,
+			chunks=self.chunks,
+			seconds=self.elapsed,
+			throughput=self.throughput,
+			mean_latency=self.mean_latency,
+			max_latency=self.max_latency,
+			max_queue_depth=self.max_queue_depth,
+			busy=dict(self.busy),
+			utilization=self.utilization(),
+		)
+
+def measured(metrics, function, input_data, *args):
+	""" Runs `function(input_data, *args)` in this process, recording it as a chunk of `metrics` if given. """
+	if metrics is None:
+		return function(input_data, *args)
+	
+	start = time.perf_counter()
+	output = function(input_data, *args)
+	metrics.chunk(len(input_data), time.perf_counter() - start)
+	
+	return output
+
+def timed_task(function, *args):
+	""" Runs a task in a worker, returning its result with the worker's process ID and the seconds it took. """
+	start = time.perf_counter()
+	result = function(*args)
+	
+	return result, os.getpid(), time.perf_counter() - start
+
+def ordered_results(executor, tasks, window, metrics=None):
+	""" Runs a bounded, ordered pipeline over the executor.
+	
+	`tasks` (the reader stage) yields `(function, *args)` tuples, and is only advanced while fewer than `window` tasks are in flight. Results are yielded in submission order as soon as each is ready, so the caller can write them out (the writer stage) while later chunks are still being processed.
+	
+	Parameters
+	----------
+	executor : concurrent.futures.Executor
+		The executor running the cipher workers.
+	tasks : iterable
+		The `(function, *args)` tuples to run.
+	window : int
+		The maximum number of tasks in flight at once.
+	metrics : Metrics
+		Records each task as a chunk, if given. The tasks must return the number of bytes they processed.
+	
+	Yields
+	------
+	object
+		The result of each task, in order.
+	"""
+	
+	pending = collections.deque()
+	
+	def complete():
+		future, submitted = pending.popleft()
+		if metrics is None:
+			return future.result()
+		
+		result, worker, busy = future.result()
+		metrics.chunk(result, time.perf_counter() - submitted, worker, busy, len(pending) + 1)
+		return result
+	
+	for function, *args in tasks:
+		if metrics is None:
+			pending.append( (executor.submit(function, *args), None) )
+		else:
+			pending.append( (executor.submit(timed_task, function, *args), time.perf_counter()) )
+		
+		# Backpressure: wait on the oldest task before reading more
+		if len(pending) >= window:
+			yield complete()
+	
+	while pending:
+		yield complete()
+
+def ecb_file(input_filename, output_filename, key, F=None, encrypt=True, blocksize=1, chunk_size=65536, multithreaded=False, max_workers=None, backend=None, use_mmap=False, window=None, metrics=None):
 	""" Encrypt or decrypt the file using ECB and output the result into another file.
 	
 	Parameters
@@ -121,39 +897,78 @@ def ecb_file(input_filename, output_filename, key, F, encrypt=True, blocksize=1,
 		The name of the file to process.
 	output_filename : string
 		The name of the file to write the processed data to.
-	key : int
-		The cipher key to use.
+	key : int or cipher object
+		The cipher key to use, or a keyed cipher object when `F` is None.
 	F : function
-		The cipher algorithm to use.
+		The cipher algorithm to use. Leave as None when `key` is a keyed cipher object.
 	encrypt : bool
 		Whether to encrypt or decrypt the data. Defaults to encryption.
 	multithreaded : bool
 		Whether to process the file in parallel. Defaults to single-threaded.
 	blocksize : int
 		The blocksize of the cipher in bytes
+	chunk_size : int
+		The byte-size of chunks to process the file in, rounded down to whole blocks. Defaults to 65536.
+	max_workers : int
+		Maximum number of worker processes. Defaults to the number of processors.
+	backend : string
+		The backend to use for each chunk. [python, numpy, bitslice] See `select_backend`.
+	use_mmap : bool
+		Whether to memory-map the input and output files instead of reading and writing chunk copies. Defaults to regular file I/O.
+	window : int
+		The maximum number of chunks in flight when processing in parallel. Defaults to two per worker.
+	metrics : Metrics
+		Collects statistics about the job as each chunk completes, if given.
 	"""
 	
+	# Keyed cipher objects carry their own blocksize
+	if F is None:
+		blocksize = key.blocksize
+	
+	if window is None:
+		window = default_window(max_workers)
+	
+	# Chunks must hold whole blocks
+	chunk_size = max(chunk_size - chunk_size % blocksize, blocksize)
+	
+	# Memory-mapped files
+	if use_mmap:
+		with mapped_files(input_filename, output_filename) as (input_view, output_map):
+			if not multithreaded:
+				for start in range(0, len(input_view), chunk_size):
+					output_bytes = measured(metrics, ecb, input_view[start : start + chunk_size], key, F, encrypt, blocksize, backend)
+					output_map[start : start + len(output_bytes)] = output_bytes
+			else:
+				# Each worker maps the files itself and writes into its own slice of the output
+				with cipher_pool(key, F, max_workers) as executor:
+					kwargs = dict(encrypt=encrypt, blocksize=blocksize, backend=backend)
+					tasks = ( (process_mapped_chunk, input_filename, output_filename, start, start + chunk_size, ecb, kwargs) for start in range(0, len(input_view), chunk_size) )
+					for _ in ordered_results(executor, tasks, window, metrics):
+						pass
+	
 	# Single-threading
-	if not multithreaded:
+	elif not multithreaded:
 		with open(input_filename, 'rb') as input_file, open(output_filename, 'wb') as output_file:
 			# Process the file in 64kB chunks
 			while chunk := bytearray(input_file.read(chunk_size)):
-				output_file.write( ecb(chunk, key, F, encrypt, blocksize) )
+				output_file.write( measured(metrics, ecb, chunk, key, F, encrypt, blocksize, backend) )
 	
 	# Multi-threading
 	elif multithreaded:
-		with open(input_filename, 'rb') as input_file, open(output_filename, 'wb') as output_file, concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
-			# Create concurrent processes for each 64kB chunk
-			ecb_processes = []
-			while chunk := bytearray(input_file.read(chunk_size)):
-				ecb_processes.append( executor.submit(ecb, chunk, key, F, encrypt, blocksize) )
+		with open(input_filename, 'rb') as input_file, open(output_filename, 'wb') as output_file, cipher_pool(key, F, max_workers) as executor, shared_slots(window, chunk_size + blocksize) as slots:
+			# Read 64kB chunks into shared memory only as fast as the workers can take them
+			kwargs = dict(encrypt=encrypt, blocksize=blocksize, backend=backend)
+			tasks = ( (process_shared_chunk, ecb, slot.name, length, kwargs) for slot, length in read_shared_chunks(input_file, slots, chunk_size) )
 			
 			# Write the results to the output file, in order
-			for p in ecb_processes:
-				output_file.write( p.result() )
+			for slot, length in zip(itertools.cycle(slots), ordered_results(executor, tasks, window, metrics)):
+				output_file.write( slot.buf[:length] )
+	
+	if metrics is not None:
+		metrics.finish()
+
 
-				
-def cbc_file(input_filename, output_filename, key, iv, F, encrypt=True, blocksize=1, chunk_size=65535, multithreaded=False, max_workers=None):
+def cbc_file(input_filename, output_filename, key, iv, F=None, encrypt=True, blocksize=1, chunk_size=65536, multithreaded=False, max_workers=None, backend=None, use_mmap=False, window=None, metrics=None):
 	""" Encrypt or decrypt the file using CBC and output the result into another file.
 	
 	Parameters
@@ -162,42 +977,85 @@ def cbc_file(input_filename, output_filename, key, iv, F, encrypt=True, blocksiz
 		The name of the file to process.
 	output_filename : string
 		The name of the file to write the processed data to.
-	key : int
-		The cipher key to use.
+	key : int or cipher object
+		The cipher key to use, or a keyed cipher object when `F` is None.
 	iv : int
 		The initialization vector to use.
 	F : function
-		The cipher algorithm to use.
+		The cipher algorithm to use. Leave as None when `key` is a keyed cipher object.
 	encrypt : bool
 		Whether to encrypt or decrypt the data. Defaults to encryption.
 	blocksize : int
 		The blocksize of the cipher in bytes
 	multithreaded : bool
 		Whether to process the file in parallel. Defaults to single-threaded. (Decryption-only)
-	"""	
+	chunk_size : int
+		The byte-size of chunks to process the file in, rounded down to whole blocks. Defaults to 65536.
+	max_workers : int
+		Maximum number of worker processes. Defaults to the number of processors.
+	backend : string
+		The backend to use for each chunk. [python, numpy, bitslice] See `select_backend`.
+	use_mmap : bool
+		Whether to memory-map the input and output files instead of reading and writing chunk copies. Defaults to regular file I/O.
+	window : int
+		The maximum number of chunks in flight when processing in parallel. Defaults to two per worker.
+	metrics : Metrics
+		Collects statistics about the job as each chunk completes, if given.
+	"""
+	
+	# Keyed cipher objects carry their own blocksize
+	if F is None:
+		blocksize = key.blocksize	
+	
+	if window is None:
+		window = default_window(max_workers)
+	
+	# Chunks must hold whole blocks
+	chunk_size = max(chunk_size - chunk_size % blocksize, blocksize)
+	
+	# Memory-mapped files
+	if use_mmap:
+		with mapped_files(input_filename, output_filename) as (input_view, output_map):
+			if not multithreaded or encrypt:
+				for start in range(0, len(input_view), chunk_size):
+					output_bytes, iv = measured(metrics, cbc, input_view[start : start + chunk_size], key, iv, F, encrypt, blocksize, backend)
+					output_map[start : start + len(output_bytes)] = output_bytes
+			else:
+				# Each worker maps the files itself and writes into its own slice of the output
+				with cipher_pool(key, F, max_workers) as executor:
+					# Each chunk's IV is the last ciphertext block of the chunk before it
+					chunk_ivs = ( (start, int.from_bytes( input_view[start - blocksize : start], 'big' ) if start else iv) for start in range(0, len(input_view), chunk_size) )
+					tasks = ( (process_mapped_chunk, input_filename, output_filename, start, start + chunk_size, cbc, dict(iv=chunk_iv, encrypt=encrypt, blocksize=blocksize, backend=backend)) for start, chunk_iv in chunk_ivs )
+					for _ in ordered_results(executor, tasks, window, metrics):
+						pass
 	
 	# Single-threading (encryption and if chosen for decryption)
-	if not multithreaded or encrypt:
+	elif not multithreaded or encrypt:
 		with open(input_filename, 'rb') as input_file, open(output_filename, 'wb') as output_file:
 			# Process the file in 64kB chunks
 			while chunk := bytearray(input_file.read(chunk_size)):
-				output_bytes, iv = cbc(chunk, key, iv, F, encrypt, blocksize)
+				output_bytes, iv = measured(metrics, cbc, chunk, key, iv, F, encrypt, blocksize, backend)
 				output_file.write( output_bytes )
 	
 	# Multi-threading (decryption-only)
 	elif multithreaded:
-		with open(input_filename, 'rb') as input_file, open(output_filename, 'wb') as output_file, concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
-			# Create concurrent processes for each 64kB chunk
-			cbc_processes = []
-			while chunk := bytearray(input_file.read(chunk_size)):
-				cbc_processes.append( executor.submit(cbc, chunk, key, iv, F, encrypt, blocksize) )
-				iv = int.from_bytes( chunk[-blocksize:], 'big' )
+		with open(input_filename, 'rb') as input_file, open(output_filename, 'wb') as output_file, cipher_pool(key, F, max_workers) as executor, shared_slots(window, chunk_size + blocksize) as slots:
+			# Read 64kB chunks into shared memory only as fast as the workers can take them
+			def tasks(iv):
+				for slot, length in read_shared_chunks(input_file, slots, chunk_size):
+					# Grab the next IV before the worker overwrites the chunk
+					chunk_iv, iv = iv, int.from_bytes( slot.buf[length - blocksize : length], 'big' )
+					yield process_shared_chunk, cbc, slot.name, length, dict(iv=chunk_iv, encrypt=encrypt, blocksize=blocksize, backend=backend)
 			
 			# Write the results to the output file, in order
-			for p in cbc_processes:
-				output_file.write( p.result()[0] )
-			
-def ctr_file(input_filename, output_filename, key, nonce, F, blocksize=1, chunk_size=65535, multithreaded=False, max_workers=None):
+			for slot, length in zip(itertools.cycle(slots), ordered_results(executor, tasks(iv), window, metrics)):
+				output_file.write( slot.buf[:length] )
+	
+	if metrics is not None:
+		metrics.finish()
+
+
+def ctr_file(input_filename, output_filename, key, nonce, F=None, blocksize=1, chunk_size=65536, multithreaded=False, max_workers=None, backend=None, use_mmap=False, window=None, metrics=None):
 	""" Encrypt or decrypt the file using CTR and output the result into another file.
 	
 	Parameters
@@ -206,38 +1064,187 @@ def ctr_file(input_filename, output_filename, key, nonce, F, blocksize=1, chunk_
 		The name of the file to process.
 	output_filename : string
 		The name of the file to write the processed data to.
-	key : int
-		The cipher key to use.
+	key : int or cipher object
+		The cipher key to use, or a keyed cipher object when `F` is None.
 	nonce : int
 		The nonce value to use.
 	F : function
-		The cipher algorithm to use.
+		The cipher algorithm to use. Leave as None when `key` is a keyed cipher object.
 	blocksize : int
 		The blocksize of the cipher in bytes
 	multithreaded : bool
 		Whether to process the file in parallel. Defaults to single-threaded.
-	"""	
+	chunk_size : int
+		The byte-size of chunks to process the file in, rounded down to whole blocks. Defaults to 65536.
+	max_workers : int
+		Maximum number of worker processes. Defaults to the number of processors.
+	backend : string
+		The backend to use for each chunk. [python, numpy, bitslice] See `select_backend`.
+	use_mmap : bool
+		Whether to memory-map the input and output files instead of reading and writing chunk copies. Defaults to regular file I/O.
+	window : int
+		The maximum number of chunks in flight when processing in parallel. Defaults to two per worker.
+	metrics : Metrics
+		Collects statistics about the job as each chunk completes, if given.
+	"""
+	
+	# Keyed cipher objects carry their own blocksize
+	if F is None:
+		blocksize = key.blocksize	
+	
+	if window is None:
+		window = default_window(max_workers)
+	
+	# Chunks must hold whole blocks
+	chunk_size = max(chunk_size - chunk_size % blocksize, blocksize)
+	
+	# Memory-mapped files
+	if use_mmap:
+		with mapped_files(input_filename, output_filename) as (input_view, output_map):
+			if not multithreaded:
+				for start in range(0, len(input_view), chunk_size):
+					output_bytes = measured(metrics, ctr_at, input_view[start : start + chunk_size], key, nonce, start, F, blocksize, backend)
+					output_map[start : start + len(output_bytes)] = output_bytes
+			else:
+				# Each worker maps the files itself and writes into its own slice of the output
+				with cipher_pool(key, F, max_workers) as executor:
+					tasks = ( (process_mapped_chunk, input_filename, output_filename, start, start + chunk_size, ctr_at, dict(nonce=nonce, offset=start, blocksize=blocksize, backend=backend)) for start in range(0, len(input_view), chunk_size) )
+					for _ in ordered_results(executor, tasks, window, metrics):
+						pass
 	
 	# Single-threading	
-	if not multithreaded:
+	elif not multithreaded:
 		with open(input_filename, 'rb') as input_file, open(output_filename, 'wb') as output_file:
-			# Process the file in 64kB chunks
+			# Process the file in 64kB chunks, keeping track of where each one is in the stream
+			offset = 0
 			while chunk := bytearray(input_file.read(chunk_size)):
-				output_bytes, nonce = ctr(chunk, key, nonce, F, blocksize)
-				output_file.write( output_bytes )
+				output_file.write( measured(metrics, ctr_at, chunk, key, nonce, offset, F, blocksize, backend) )
+				offset += len(chunk)
 	
 	# Multi-threading	
 	elif multithreaded:
-		with open(input_filename, 'rb') as input_file, open(output_filename, 'wb') as output_file, concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
-			# Create concurrent processes for each 64kB chunk
-			ctr_processes = []
-			offset = 0
-			while chunk := bytearray(input_file.read(chunk_size)):
-				ctr_processes.append( executor.submit(ctr, chunk, key, nonce + offset, F, blocksize) )
-				offset += chunk_size
+		with open(input_filename, 'rb') as input_file, open(output_filename, 'wb') as output_file, cipher_pool(key, F, max_workers) as executor, shared_slots(window, chunk_size + blocksize) as slots:
+			# Read 64kB chunks into shared memory only as fast as the workers can take them
+			def tasks(offset=0):
+				for slot, length in read_shared_chunks(input_file, slots, chunk_size):
+					yield process_shared_chunk, ctr_at, slot.name, length, dict(nonce=nonce, offset=offset, blocksize=blocksize, backend=backend)
+					offset += length
 			
 			# Write the results to the output file, in order
-			for p in ctr_processes:
-				output_file.write( p.result()[0] )
+			for slot, length in zip(itertools.cycle(slots), ordered_results(executor, tasks(), window, metrics)):
+				output_file.write( slot.buf[:length] )
+	
+	if metrics is not None:
+		metrics.finish()
+
 
-	
\ No newline at end of file
+def process_stream(input_file, output_file, context, chunk_size=65536, metrics=None):
+	""" Processes one binary file object into another (e.g. stdin into stdout) through a `CipherContext`, a chunk at a time, so memory use stays bounded however long the stream is.
+	
+	Reads don't need to line up with blocks; the context holds back partial blocks until the rest arrives.
+	
+	Parameters
+	----------
+	input_file : file object
+		The binary stream to read from.
+	output_file : file object
+		The binary stream to write to.
+	context : CipherContext
+		The cipher context to process the stream with.
+	chunk_size : int
+		The byte-size of the reads.
+	metrics : Metrics
+		Collects statistics about the job as each chunk completes, if given.
+	
+	Returns
+	-------
+	int
+		The number of bytes read.
+	"""
+	
+	total = 0
+	while chunk := input_file.read(chunk_size):
+		total += len(chunk)
+		output_file.write( measured(metrics, context.update, chunk) )
+	
+	output_file.write( context.finalize() )
+	output_file.flush()
+	
+	if metrics is not None:
+		metrics.finish()
+	
+	return total
+
+def file_job(mode, input_filename, output_filename, key, iv=None, F=None, encrypt=True, blocksize=1, chunk_size=65536, backend=None):
+	""" Processes a single file serially with the given mode. Used as one job of `batch_files`.
+	
+	Parameters
+	----------
+	mode : string
+		The cipher mode to use. [ecb, cbc, ctr]
+	input_filename : string
+		The name of the file to process.
+	output_filename : string
+		The name of the file to write the processed data to.
+	key : int or cipher object
+		The cipher key to use, or a keyed cipher object when `F` is None.
+	iv : int
+		The IV or nonce value to use. (Unused for ECB)
+	F : function
+		The cipher algorithm to use. Leave as None when `key` is a keyed cipher object.
+	encrypt : bool
+		Whether to encrypt or decrypt the data. Defaults to encryption. (Unused for CTR)
+	blocksize : int
+		The blocksize of the cipher in bytes
+	chunk_size : int
+		The byte-size of chunks to process the file in.
+	backend : string
+		The backend to use for each chunk. [python, numpy, bitslice] See `select_backend`.
+	
+	Returns
+	-------
+	float
+		The time taken, in seconds.
+	"""
+	
+	start = time.perf_counter()
+	
+	if mode == 'ecb':
+		ecb_file(input_filename, output_filename, key, F, encrypt, blocksize, chunk_size, backend=backend)
+	elif mode == 'cbc':
+		cbc_file(input_filename, output_filename, key, iv, F, encrypt, blocksize, chunk_size, backend=backend)
+	elif mode == 'ctr':
+		ctr_file(input_filename, output_filename, key, iv, F, blocksize, chunk_size, backend=backend)
+	else:
+		raise ValueError(f"'{mode}' mode is not supported! Please use one of the following!\n {SUPPORTED_MODES}")
+	
+	return time.perf_counter() - start
+
+def batch_files(jobs, max_workers=None):
+	""" Processes many independent files across a process pool, one whole file per worker. Serial modes (like CBC encryption) still use every core this way.
+	
+	Parameters
+	----------
+	jobs : [dict]
+		The keyword arguments of `file_job` for each file.
+	max_workers : int
+		Maximum number of worker processes. Defaults to the number of processors on the machine.
+	
+	Yields
+	------
+	int
+		The index of the finished job in `jobs`.
+	float
+		The time the job took in seconds, or None if it failed.
+	Exception
+		The error the job failed with, or None if it succeeded.
+	"""
+	
+	import concurrent.futures
+	with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+		futures = { executor.submit(file_job, **job) : index for index, job in enumerate(jobs) }
+		
+		# Report each job as soon as it finishes
+		for future in concurrent.futures.as_completed(futures):
+			error = future.exception()
+			yield futures[future], (None if error else future.result()), error
@@ -0,0 +1,237 @@
+#!/usr/bin/python3.8
+"""
+ multikey.py
+ Encrypts or decrypts one buffer under many keys at once.
+
+ The work is shared across keys rather than starting from scratch for each one. Every SDES codebook is composed from
+ 256 precomputed round permutations with `bytes.translate`, so all 1024 of them form a single 1024 x 256 table and each
+ key's output is one translation of the data. SAES keys are processed together too: broadcast against the blocks with
+ NumPy when it's installed, and otherwise as the lanes of one bitsliced circuit, one (key, block) pair per lane.
+ Key ranges can be spread across processes.
+"""
+
+import concurrent.futures
+import os
+
+import SDES
+import SAES
+import bitslice
+import modes
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+# Block size and keyspace of each cipher
+CIPHERS = {
+	'sdes': (1, 1 << 10),
+	'saes': (2, 1 << 16),
+}
+
+# The most (key, block) pairs processed at once by the NumPy and bitsliced SAES paths, which bounds their memory use
+NUMPY_LANES = 1 << 20
+BITSLICE_LANES = 1 << 16
+
+_sdes_round_permutations = None
+
+def sdes_round_permutations():
+	""" The byte permutation of an SDES round (`f_K`) under each of the 256 subkeys, as `bytes.translate` tables. Built on first use. """
+	global _sdes_round_permutations
+	if _sdes_round_permutations is None:
+		rounds = SDES.tables().rounds
+		_sdes_round_permutations = tuple( bytes( n ^ (rounds[subkey][n & 0b1111] << 4) for n in range(256) ) for subkey in range(256) )
+
+	return _sdes_round_permutations
+
+def sdes_codebooks(keys=None, encrypt=True):
+	""" The SDES codebooks of many keys as one table.
+
+	Parameters
+	----------
+	keys : [int]
+		The keys. Defaults to all 1024 of them.
+	encrypt : bool
+		Whether to build the encryption or decryption codebooks.
+
+	Returns
+	-------
+	bytes
+		The codebooks, concatenated: bytes `256 * i` to `256 * i + 255` are the codebook of `keys[i]`.
+	"""
+
+	t = SDES.tables()
+	rounds = sdes_round_permutations()
+	identity = bytes(range(256))
+
+	codebooks = []
+	for key in (range(1 << 10) if keys is None else keys):
+		K1, K2 = t.subkeys[key & 0x3ff]
+		if not encrypt:
+			K1, K2 = K2, K1
+		codebooks.append( identity.translate(t.IP).translate(rounds[K1]).translate(t.SW).translate(rounds[K2]).translate(t.IP_inverse) )
+
+	return b''.join(codebooks)
+
+def _saes_numpy(input_data, keys, encrypt=True):
+	blocks = numpy.frombuffer(input_data, dtype='>u2')
+	output = []
+	step = max(1, NUMPY_LANES // max(1, len(blocks)))
+	for i in range(0, len(keys), step):
+		rows = SAES.F_keys( blocks[None, :], numpy.asarray(keys[i : i + step])[:, None], encrypt ).astype('>u2')
+		output.extend( row.tobytes() for row in rows )
+
+	return output
+
+def _saes_bitslice(input_data, keys, encrypt=True):
+	n_blocks = len(input_data) // 2
+	output = []
+	step = max(1, BITSLICE_LANES // max(1, n_blocks))
+	for i in range(0, len(keys), step):
+		batch = keys[i : i + step]
+		n_lanes = len(batch) * n_blocks
+		ones = (1 << n_lanes) - 1
+
+		# Lane `j * n_blocks + b` is block `b` under `batch[j]`
+		state = bitslice.to_slices( bytes(input_data) * len(batch), 2 )
+		key = bitslice.to_slices( b''.join( k.to_bytes(2, 'big') * n_blocks for k in batch ), 2 )
+		processed = bitslice.from_slices( bitslice.saes_slices(state, bitslice.saes_expand_key(key, ones), ones, encrypt), n_lanes, 2 )
+		output.extend( processed[j * len(input_data) : (j + 1) * len(input_data)] for j in range(len(batch)) )
+
+	return output
+
+def ecb_many(input_data, cipher, keys, encrypt=True):
+	""" Encrypts or decrypts whole-block data under every key.
+
+	Parameters
+	----------
+	input_data : bytes-like
+		The data to process. (A whole number of blocks)
+	cipher : string
+		The cipher algorithm to use. [sdes, saes]
+	keys : [int]
+		The keys to use.
+	encrypt : bool
+		Whether to encrypt or decrypt the data. Defaults to encryption.
+
+	Returns
+	-------
+	[bytes]
+		The processed data under each key, in the order of `keys`.
+	"""
+
+	keys = list(keys)
+	if not input_data:
+		return [ bytes() for _ in keys ]
+
+	if cipher == 'sdes':
+		codebooks = sdes_codebooks(keys, encrypt)
+		data = bytes(input_data)
+		return [ data.translate(codebooks[256 * i : 256 * (i + 1)]) for i in range(len(keys)) ]
+	elif numpy is not None:
+		return _saes_numpy(input_data, keys, encrypt)
+	else:
+		return _saes_bitslice(input_data, keys, encrypt)
+
+def process_many(input_data, cipher, keys, mode='ecb', iv=0, encrypt=True):
+	""" Encrypts or decrypts the input under every key, with the same output as the matching function in `modes` under each key.
+
+	Parameters
+	----------
+	input_data : bytes-like
+		The data to process.
+	cipher : string
+		The cipher algorithm to use. [sdes, saes]
+	keys : [int]
+		The keys to use.
+	mode : string
+		The cipher mode to use. [ecb, cbc, ctr]
+	iv : int
+		The IV or nonce to use. (Ignored for ECB)
+	encrypt : bool
+		Whether to encrypt or decrypt the data. Defaults to encryption. (Ignored for CTR)
+
+	Returns
+	-------
+	[bytes]
+		The key x output matrix: the processed data under each key, in the order of `keys`.
+	"""
+
+	keys = list(keys)
+	blocksize = CIPHERS[cipher][0]
+	mask = (1 << (8 * blocksize)) - 1
+	tail = len(input_data) % blocksize
+	whole = bytes(input_data[: len(input_data) - tail])
+
+	if mode == 'ctr':
+		n_blocks = -(-len(input_data) // blocksize)
+		streams = ecb_many( modes.counter_bytes(iv, n_blocks, blocksize), cipher, keys )
+		return [ modes.xor_bytes(input_data, stream[: len(input_data)]) for stream in streams ]
+
+	if mode == 'ecb':
+		output = ecb_many(whole, cipher, keys, encrypt)
+		# The residual block is XORed with the encryption of a zero block, as in `modes.ecb`
+		pad = bytes(blocksize)
+	elif not encrypt:
+		# Decryption doesn't chain, so every key decrypts all of the blocks at once
+		previous = (iv & mask).to_bytes(blocksize, 'big') + whole[: -blocksize]
+		output = [ modes.xor_bytes(decrypted, previous[: len(whole)]) for decrypted in ecb_many(whole, cipher, keys, False) ]
+		pad = whole[-blocksize :] if whole else (iv & mask).to_bytes(blocksize, 'big')
+	else:
+		# Encryption chains block to block, so each key runs serially
+		make = SDES.SDESCipher if cipher == 'sdes' else SAES.SAESCipher
+		return [ modes.cbc(input_data, make(key), iv)[0] for key in keys ]
+
+	if tail:
+		pads = ecb_many(pad, cipher, keys)
+		output = [ processed + modes.xor_bytes(input_data[-tail :], p[:tail]) for processed, p in zip(output, pads) ]
+
+	return output
+
+def iter_keys(input_data, cipher, mode='ecb', iv=0, encrypt=True, start=0, stop=None, batch_size=256, max_workers=1):
+	""" Streams the input processed under each key of a range, without holding the whole matrix in memory.
+
+	Parameters
+	----------
+	input_data : bytes-like
+		The data to process.
+	cipher : string
+		The cipher algorithm to use. [sdes, saes]
+	mode : string
+		The cipher mode to use. [ecb, cbc, ctr]
+	iv : int
+		The IV or nonce to use. (Ignored for ECB)
+	encrypt : bool
+		Whether to encrypt or decrypt the data. Defaults to encryption. (Ignored for CTR)
+	start : int
+		The first key.
+	stop : int
+		The key to stop before. Defaults to the end of the keyspace.
+	batch_size : int
+		The number of keys processed at once.
+	max_workers : int
+		Number of processes to spread the batches across. Defaults to this process only. (None uses every processor)
+
+	Yields
+	------
+	int
+		The key.
+	bytes
+		The input processed under the key.
+	"""
+
+	if stop is None:
+		stop = CIPHERS[cipher][1]
+	batches = [ range(b, min(b + batch_size, stop)) for b in range(start, stop, batch_size) ]
+	tasks = ( (process_many, bytes(input_data), cipher, batch, mode, iv, encrypt) for batch in batches )
+
+	if max_workers == 1:
+		results = ( function(*args) for function, *args in tasks )
+		for batch, output in zip(batches, results):
+			yield from zip(batch, output)
+		return
+
+	workers = max_workers or os.cpu_count() or 1
+	with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+		for batch, output in zip(batches, modes.ordered_results(executor, tasks, modes.default_window(workers))):
+			yield from zip(batch, output)
@@ -0,0 +1,153 @@
+#!/usr/bin/python3.8
+"""
+ streams.py
+ Encrypts and decrypts asyncio streams (sockets, pipes, subprocesses) in flight.
+
+ `CipherStreamReader` and `CipherStreamWriter` wrap an asyncio `StreamReader`/`StreamWriter` with a
+ `modes.CipherContext`, so data is processed as it passes through. Small pieces are processed inline; larger ones
+ are handed to an executor so the event loop keeps running while they're processed.
+"""
+
+import asyncio
+
+# Pieces at least this big are processed in the executor rather than on the event loop
+OFFLOAD_SIZE = 1 << 14
+
+async def process(context, data, executor=None, offload_size=OFFLOAD_SIZE):
+	""" Runs `context.update(data)`, in the executor (the loop's default when None) if the data is at least `offload_size` bytes. Awaiting each call in turn keeps the updates in order. """
+	if len(data) < offload_size:
+		return context.update(data)
+
+	return await asyncio.get_running_loop().run_in_executor(executor, context.update, data)
+
+class CipherStreamReader:
+	""" Reads from an asyncio `StreamReader`, processing the data with a cipher context.
+
+	Parameters
+	----------
+	reader : asyncio.StreamReader
+		The stream to read from.
+	context : modes.CipherContext
+		The context to process the data with. (Typically decrypting)
+	executor : concurrent.futures.Executor
+		Where large pieces are processed. Defaults to the loop's default executor.
+	offload_size : int
+		The byte-size from which pieces are processed in the executor.
+	"""
+
+	def __init__(self, reader, context, executor=None, offload_size=OFFLOAD_SIZE):
+		self.reader = reader
+		self.context = context
+		self.executor = executor
+		self.offload_size = offload_size
+		self.finished = False
+
+	async def read(self, n=65536):
+		""" Reads and processes up to `n` bytes of the stream. Returns an empty bytes object once the stream has ended and everything held back has been flushed.
+
+		Fewer bytes than were read can come back (a partial block is held back until the rest of it arrives), but never an empty result before the end of the stream.
+		"""
+		while not self.finished:
+			data = await self.reader.read(n)
+			if not data:
+				self.finished = True
+				return self.context.finalize()
+
+			output = await process(self.context, data, self.executor, self.offload_size)
+			if output:
+				return output
+
+		return bytes()
+
+	def __aiter__(self):
+		return self
+
+	async def __anext__(self):
+		output = await self.read()
+		if not output:
+			raise StopAsyncIteration
+		return output
+
+class CipherStreamWriter:
+	""" Writes to an asyncio `StreamWriter`, processing the data with a cipher context first.
+
+	Parameters
+	----------
+	writer : asyncio.StreamWriter
+		The stream to write to.
+	context : modes.CipherContext
+		The context to process the data with. (Typically encrypting)
+	executor : concurrent.futures.Executor
+		Where large pieces are processed. Defaults to the loop's default executor.
+	offload_size : int
+		The byte-size from which pieces are processed in the executor.
+	"""
+
+	def __init__(self, writer, context, executor=None, offload_size=OFFLOAD_SIZE):
+		self.writer = writer
+		self.context = context
+		self.executor = executor
+		self.offload_size = offload_size
+
+	async def write(self, data):
+		""" Processes the data and writes whatever output is ready, waiting for the stream's buffer to drain. """
+		output = await process(self.context, data, self.executor, self.offload_size)
+		if output:
+			self.writer.write(output)
+		await self.writer.drain()
+
+	async def write_eof(self):
+		""" Flushes anything held back by the context and closes the write end of the stream, so the other end sees the end of the data while replies can still be read from the same connection. """
+		output = self.context.finalize()
+		if output:
+			self.writer.write(output)
+		self.writer.write_eof()
+		await self.writer.drain()
+
+	async def close(self):
+		""" Flushes anything held back by the context and closes the stream. """
+		output = self.context.finalize()
+		if output:
+			self.writer.write(output)
+			await self.writer.drain()
+
+		self.writer.close()
+		await self.writer.wait_closed()
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, *exc_info):
+		await self.close()
+
+async def pipe(reader, writer, context, chunk_size=65536, executor=None, offload_size=OFFLOAD_SIZE):
+	""" Copies an asyncio stream to another, processing it with a cipher context on the way. Closes the writer at the end.
+
+	Returns
+	-------
+	int
+		The number of bytes read.
+	"""
+
+	total = 0
+	output = CipherStreamWriter(writer, context, executor, offload_size)
+	async with output:
+		while data := await reader.read(chunk_size):
+			total += len(data)
+			await output.write(data)
+
+	return total
+
+async def open_connection(host, port, encryptor, decryptor, executor=None, offload_size=OFFLOAD_SIZE, **kwargs):
+	""" Opens a connection like `asyncio.open_connection`, encrypting what's written with `encryptor` and decrypting what's read with `decryptor`.
+
+	Returns
+	-------
+	CipherStreamReader
+		The decrypting reader.
+	CipherStreamWriter
+		The encrypting writer.
+	"""
+
+	reader, writer = await asyncio.open_connection(host, port, **kwargs)
+	return CipherStreamReader(reader, decryptor, executor, offload_size), CipherStreamWriter(writer, encryptor, executor, offload_size)
@@ -0,0 +1,261 @@
+#!/usr/bin/python3.8
+"""
+ tablecache.py
+ An on-disk cache of per-key codebooks, so a key's tables are built once rather than on every run.
+
+ Each file holds the encrypt codebook followed by the decrypt codebook of one (cipher, key), after a header recording
+ the cipher, key, byte order and a CRC-32 of the tables. SAES codebooks are stored as `array('H')` dumps in the
+ machine's byte order and memory-mapped read-only when loaded, so they're used in place without being read or copied,
+ and every process using the same key shares one copy in the page cache. A mapped cipher object pickles as the name
+ of its file, so process pool workers map the file too rather than being sent the tables.
+
+ The files live in ~/.cache/sdes-for-python/tables, next to the `tune` calibrations. Loading a file bumps its
+ modification time, and once the directory grows past `MAX_CACHE_BYTES` the least recently used files are removed.
+ On top of that, each process keeps the last `MEMORY_ENTRIES` keys it loaded mapped. A file that fails its checks is
+ removed and rebuilt.
+
+ Layout (little endian header):
+   magic        4s   b'SDTC'
+   version      B
+   cipher       B    index into CIPHERS
+   entry size   B    bytes per codebook entry
+   byte order   B    0 for little endian entries, 1 for big endian
+   key          I
+   entries      I    entries per codebook
+   checksum     I    CRC-32 of the codebooks
+   (reserved)   12x
+   codebooks    2 * entries entries: encrypt, then decrypt
+"""
+
+from array import array
+import collections
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+CACHE_DIRECTORY = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'sdes-for-python', 'tables')
+
+MAGIC = b'SDTC'
+VERSION = 1
+CIPHERS = ('sdes', 'saes')
+
+# 32 bytes, so the codebooks that follow are aligned for mapping as 16-bit entries
+HEADER = struct.Struct('<4sBBBBIII12x')
+
+# Entries and bytes per entry of each cipher's codebooks
+CODEBOOKS = {
+	'sdes': (256, 1),
+	'saes': (65536, 2),
+}
+
+# The most bytes of codebook files kept on disk (about 500 SAES keys), and the most keys kept mapped by each process
+MAX_CACHE_BYTES = 128 << 20
+MEMORY_ENTRIES = 64
+
+# The codebooks this process has loaded, by file name, least recently used first
+_loaded = collections.OrderedDict()
+
+def table_filename(cipher, key, directory=CACHE_DIRECTORY):
+	""" The cache file of a (cipher, key). """
+	return os.path.join(directory, f"{cipher}-{key:04x}.tables")
+
+class MappedCodebooks:
+	""" The codebooks of a cache file, memory-mapped read-only and checked against the header. Unpacks to (encrypt, decrypt).
+
+	SAES codebooks are `memoryview`s of 16-bit entries over the mapping. SDES codebooks (512 bytes) are copied out as
+	`bytes`, which `bytes.translate` needs.
+
+	Parameters
+	----------
+	cipher : string
+		The cipher algorithm of the codebooks. [sdes, saes]
+	key : int
+		The cipher key of the codebooks.
+	directory : string
+		The cache directory.
+	"""
+
+	def __init__(self, cipher, key, directory=CACHE_DIRECTORY):
+		self.cipher = cipher
+		self.key = key
+		self.directory = directory
+		entries, size = CODEBOOKS[cipher]
+
+		with open(table_filename(cipher, key, directory), 'rb') as f:
+			self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+		if len(self.map) != HEADER.size + 2 * entries * size:
+			raise ValueError("Codebook file is the wrong size!")
+		magic, version, cipher_index, entry_size, big_endian, file_key, file_entries, checksum = HEADER.unpack_from(self.map)
+		if (magic, version, cipher_index, entry_size, file_key, file_entries) != (MAGIC, VERSION, CIPHERS.index(cipher), size, key, entries):
+			raise ValueError("Codebook file header doesn't match its cipher and key!")
+		if big_endian != (sys.byteorder == 'big'):
+			raise ValueError("Codebook file was written on a machine of the other byte order!")
+
+		view = memoryview(self.map)[HEADER.size :]
+		if zlib.crc32(view) != checksum:
+			raise ValueError("Codebook file failed its checksum!")
+
+		if size == 1:
+			self.encrypt, self.decrypt = bytes(view[:entries]), bytes(view[entries:])
+		else:
+			view = view.cast('H')
+			self.encrypt, self.decrypt = view[:entries], view[entries:]
+
+	def __iter__(self):
+		return iter((self.encrypt, self.decrypt))
+
+	def __reduce__(self):
+		# Pickled as where the codebooks are, so whoever unpickles them maps the same file
+		return (open_codebooks, (self.cipher, self.key, self.directory))
+
+def load(cipher, key, directory=CACHE_DIRECTORY):
+	""" Loads the cached codebooks of a key, from this process's most recently used keys or by mapping the key's file.
+
+	Returns
+	-------
+	MappedCodebooks
+		The codebooks, or None if they aren't cached. A file that fails its checks is removed, so it's rebuilt.
+	"""
+
+	filename = table_filename(cipher, key, directory)
+	if filename in _loaded:
+		_loaded.move_to_end(filename)
+		return _loaded[filename]
+
+	try:
+		codebooks = MappedCodebooks(cipher, key, directory)
+	except OSError:
+		return None
+	except ValueError:
+		remove(filename)
+		return None
+
+	# The modification time orders the files for eviction, so a hit counts as a use
+	try:
+		os.utime(filename)
+	except OSError:
+		pass
+
+	_loaded[filename] = codebooks
+	while len(_loaded) > MEMORY_ENTRIES:
+		_loaded.popitem(last=False)
+	return codebooks
+
+def remove(filename):
+	""" Removes a cache file, if it's still there. """
+	try:
+		os.remove(filename)
+	except OSError:
+		pass
+
+def prune(directory=CACHE_DIRECTORY, max_bytes=MAX_CACHE_BYTES):
+	""" Removes the least recently used codebook files until the directory holds at most `max_bytes` of them. Returns the number of files removed. """
+	try:
+		entries = [ entry for entry in os.scandir(directory) if entry.name.endswith('.tables') and entry.is_file() ]
+	except OSError:
+		return 0
+
+	files = []
+	for entry in entries:
+		try:
+			stat = entry.stat()
+		except OSError:
+			continue
+		files.append( (stat.st_mtime, stat.st_size, entry.path) )
+
+	total = sum( size for _, size, _ in files )
+	removed = 0
+	for _, size, path in sorted(files):
+		if total <= max_bytes:
+			break
+		remove(path)
+		total -= size
+		removed += 1
+
+	return removed
+
+def store(cipher, key, codebooks, directory=CACHE_DIRECTORY, max_bytes=MAX_CACHE_BYTES):
+	""" Caches the (encrypt, decrypt) codebooks of a key, then evicts the least recently used files past `max_bytes`.
+
+	The file is written whole and renamed into place, so readers never see part of it.
+
+	Returns
+	-------
+	MappedCodebooks
+		The stored codebooks, mapped from their file. None if the cache couldn't be written, which isn't an error.
+	"""
+
+	if cipher == 'sdes':
+		data = bytes(codebooks[0]) + bytes(codebooks[1])
+	else:
+		data = ( array('H', codebooks[0]) + array('H', codebooks[1]) ).tobytes()
+
+	entries, size = CODEBOOKS[cipher]
+	header = HEADER.pack(MAGIC, VERSION, CIPHERS.index(cipher), size, sys.byteorder == 'big', key, entries, zlib.crc32(data))
+
+	filename = table_filename(cipher, key, directory)
+	temporary = f"{filename}.{os.getpid()}.tmp"
+	try:
+		os.makedirs(directory, exist_ok=True)
+		with open(temporary, 'wb') as f:
+			f.write(header + data)
+		os.replace(temporary, filename)
+	except OSError:
+		remove(temporary)
+		return None
+
+	# A stale mapping of a replaced file would outlive it
+	_loaded.pop(filename, None)
+	prune(directory, max_bytes)
+	return load(cipher, key, directory)
+
+def build(cipher, key):
+	""" Builds the (encrypt, decrypt) codebooks of a key from scratch. """
+	if cipher == 'sdes':
+		import SDES
+		keyed = SDES.SDESCipher(key)
+	else:
+		import SAES
+		keyed = SAES.SAESCipher(key, True)
+
+	return keyed.encrypt_table, keyed.decrypt_table
+
+def open_codebooks(cipher, key, directory=CACHE_DIRECTORY, max_bytes=MAX_CACHE_BYTES):
+	""" The codebooks of a key: loaded from the cache, or built and cached on a miss. If the cache can't be written, the built codebooks are returned as they are. """
+	codebooks = load(cipher, key, directory)
+	if codebooks is None:
+		built = build(cipher, key)
+		codebooks = store(cipher, key, built, directory, max_bytes) or built
+
+	return codebooks
+
+def cached_cipher(cipher, key, directory=CACHE_DIRECTORY, max_bytes=MAX_CACHE_BYTES):
+	""" Builds the keyed cipher object of a (cipher, key) with its codebooks, loading them from the cache, or building and caching them on a miss.
+
+	Parameters
+	----------
+	cipher : string
+		The cipher algorithm to use. [sdes, saes]
+	key : int
+		The cipher key.
+	directory : string
+		The cache directory.
+	max_bytes : int
+		The most bytes of codebook files kept in the directory.
+
+	Returns
+	-------
+	cipher object
+		The keyed `SDES.SDESCipher` or `SAES.SAESCipher`, with its codebooks.
+	"""
+
+	codebooks = open_codebooks(cipher, key, directory, max_bytes)
+	if cipher == 'sdes':
+		import SDES
+		return SDES.SDESCipher(key, tuple(codebooks))
+	else:
+		import SAES
+		return SAES.SAESCipher(key, codebooks=codebooks)
@@ -0,0 +1,49 @@
+#!/usr/bin/python3.8
+"""
+ test_mitm.py
+ Checks that the meet-in-the-middle search recovers the keys of a double SDES cascade, through the NumPy index and
+ the `bisect` fallback.
+
+ Run with `python3.8 -m unittest test_mitm` (or pytest).
+"""
+
+import unittest
+from unittest import mock
+
+import crack
+import mitm
+import modes
+import SDES
+
+KEYS = (0b1010000010, 0b0111111101)
+PLAINTEXT = b'Meet me!'
+
+class TestMeetInTheMiddle(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cascade = modes.Cascade([ SDES.SDESCipher(k) for k in KEYS ])
+		cls.pairs = crack.to_pairs(PLAINTEXT, modes.ecb(PLAINTEXT, cascade), cascade.blocksize)
+
+	def test_double_sdes(self):
+		self.assertIn(KEYS, mitm.meet_in_the_middle(self.pairs, 'sdes'))
+
+	def test_without_numpy(self):
+		with mock.patch.object(mitm, 'numpy', None):
+			found = mitm.meet_in_the_middle(self.pairs, 'sdes')
+		self.assertIn(KEYS, found)
+		self.assertEqual(found, mitm.meet_in_the_middle(self.pairs, 'sdes'))
+
+	def test_found_keys_are_consistent(self):
+		for keys in mitm.meet_in_the_middle(self.pairs, 'sdes'):
+			cascade = modes.Cascade([ SDES.SDESCipher(k) for k in keys ])
+			self.assertEqual(crack.to_pairs(PLAINTEXT, modes.ecb(PLAINTEXT, cascade), 1), self.pairs)
+
+	def test_bad_arguments(self):
+		with self.assertRaises(ValueError):
+			mitm.meet_in_the_middle([], 'sdes')
+		with self.assertRaises(ValueError):
+			mitm.meet_in_the_middle(self.pairs, 'sdes', 4)
+
+if __name__ == "__main__":
+	unittest.main()
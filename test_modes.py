@@ -0,0 +1,174 @@
+#!/usr/bin/python3.8
+"""
+ test_modes.py
+ Checks the block modes and file functions of `modes`: every backend against the plain Python path, and the parallel
+ and memory-mapped file paths against single-threaded processing.
+
+ Run with `python3.8 -m unittest test_modes` (or pytest).
+"""
+
+import os
+import random
+import tempfile
+import unittest
+
+import modes
+import SAES
+import SDES
+
+def sample_data(size, seed=0):
+	return random.Random(seed).getrandbits(8 * size).to_bytes(size, 'little') if size else bytes()
+
+class TestBackends(unittest.TestCase):
+
+	def setUp(self):
+		self.ciphers = [ SDES.SDESCipher(0b1010000010), SAES.SAESCipher(0xa73b, True) ]
+
+	def test_default_backend(self):
+		size = 1 << 16
+		self.assertEqual(modes.select_backend(self.ciphers[0], size=size), 'python')
+		self.assertEqual(modes.select_backend(self.ciphers[1], size=size), 'numpy' if modes.HAVE_NUMPY else 'python')
+
+	@unittest.skipIf(not modes.HAVE_NUMPY, "The numpy backend needs NumPy")
+	def test_cbc_decrypt_wide_iv(self):
+		# IVs wider than a block are masked to the block width, on every path
+		data = sample_data(1 << 12)
+		for cipher in self.ciphers:
+			iv = 300 if cipher.blocksize == 1 else 0x1a73b
+			expected = modes.cbc(data, cipher, iv, encrypt=False, backend='python')
+			with self.subTest(blocksize=cipher.blocksize):
+				self.assertEqual(modes.cbc(data, cipher, iv, encrypt=False, backend='numpy'), expected)
+				self.assertEqual(expected[0], modes.cbc(data, cipher, iv & ((1 << (8 * cipher.blocksize)) - 1), encrypt=False, backend='python')[0])
+				self.assertEqual(modes.cbc(expected[0], cipher, iv, backend='python')[0], data)
+
+class TestOddLengths(unittest.TestCase):
+	""" Data that doesn't fill its last SAES block keeps its length and round-trips, on every backend. """
+	
+	LENGTHS = (0, 1, 3, 2 * 2048 + 1)
+	
+	def setUp(self):
+		self.ciphers = [ SAES.SAESCipher(0xa73b, True), SAES.SAESCipher(0xa73b) ]
+		self.backends = [ b for b in modes.SUPPORTED_BACKENDS if b != 'numpy' or modes.HAVE_NUMPY ]
+	
+	def test_cipher_ecb(self):
+		for cipher in self.ciphers:
+			for length in self.LENGTHS:
+				data = sample_data(length)
+				with self.subTest(tables=cipher.encrypt_table is not None, length=length):
+					output = cipher.ecb(data)
+					self.assertEqual(len(output), length)
+					self.assertEqual(output, modes.ecb(data, cipher, backend='python'))
+					self.assertEqual(cipher.ecb(output, False), data)
+	
+	def test_ecb(self):
+		for cipher in self.ciphers:
+			for length in self.LENGTHS:
+				data = sample_data(length)
+				expected = modes.ecb(data, cipher, backend='python')
+				# The tail is XORed with the encryption of a zero block
+				self.assertEqual(expected[length & ~1 :], modes.xor_bytes( data[length & ~1 :], cipher.F(0).to_bytes(2, 'big')[: length & 1] ))
+				for backend in self.backends:
+					with self.subTest(tables=cipher.encrypt_table is not None, length=length, backend=backend):
+						output = modes.ecb(data, cipher, backend=backend)
+						self.assertEqual(output, expected)
+						self.assertEqual(modes.ecb(output, cipher, encrypt=False, backend=backend), data)
+	
+	def test_cbc(self):
+		for cipher in self.ciphers:
+			for length in self.LENGTHS:
+				data = sample_data(length)
+				expected, iv = modes.cbc(data, cipher, 0x5a5a, backend='python')
+				self.assertEqual(len(expected), length)
+				for backend in self.backends:
+					with self.subTest(tables=cipher.encrypt_table is not None, length=length, backend=backend):
+						self.assertEqual(modes.cbc(data, cipher, 0x5a5a, backend=backend), (expected, iv))
+						self.assertEqual(modes.cbc(expected, cipher, 0x5a5a, encrypt=False, backend=backend)[0], data)
+	
+	def test_context(self):
+		# A stream fed a byte at a time holds back the partial block until `finalize`
+		data = sample_data(self.LENGTHS[-1])
+		for mode in modes.SUPPORTED_MODES:
+			context = modes.CipherContext(mode, self.ciphers[0], 0x5a5a)
+			output = b''.join( context.update(data[i : i + 1]) for i in range(len(data)) ) + context.finalize()
+			whole = modes.CipherContext(mode, self.ciphers[0], 0x5a5a)
+			with self.subTest(mode=mode):
+				self.assertEqual(output, whole.update(data) + whole.finalize())
+				decrypt = modes.CipherContext(mode, self.ciphers[0], 0x5a5a, False)
+				self.assertEqual(decrypt.update(output) + decrypt.finalize(), data)
+
+class TestCascade(unittest.TestCase):
+	""" A cascade matches its stages applied in turn, and decrypts what it encrypts, with and without composed codebooks. """
+	
+	def setUp(self):
+		self.cascades = [
+			[ SDES.SDESCipher(k) for k in (0b1010000010, 0b0111111101) ],
+			[ SAES.SAESCipher(k, True) for k in (0xa73b, 0x1234, 0xbeef) ],
+			[ SAES.SAESCipher(k) for k in (0xa73b, 0x1234) ],
+		]
+	
+	def test_stages(self):
+		data = sample_data(4096)
+		for stages in self.cascades:
+			cascade = modes.Cascade(stages)
+			expected = data
+			for stage in stages:
+				expected = modes.ecb(expected, stage)
+			with self.subTest(key=cascade.key):
+				self.assertEqual((cascade.encrypt_table is None), any( s.encrypt_table is None for s in stages ))
+				self.assertEqual(modes.ecb(data, cascade), expected)
+				self.assertEqual(cascade.F( int.from_bytes(data[: cascade.blocksize], 'big') ), int.from_bytes(expected[: cascade.blocksize], 'big'))
+	
+	def test_round_trip(self):
+		data = sample_data(2 * 2048 + 1)
+		for stages in self.cascades:
+			cascade = modes.Cascade(stages)
+			with self.subTest(key=cascade.key):
+				self.assertEqual(modes.ecb(modes.ecb(data, cascade), cascade, encrypt=False), data)
+				self.assertEqual(modes.cbc(modes.cbc(data, cascade, 0x5a)[0], cascade, 0x5a, encrypt=False)[0], data)
+				self.assertEqual(modes.ctr(modes.ctr(data, cascade, 0x5a)[0], cascade, 0x5a)[0], data)
+	
+	def test_mixed_blocksizes(self):
+		with self.assertRaises(ValueError):
+			modes.Cascade([ SDES.SDESCipher(0), SAES.SAESCipher(0) ])
+
+class TestParallelFiles(unittest.TestCase):
+	""" The file functions give the same bytes for any chunk size and worker count, through shared memory or memory-mapped files. """
+	
+	@classmethod
+	def setUpClass(cls):
+		cls.directory = tempfile.TemporaryDirectory()
+		cls.input_filename = os.path.join(cls.directory.name, 'input')
+		# An odd length leaves a partial SAES block at the end
+		cls.data = sample_data(20001)
+		with open(cls.input_filename, 'wb') as f:
+			f.write(cls.data)
+		cls.ciphers = [ SDES.SDESCipher(0b1010000010), SAES.SAESCipher(0xa73b, True) ]
+	
+	@classmethod
+	def tearDownClass(cls):
+		cls.directory.cleanup()
+	
+	def run_file(self, function, *args, **kwargs):
+		output_filename = os.path.join(self.directory.name, 'output')
+		function(self.input_filename, output_filename, *args, **kwargs)
+		with open(output_filename, 'rb') as f:
+			return f.read()
+	
+	def check(self, function, *args):
+		for cipher in self.ciphers:
+			expected = self.run_file(function, cipher, *args)
+			self.assertEqual(len(expected), len(self.data))
+			for chunk_size, max_workers, use_mmap in ((257, 2, False), (4097, 2, False), (4097, 3, True), (1001, 2, True), (65536, 2, False)):
+				with self.subTest(blocksize=cipher.blocksize, chunk_size=chunk_size, max_workers=max_workers, use_mmap=use_mmap):
+					self.assertEqual(self.run_file(function, cipher, *args, chunk_size=chunk_size, multithreaded=True, max_workers=max_workers, use_mmap=use_mmap), expected)
+			with self.subTest(blocksize=cipher.blocksize, single_mmap=True):
+				self.assertEqual(self.run_file(function, cipher, *args, chunk_size=3001, use_mmap=True), expected)
+	
+	def test_ctr_file(self):
+		self.check(modes.ctr_file, 0x1234)
+	
+	def test_ecb_file(self):
+		self.check(modes.ecb_file)
+
+if __name__ == "__main__":
+	unittest.main()
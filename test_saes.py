@@ -0,0 +1,99 @@
+#!/usr/bin/python3.8
+"""
+ test_saes.py
+ Checks the T-table SAES (`fast_process_block`, `fast_F`), the vectorized `F_keys` and the `SAESCipher` codebooks
+ against the reference `F`/`process_block`: every block under a sample of keys, and every key for the key expansion.
+
+ Run with `python3.8 -m unittest test_saes` (or pytest).
+"""
+
+import random
+import unittest
+
+import SAES
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+# The key from the SAES paper's worked example, the extremes, and a few random keys
+SAMPLE_KEYS = [0xa73b, 0x0000, 0xffff] + random.Random(20).sample(range(1 << 16), 2)
+
+class TestEveryBlock(unittest.TestCase):
+	""" Every block, both directions, under each of `SAMPLE_KEYS`. """
+
+	@classmethod
+	def setUpClass(cls):
+		cls.reference = {}
+		for key in SAMPLE_KEYS:
+			roundkeys = SAES.expand_key(key)
+			cls.reference[key] = tuple( [ SAES.process_block(b, roundkeys, encrypt) for b in range(1 << 16) ] for encrypt in (True, False) )
+
+	def test_fast_process_block(self):
+		for key in SAMPLE_KEYS:
+			keys = SAES.table_round_keys( SAES.expand_key(key) )
+			for encrypt, expected in zip((True, False), self.reference[key]):
+				with self.subTest(key=key, encrypt=encrypt):
+					self.assertEqual([ SAES.fast_process_block(b, keys, encrypt) for b in range(1 << 16) ], expected)
+
+	def test_codebooks(self):
+		for key in SAMPLE_KEYS:
+			cipher = SAES.SAESCipher(key, True)
+			with self.subTest(key=key):
+				self.assertEqual(list(cipher.encrypt_table), self.reference[key][0])
+				self.assertEqual(list(cipher.decrypt_table), self.reference[key][1])
+
+	def test_codebooks_invert(self):
+		for key in SAMPLE_KEYS:
+			cipher = SAES.SAESCipher(key, True)
+			with self.subTest(key=key):
+				self.assertEqual([ cipher.decrypt_table[c] for c in cipher.encrypt_table ], list(range(1 << 16)))
+
+	def test_cipher_without_codebooks(self):
+		for key in SAMPLE_KEYS:
+			cipher = SAES.SAESCipher(key)
+			with self.subTest(key=key):
+				self.assertEqual([ cipher.F(b) for b in range(1 << 16) ], self.reference[key][0])
+				self.assertEqual([ cipher.F(b, False) for b in range(1 << 16) ], self.reference[key][1])
+
+	@unittest.skipIf(numpy is None, "F_keys needs NumPy")
+	def test_F_keys(self):
+		blocks = numpy.arange(1 << 16)
+		for key in SAMPLE_KEYS:
+			for encrypt, expected in zip((True, False), self.reference[key]):
+				with self.subTest(key=key, encrypt=encrypt):
+					self.assertEqual(SAES.F_keys(blocks, numpy.array(key), encrypt).tolist(), expected)
+
+class TestEveryKey(unittest.TestCase):
+	""" Every key, both directions, on a block that changes with the key. Covers the key expansion and `table_round_keys`. """
+
+	@classmethod
+	def setUpClass(cls):
+		cls.blocks = [ key ^ 0x5a5a for key in range(1 << 16) ]
+		cls.reference = tuple( [ SAES.F(block, key, encrypt) for key, block in enumerate(cls.blocks) ] for encrypt in (True, False) )
+
+	def test_table_round_keys(self):
+		for key in range(1 << 16):
+			roundkeys = SAES.expand_key(key)
+			K0, K1, K2, mixed_K1 = SAES.table_round_keys(roundkeys)
+			self.assertEqual([ K >> 8 for K in (K0, K1, K2) ], [ w[0] for w in roundkeys ])
+			self.assertEqual([ K & 0xff for K in (K0, K1, K2) ], [ w[1] for w in roundkeys ])
+
+			nibbles = SAES.mix_columns([ K1 >> 12 & 0xf, K1 >> 8 & 0xf, K1 >> 4 & 0xf, K1 & 0xf ], inverse=True)
+			self.assertEqual(mixed_K1, nibbles[0] << 12 ^ nibbles[1] << 8 ^ nibbles[2] << 4 ^ nibbles[3])
+
+	def test_fast_F(self):
+		for encrypt, expected in zip((True, False), self.reference):
+			with self.subTest(encrypt=encrypt):
+				self.assertEqual([ SAES.fast_F(block, key, encrypt) for key, block in enumerate(self.blocks) ], expected)
+
+	@unittest.skipIf(numpy is None, "F_keys needs NumPy")
+	def test_F_keys(self):
+		keys = numpy.arange(1 << 16)
+		for encrypt, expected in zip((True, False), self.reference):
+			with self.subTest(encrypt=encrypt):
+				self.assertEqual(SAES.F_keys(numpy.array(self.blocks), keys, encrypt).tolist(), expected)
+
+if __name__ == "__main__":
+	unittest.main()
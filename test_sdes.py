@@ -0,0 +1,49 @@
+#!/usr/bin/python3.8
+"""
+ test_sdes.py
+ Checks the table-driven SDES (`tables`, `fast_f_K`, `fast_F`) and the `SDESCipher` codebooks against the reference
+ `F`, `f_K` and `generate_subkeys`, exhaustively: every key and every byte, encrypting and decrypting.
+
+ Run with `python3.8 -m unittest test_sdes` (or pytest).
+"""
+
+import unittest
+
+import SDES
+
+class TestSDES(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		# reference[encrypt][key] is the key's codebook under the reference F
+		cls.reference = { encrypt: [ bytes( SDES.F(b, key, encrypt) for b in range(256) ) for key in range(1024) ] for encrypt in (True, False) }
+
+	def test_subkeys(self):
+		subkeys = SDES.tables().subkeys
+		self.assertEqual(list(subkeys), [ SDES.generate_subkeys(key) for key in range(1024) ])
+
+	def test_fast_f_K(self):
+		for subkey in range(256):
+			self.assertEqual([ SDES.fast_f_K(num, subkey) for num in range(256) ], [ SDES.f_K(num, subkey) for num in range(256) ], f"subkey {subkey:08b}")
+
+	def test_fast_F(self):
+		for encrypt in (True, False):
+			for key in range(1024):
+				self.assertEqual(bytes( SDES.fast_F(b, key, encrypt) for b in range(256) ), self.reference[encrypt][key], f"key {key:010b}, encrypt={encrypt}")
+
+	def test_codebooks(self):
+		for key in range(1024):
+			cipher = SDES.SDESCipher(key)
+			self.assertEqual(cipher.encrypt_table, self.reference[True][key], f"key {key:010b}")
+			self.assertEqual(cipher.decrypt_table, self.reference[False][key], f"key {key:010b}")
+
+	def test_translate(self):
+		data = bytes(range(256))
+		for key in range(1024):
+			cipher = SDES.SDESCipher(key)
+			self.assertEqual(cipher.ecb(data), self.reference[True][key], f"key {key:010b}")
+			self.assertEqual(cipher.ecb(data, False), self.reference[False][key], f"key {key:010b}")
+			self.assertEqual(cipher.ecb(cipher.ecb(data), False), data, f"key {key:010b}")
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/python3.8
+"""
+ test_tablecache.py
+ Checks the on-disk codebook cache: cached codebooks match freshly built ones, a corrupted file is rejected by its
+ checksum and rebuilt, and the least recently used keys are evicted from memory and from disk.
+
+ Run with `python3.8 -m unittest test_tablecache` (or pytest).
+"""
+
+import collections
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import SAES
+import SDES
+import tablecache
+
+class TestTableCache(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.addCleanup(self.directory.cleanup)
+		# Each test starts with nothing loaded in this process
+		patcher = mock.patch.object(tablecache, '_loaded', collections.OrderedDict())
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def test_cached_codebooks(self):
+		for cipher, key, keyed in (('sdes', 0b1010000010, SDES.SDESCipher(0b1010000010)), ('saes', 0xa73b, SAES.SAESCipher(0xa73b, True))):
+			with self.subTest(cipher=cipher):
+				self.assertIsNone(tablecache.load(cipher, key, self.directory.name))
+				cached = tablecache.cached_cipher(cipher, key, self.directory.name)
+				self.assertTrue(os.path.exists(tablecache.table_filename(cipher, key, self.directory.name)))
+				self.assertEqual(list(cached.encrypt_table), list(keyed.encrypt_table))
+				self.assertEqual(list(cached.decrypt_table), list(keyed.decrypt_table))
+
+	def test_corrupted_file_is_rebuilt(self):
+		key = 0xa73b
+		filename = tablecache.table_filename('saes', key, self.directory.name)
+		tablecache.open_codebooks('saes', key, self.directory.name)
+
+		# Flip a bit of one codebook entry, and forget the mapping so the file is read again
+		with open(filename, 'r+b') as f:
+			f.seek(tablecache.HEADER.size + 1234)
+			byte = f.read(1)[0]
+			f.seek(-1, 1)
+			f.write(bytes([byte ^ 1]))
+		tablecache._loaded.clear()
+
+		self.assertIsNone(tablecache.load('saes', key, self.directory.name))
+		self.assertFalse(os.path.exists(filename))
+
+		cached = tablecache.cached_cipher('saes', key, self.directory.name)
+		self.assertTrue(os.path.exists(filename))
+		self.assertEqual(list(cached.encrypt_table), list(SAES.SAESCipher(key, True).encrypt_table))
+
+	def test_memory_eviction(self):
+		with mock.patch.object(tablecache, 'MEMORY_ENTRIES', 2):
+			for key in (1, 2, 3):
+				tablecache.open_codebooks('sdes', key, self.directory.name)
+			loaded = [ os.path.basename(filename) for filename in tablecache._loaded ]
+			self.assertEqual(loaded, ['sdes-0002.tables', 'sdes-0003.tables'])
+
+			# A hit makes a key the most recently used, so the other one goes next
+			tablecache.load('sdes', 2, self.directory.name)
+			tablecache.open_codebooks('sdes', 4, self.directory.name)
+			loaded = [ os.path.basename(filename) for filename in tablecache._loaded ]
+			self.assertEqual(loaded, ['sdes-0002.tables', 'sdes-0004.tables'])
+
+	def test_disk_eviction(self):
+		size = tablecache.HEADER.size + 2 * 256
+		for key in (1, 2, 3):
+			tablecache.open_codebooks('sdes', key, self.directory.name)
+			os.utime(tablecache.table_filename('sdes', key, self.directory.name), (key, key))
+
+		# Storing a fourth key past the limit evicts the least recently used file
+		tablecache.open_codebooks('sdes', 4, self.directory.name, max_bytes=3 * size)
+		self.assertEqual(sorted(os.listdir(self.directory.name)), ['sdes-0002.tables', 'sdes-0003.tables', 'sdes-0004.tables'])
+
+if __name__ == "__main__":
+	unittest.main()
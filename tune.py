@@ -0,0 +1,198 @@
+#!/usr/bin/python3.8
+"""
+ tune.py
+ Picks the backend, chunk size and worker count for a file job.
+
+ A short calibration times each backend on the first megabyte of the file and measures how long a process pool
+ takes to start. The measurements are cached per host (in ~/.cache/sdes-for-python/tuning.json), so later jobs
+ with the same cipher, mode and codebooks skip straight to planning. Inputs too small to pay back the pool's
+ start-up are processed in a single process.
+"""
+
+import json
+import math
+import os
+import platform
+import time
+
+import modes
+
+PROFILE_FILENAME = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'sdes-for-python', 'tuning.json')
+
+# Bytes of the file calibrated on, and the minimum time each backend is measured for
+SAMPLE_SIZE = 1 << 20
+MEASURE_SECONDS = 0.05
+
+# Chunks are sized to take about this long, within these bounds
+TARGET_CHUNK_SECONDS = 0.02
+MIN_CHUNK_SIZE = 1 << 16
+MAX_CHUNK_SIZE = 1 << 23
+
+def profile_key(key, mode, encrypt=True):
+	""" Identifies the calibrations that can be reused for a job, e.g. 'SAESCipher/cbc/decrypt/codebooks/numpy'. """
+	return '/'.join((
+		type(key).__name__,
+		mode,
+		'stream' if mode == 'ctr' else 'encrypt' if encrypt else 'decrypt',
+		'codebooks' if modes.codebooks(key) is not None else 'no-codebooks',
+		'numpy' if modes.HAVE_NUMPY else 'no-numpy',
+	))
+
+def run_mode(mode, data, key, encrypt=True, iv=0, backend=None):
+	""" Processes a buffer with one of the buffer modes. """
+	if mode == 'ecb':
+		return modes.ecb(data, key, encrypt=encrypt, backend=backend)
+	elif mode == 'cbc':
+		return modes.cbc(data, key, iv, encrypt=encrypt, backend=backend)
+	else:
+		return modes.ctr_at(data, key, iv, backend=backend)
+
+def measure_rate(mode, sample, key, encrypt=True, backend=None):
+	""" Measures a backend's throughput in bytes per second, on growing prefixes of the sample until one takes `MEASURE_SECONDS`. """
+	length = min(len(sample), 1 << 14)
+	while True:
+		start = time.perf_counter()
+		run_mode(mode, sample[:length], key, encrypt, backend=backend)
+		seconds = time.perf_counter() - start
+
+		if seconds >= MEASURE_SECONDS or length >= len(sample):
+			return length / seconds if seconds > 0 else float('inf')
+		length = min(2 * length, len(sample))
+
+def measure_pool_startup(key, max_workers=None):
+	""" Measures the seconds it takes to start a cipher pool, run a task on every worker and shut it down again. """
+	workers = max_workers or os.cpu_count() or 1
+
+	start = time.perf_counter()
+	with modes.cipher_pool(key, None, workers) as executor:
+		for future in [ executor.submit(os.getpid) for _ in range(workers) ]:
+			future.result()
+
+	return time.perf_counter() - start
+
+def calibrate(input_filename, key, mode, encrypt=True):
+	""" Times every usable backend on the first `SAMPLE_SIZE` bytes of the file, and the start-up of a process pool.
+
+	Returns
+	-------
+	dict
+		'rates' (bytes per second of each backend) and 'pool_startup' (seconds).
+	"""
+
+	with open(input_filename, 'rb') as input_file:
+		sample = input_file.read(SAMPLE_SIZE)
+	sample = sample[: len(sample) - len(sample) % key.blocksize] or bytes(key.blocksize)
+
+	# Backends that would fall back to another one aren't worth timing
+	backends = [ b for b in modes.SUPPORTED_BACKENDS if (b != 'numpy' or modes.HAVE_NUMPY) and modes.select_backend(key, None, b) == b ]
+
+	return {
+		'rates': { b: measure_rate(mode, sample, key, encrypt, b) for b in backends },
+		'pool_startup': measure_pool_startup(key),
+	}
+
+def load_profiles(filename=PROFILE_FILENAME):
+	""" Loads the cached calibrations of this host, by `profile_key`. """
+	try:
+		with open(filename) as f:
+			return json.load(f).get(platform.node(), {})
+	except (OSError, ValueError):
+		return {}
+
+def save_profile(name, profile, filename=PROFILE_FILENAME):
+	""" Caches a calibration for this host. Failing to write the cache isn't an error. """
+	try:
+		with open(filename) as f:
+			hosts = json.load(f)
+	except (OSError, ValueError):
+		hosts = {}
+
+	hosts.setdefault(platform.node(), {})[name] = profile
+	try:
+		os.makedirs(os.path.dirname(filename), exist_ok=True)
+		with open(filename, 'w') as f:
+			json.dump(hosts, f, indent=2)
+	except OSError:
+		pass
+
+def plan(size, profile, mode, encrypt=True, processors=None):
+	""" Chooses the settings for a job from a calibration.
+
+	Parameters
+	----------
+	size : int
+		The byte-size of the input.
+	profile : dict
+		The calibration, from `calibrate`.
+	mode : string
+		The cipher mode. [ecb, cbc, ctr]
+	encrypt : bool
+		Whether the job encrypts. (CBC encryption can't be parallelized)
+	processors : int
+		The number of processors to plan for. Defaults to all of them.
+
+	Returns
+	-------
+	dict
+		The `backend`, `chunk_size`, `multithreaded` and `max_workers` to use, the `estimated_seconds` of the job and the `break_even` input size above which the pool pays for itself.
+	"""
+
+	processors = processors or os.cpu_count() or 1
+	rates = profile['rates']
+	backend = max(rates, key=rates.get)
+	rate = rates[backend]
+
+	# Size chunks by how long they take, as a power of two (so they always hold whole blocks)
+	chunk_size = 1 << max(0, int( min(rate * TARGET_CHUNK_SECONDS, 1 << 62) ).bit_length() - 1)
+	chunk_size = min(max(chunk_size, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+	serial_seconds = size / rate
+
+	# Keep every worker fed with at least two chunks
+	workers = processors
+	while chunk_size > MIN_CHUNK_SIZE and size < 2 * workers * chunk_size:
+		chunk_size //= 2
+	workers = min(processors, max(1, math.ceil(size / chunk_size)))
+
+	parallel_seconds = profile['pool_startup'] + size / (rate * workers)
+	break_even = profile['pool_startup'] * rate * workers / (workers - 1) if workers > 1 else float('inf')
+	multithreaded = workers > 1 and not (mode == 'cbc' and encrypt) and parallel_seconds < serial_seconds
+
+	return dict(
+		backend=backend,
+		chunk_size=chunk_size,
+		multithreaded=multithreaded,
+		max_workers=workers if multithreaded else None,
+		estimated_seconds=parallel_seconds if multithreaded else serial_seconds,
+		break_even=break_even,
+	)
+
+def auto_settings(input_filename, key, mode, encrypt=True, cache=True):
+	""" Plans a file job, calibrating first unless this host has a cached calibration for it.
+
+	Parameters
+	----------
+	input_filename : string
+		The file to process.
+	key : cipher object
+		The keyed cipher object the job will use.
+	mode : string
+		The cipher mode. [ecb, cbc, ctr]
+	encrypt : bool
+		Whether the job encrypts.
+	cache : bool
+		Whether to use (and update) the per-host calibration cache.
+
+	Returns
+	-------
+	dict
+		The settings, from `plan`.
+	"""
+
+	name = profile_key(key, mode, encrypt)
+	profile = load_profiles().get(name) if cache else None
+	if profile is None:
+		profile = calibrate(input_filename, key, mode, encrypt)
+		if cache:
+			save_profile(name, profile)
+
+	return plan(os.path.getsize(input_filename), profile, mode, encrypt)